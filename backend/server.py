@@ -1,36 +1,232 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, Query
+from fastapi.routing import APIRoute
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+from fastapi.staticfiles import StaticFiles
 from fastapi.security import HTTPBearer
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.staticfiles import NotModifiedResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import sys
+import stat
 import logging
+import mimetypes
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError
+from pymongo import ReturnDocument, UpdateOne, ASCENDING, DESCENDING, GEOSPHERE
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 from typing import List, Optional
+from collections import OrderedDict, deque
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from bisect import bisect_left
 import uuid
+import time
+import json
+import asyncio
+import inspect
+import functools
+import threading
+import traceback
+import re
+import io
+import csv
+import codecs
+import zlib
+import math
+import ipaddress
+import struct
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import orjson
 from datetime import datetime, timezone, timedelta
 import httpx
 import bcrypt
-import random
+import brotli
+import anyio
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# ============== DATABASE ==============
+
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", "60000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+MONGO_WARMUP_PINGS = int(os.environ.get("MONGO_WARMUP_PINGS", "3"))
+HEALTH_PING_TIMEOUT = float(os.environ.get("HEALTH_PING_TIMEOUT", "2.0"))
+
+# Both are set by connect_database() in the lifespan, so importing this module
+# needs neither MONGO_URL nor a reachable server
+client: Optional[AsyncIOMotorClient] = None
+db = None
+
+def connect_database():
+    """Create the Motor client once; options given in MONGO_URL are overridden by the env settings."""
+    global client, db
+    if client is not None:
+        return
+    client = AsyncIOMotorClient(
+        os.environ["MONGO_URL"],
+        tz_aware=True,
+        appname="digital-delta-api",
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS
+    )
+    # Functions look ``db`` up at call time, so every query is timed
+    db = TimedDatabase(client[os.environ["DB_NAME"]])
+
+def close_database():
+    global client, db
+    if client is not None:
+        client.close()
+    client = db = None
+
+class DatabaseHealth:
+    """Round-trip measurements of the Mongo connection behind the readiness probe.
+
+    ``accepting`` is cleared at shutdown so load balancers drain this worker
+    before its connections close.
+    """
+
+    def __init__(self, timeout: float = 2.0):
+        self.timeout = timeout
+        self.accepting = False
+        self.last_rtt: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.failures = 0
+
+    async def ping(self) -> Optional[float]:
+        """Round-trip time of one ``ping`` in seconds, or None if the server did not answer in time."""
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(client.admin.command("ping"), self.timeout)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            return None
+        self.last_rtt = time.perf_counter() - started
+        self.last_error = None
+        return self.last_rtt
+
+    async def warm_up(self, pings: int) -> bool:
+        """Open pooled connections with concurrent pings, so the first requests skip the handshakes."""
+        if client is None or pings <= 0:
+            return client is not None
+        results = await asyncio.gather(*(self.ping() for _ in range(pings)))
+        rtts = [rtt for rtt in results if rtt is not None]
+        if not rtts:
+            logger.error("MongoDB did not answer %d warm-up pings: %s", pings, self.last_error)
+            return False
+        logger.info("MongoDB warm-up: %d/%d pings, fastest %.1f ms", len(rtts), pings, min(rtts) * 1000)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "accepting": self.accepting,
+            "last_rtt_ms": round(self.last_rtt * 1000, 2) if self.last_rtt is not None else None,
+            "last_error": self.last_error,
+            "failures": self.failures,
+            "max_pool_size": MONGO_MAX_POOL_SIZE,
+            "min_pool_size": MONGO_MIN_POOL_SIZE
+        }
+
+database_health = DatabaseHealth(HEALTH_PING_TIMEOUT)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # startup() and shutdown() are defined at the end of the module
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
 
 app = FastAPI(
     title="Digital Delta Platform API",
     description="API for Rijkswaterstaat Digital Twin Platform",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
-api_router = APIRouter(prefix="/api")
 security = HTTPBearer(auto_error=False)
 
+# ============== REQUEST TIMING ==============
+
+class RequestTiming:
+    """Per-request phase durations behind the Server-Timing header.
+
+    ``active`` names the phase currently being timed; database calls made
+    while resolving the session count as auth, not db.
+    """
+
+    __slots__ = ("started", "auth", "db", "endpoint_done", "active")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.auth = 0.0
+        self.db = 0.0
+        self.endpoint_done = None
+        self.active = None
+
+    def serialize(self, now: float) -> float:
+        return now - self.endpoint_done if self.endpoint_done is not None else 0.0
+
+    def header(self, now: float) -> str:
+        return (
+            f"auth;dur={self.auth * 1000:.2f}, db;dur={self.db * 1000:.2f}, "
+            f"serialize;dur={self.serialize(now) * 1000:.2f}, total;dur={(now - self.started) * 1000:.2f}"
+        )
+
+request_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+@contextmanager
+def auth_phase():
+    timing = request_timing.get()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    timing.active = "auth"
+    try:
+        yield
+    finally:
+        timing.active = None
+        timing.auth += time.perf_counter() - started
+
+def note_endpoint_done(endpoint):
+    @functools.wraps(endpoint)
+    async def timed_endpoint(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timing = request_timing.get()
+            if timing is not None:
+                timing.endpoint_done = time.perf_counter()
+    return timed_endpoint
+
+class TimedRoute(APIRoute):
+    """APIRoute that records when the endpoint returns; the rest until headers is serialization."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if asyncio.iscoroutinefunction(endpoint):
+            endpoint = note_endpoint_done(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+api_router = APIRouter(prefix="/api", route_class=TimedRoute)
+
 # ============== MODELS ==============
 
 class UserRole:
@@ -100,7 +296,7 @@ class AssetCreate(BaseModel):
     latitude: float
     longitude: float
     status: str = "operational"
-    health_score: int = 100
+    health_score: int = Field(100, ge=0, le=100)
 
 class Alert(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -115,6 +311,7 @@ class Alert(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     acknowledged_by: Optional[str] = None
     resolved_at: Optional[datetime] = None
+    rule: Optional[str] = None
 
 class SensorReading(BaseModel):
     sensor_id: str
@@ -124,40 +321,507 @@ class SensorReading(BaseModel):
     unit: str
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+# ============== SHARED STATE ==============
+
+SHARED_STATE_URL = os.environ.get("SHARED_STATE_URL", "memory://")
+SHARED_STATE_PREFIX = os.environ.get("SHARED_STATE_PREFIX", "dd:")
+SHARED_STATE_MAX_KEYS = int(os.environ.get("SHARED_STATE_MAX_KEYS", "100000"))
+
+# Identifies this process as a lease holder and message origin among the workers
+worker_id = uuid.uuid4().hex[:12]
+
+class MemoryState:
+    """Shared state held in this process: correct for a single worker and for tests.
+
+    Keys written with a ttl live in a bounded LRU, so abandoned sessions and
+    rate-limit windows cannot grow without limit; keys without one (version
+    counters) are never evicted. Values are stored as given, not copied.
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._expiring: "OrderedDict[str, tuple]" = OrderedDict()
+        self._persistent: dict = {}
+        self._channels: dict = {}
+
+    def _lookup(self, key: str):
+        if key in self._persistent:
+            return self._persistent[key]
+        entry = self._expiring.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._expiring[key]
+            return None
+        self._expiring.move_to_end(key)
+        return entry[0]
+
+    def _store(self, key: str, value, ttl: Optional[float]):
+        if ttl is None:
+            self._expiring.pop(key, None)
+            self._persistent[key] = value
+            return
+        self._persistent.pop(key, None)
+        self._expiring[key] = (value, time.monotonic() + ttl)
+        self._expiring.move_to_end(key)
+        while len(self._expiring) > self.max_keys:
+            self._expiring.popitem(last=False)
+
+    async def get(self, key: str):
+        return self._lookup(key)
+
+    async def mget(self, keys: List[str]) -> list:
+        return [self._lookup(key) for key in keys]
+
+    async def set(self, key: str, value, ttl: Optional[float] = None, only_if_absent: bool = False) -> bool:
+        if only_if_absent and self._lookup(key) is not None:
+            return False
+        self._store(key, value, ttl)
+        return True
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._persistent.pop(key, None)
+            self._expiring.pop(key, None)
+
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        """Increment a counter; ``ttl`` only applies when the counter is created."""
+        value = (self._lookup(key) or 0) + 1
+        if key in self._expiring:
+            self._expiring[key] = (value, self._expiring[key][1])
+        else:
+            self._store(key, value, ttl)
+        return value
+
+    async def sadd(self, key: str, member: str, ttl: Optional[float] = None):
+        members = set(self._lookup(key) or ())
+        members.add(member)
+        self._store(key, members, ttl)
+
+    async def smembers(self, key: str) -> set:
+        return set(self._lookup(key) or ())
+
+    async def publish(self, channel: str, message):
+        for callback in list(self._channels.get(channel, ())):
+            callback(message)
+
+    async def subscribe(self, channel: str, callback):
+        self._channels.setdefault(channel, set()).add(callback)
+
+    async def unsubscribe(self, channel: str, callback):
+        callbacks = self._channels.get(channel)
+        if callbacks is not None:
+            callbacks.discard(callback)
+            if not callbacks:
+                del self._channels[channel]
+
+    async def close(self):
+        self._channels.clear()
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "keys": len(self._persistent) + len(self._expiring),
+            "max_keys": self.max_keys,
+            "channels": len(self._channels)
+        }
+
+class RedisState:
+    """Shared state in Redis, or anything speaking its protocol, so every worker sees the same values.
+
+    Values are stored as JSON under ``prefix``. One reader task per process
+    receives pub/sub messages and dispatches them to the local callbacks of
+    their channel; callbacks run on the event loop and must not block.
+    """
+
+    backend = "redis"
+
+    def __init__(self, client, prefix: str = "dd:"):
+        self.client = client
+        self.prefix = prefix
+        self.errors = 0
+        self._channels: dict = {}
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def get(self, key: str):
+        raw = await self.client.get(self.prefix + key)
+        return None if raw is None else orjson.loads(raw)
+
+    async def mget(self, keys: List[str]) -> list:
+        if not keys:
+            return []
+        return [None if raw is None else orjson.loads(raw)
+                for raw in await self.client.mget([self.prefix + key for key in keys])]
+
+    async def set(self, key: str, value, ttl: Optional[float] = None, only_if_absent: bool = False) -> bool:
+        px = max(1, int(ttl * 1000)) if ttl is not None else None
+        return bool(await self.client.set(self.prefix + key, orjson.dumps(value), px=px, nx=only_if_absent))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        """Increment a counter; ``ttl`` only applies when the counter is created."""
+        if ttl is None:
+            return await self.client.incr(self.prefix + key)
+        # SET NX creates the window with its expiry and INCR keeps it, in one round trip
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(self.prefix + key, 0, px=max(1, int(ttl * 1000)), nx=True)
+            pipe.incr(self.prefix + key)
+            _, value = await pipe.execute()
+        return value
+
+    async def sadd(self, key: str, member: str, ttl: Optional[float] = None):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.sadd(self.prefix + key, member)
+            if ttl is not None:
+                pipe.pexpire(self.prefix + key, max(1, int(ttl * 1000)))
+            await pipe.execute()
+
+    async def smembers(self, key: str) -> set:
+        return {m.decode() if isinstance(m, bytes) else m for m in await self.client.smembers(self.prefix + key)}
+
+    async def publish(self, channel: str, message):
+        await self.client.publish(self.prefix + channel, orjson.dumps(message))
+
+    async def subscribe(self, channel: str, callback):
+        callbacks = self._channels.setdefault(channel, set())
+        callbacks.add(callback)
+        if len(callbacks) > 1:
+            return
+        if self._pubsub is None:
+            self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.prefix + channel)
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read())
+
+    async def unsubscribe(self, channel: str, callback):
+        callbacks = self._channels.get(channel)
+        if callbacks is None:
+            return
+        callbacks.discard(callback)
+        if not callbacks:
+            del self._channels[channel]
+            await self._pubsub.unsubscribe(self.prefix + channel)
+
+    async def _read(self):
+        while not self._closed:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except Exception as e:
+                # A cancel racing the read timeout can surface as TimeoutError
+                if self._closed:
+                    return
+                # The next get_message reconnects and resubscribes
+                self.errors += 1
+                logger.warning("Shared-state subscription failed: %s", e)
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message["type"] != "message":
+                if not self._channels:
+                    await asyncio.sleep(0.1)
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            data = orjson.loads(message["data"])
+            for callback in list(self._channels.get(channel[len(self.prefix):], ())):
+                try:
+                    callback(data)
+                except Exception:
+                    logger.exception("Shared-state subscriber failed on %s", channel)
+
+    async def close(self):
+        self._closed = True
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        self._channels.clear()
+        await self.client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "prefix": self.prefix,
+            "channels": len(self._channels),
+            "subscription_errors": self.errors
+        }
+
+def create_shared_state(url: str):
+    """Build the backend named by ``url``: memory://, redis://, rediss://, unix:// or fakeredis://."""
+    if url.startswith("memory://"):
+        return MemoryState(max_keys=SHARED_STATE_MAX_KEYS)
+    if url.startswith("fakeredis://"):
+        # Exercises the Redis code paths in one process, e.g. in tests; not shared between workers
+        import fakeredis
+        return RedisState(fakeredis.FakeAsyncRedis(), prefix=SHARED_STATE_PREFIX)
+    import redis.asyncio as aioredis
+    return RedisState(aioredis.from_url(url, health_check_interval=30), prefix=SHARED_STATE_PREFIX)
+
+shared_state = create_shared_state(SHARED_STATE_URL)
+
+# ============== SESSION CACHE ==============
+
+class SessionCache:
+    """session_token -> user, held in shared state so every worker sees the same sessions.
+
+    Entries live until the session expires or ``ttl`` seconds pass, whichever
+    comes first. Each user's tokens are indexed, so a role change or a new
+    OAuth login drops that user's cached sessions on every worker at once.
+    """
+
+    def __init__(self, state, ttl: float = 60.0):
+        self.state = state
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, session_token: str) -> Optional[UserResponse]:
+        user = await self.state.get(f"session:{session_token}")
+        if user is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return UserResponse.model_validate(user)
+
+    async def put(self, session_token: str, user: UserResponse, expires_at: datetime):
+        ttl = min(self.ttl, (expires_at - datetime.now(timezone.utc)).total_seconds())
+        if ttl <= 0:
+            return
+        await self.state.set(f"session:{session_token}", user.model_dump(mode="json"), ttl)
+        await self.state.sadd(f"session-user:{user.user_id}", session_token, self.ttl)
+
+    async def invalidate(self, session_token: str):
+        await self.state.delete(f"session:{session_token}")
+
+    async def invalidate_user(self, user_id: str):
+        tokens = await self.state.smembers(f"session-user:{user_id}")
+        await self.state.delete(f"session-user:{user_id}", *(f"session:{token}" for token in tokens))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.state.backend,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+session_cache = SessionCache(
+    shared_state,
+    ttl=float(os.environ.get("SESSION_CACHE_TTL", "60"))
+)
+
+# ============== RATE LIMITS ==============
+
+class RateLimiter:
+    """Fixed-window request limit per key, counted in shared state so it holds across workers.
+
+    ``spec`` reads "<requests>/<seconds>"; a limit of 0 disables the check.
+    """
+
+    def __init__(self, state, name: str, spec: str):
+        self.state = state
+        self.name = name
+        limit, window = spec.split("/")
+        self.limit = int(limit)
+        self.window = float(window)
+        self.rejected = 0
+
+    async def check(self, key: str):
+        if self.limit <= 0:
+            return
+        window = int(time.time() // self.window)
+        count = await self.state.incr(f"rate:{self.name}:{key}:{window}", ttl=self.window)
+        if count > self.limit:
+            self.rejected += 1
+            metrics.rate_limited.inc((self.name,))
+            retry_after = math.ceil((window + 1) * self.window - time.time())
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, try again later",
+                headers={"Retry-After": str(max(retry_after, 1))}
+            )
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "window_seconds": self.window, "rejected": self.rejected}
+
+# Peers allowed to report the client address in X-Forwarded-For (comma-separated
+# addresses or CIDRs, e.g. the ingress). Without them the header is ignored,
+# because any client can set it.
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip()) for proxy in os.environ.get("TRUSTED_PROXIES", "").split(",") if proxy.strip()
+]
+
+def _trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+def client_ip(request: Request) -> str:
+    """The caller's address: the first X-Forwarded-For hop, from the right, that is not a trusted proxy."""
+    host = request.client.host if request.client else "unknown"
+    if not _trusted_proxy(host):
+        return host
+    hops = [hop.strip() for value in request.headers.getlist("x-forwarded-for") for hop in value.split(",")]
+    for hop in reversed([hop for hop in hops if hop]):
+        host = hop
+        if not _trusted_proxy(hop):
+            break
+    return host
+
+# Off by default: behind a proxy every client shares the proxy's address, so
+# enable the per-IP limits only together with TRUSTED_PROXIES.
+rate_limiters = {
+    limiter.name: limiter for limiter in (
+        RateLimiter(shared_state, "auth-ip", os.environ.get("AUTH_IP_RATE_LIMIT", "0/60")),
+        RateLimiter(shared_state, "login-email", os.environ.get("LOGIN_RATE_LIMIT", "0/300")),
+        RateLimiter(shared_state, "contact-ip", os.environ.get("CONTACT_RATE_LIMIT", "0/3600")),
+    )
+}
+
+# ============== PASSWORD HASHING ==============
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded thread pool so it never blocks the event loop.
+
+    bcrypt releases the GIL while hashing, so threads give real parallelism.
+    Queue wait and hashing time are tracked separately; the counters are
+    updated from both the loop and the pool threads, so under ``_lock``.
+    The pool is created on first use, so the hasher survives a restart of
+    the app in the same process.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 4):
+        self.rounds = rounds
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.queue_seconds = 0.0
+        self.hash_seconds = 0.0
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        submitted = time.perf_counter()
+        job = {"state": "queued"}
+        with self._lock:
+            self.queued += 1
+        
+        def timed():
+            started = time.perf_counter()
+            with self._lock:
+                if job["state"] == "cancelled":
+                    return None
+                job["state"] = "running"
+                self.queued -= 1
+                self.running += 1
+            try:
+                return fn(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self.queue_seconds += started - submitted
+                    self.hash_seconds += finished - started
+        
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        except asyncio.CancelledError:
+            # A job cancelled while still queued never reaches timed()
+            with self._lock:
+                if job["state"] == "queued":
+                    job["state"] = "cancelled"
+                    self.queued -= 1
+            raise
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(bcrypt.hashpw, password.encode(), bcrypt.gensalt(self.rounds))
+        return hashed.decode()
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(bcrypt.checkpw, password.encode(), hashed.encode())
+
+    def needs_rehash(self, hashed: str) -> bool:
+        try:
+            return int(hashed.split("$")[2]) < self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "queue_depth": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "queue_seconds_total": round(self.queue_seconds, 4),
+            "hash_seconds_total": round(self.hash_seconds, 4)
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+password_hasher = PasswordHasher(
+    rounds=int(os.environ.get("BCRYPT_ROUNDS", "12")),
+    workers=int(os.environ.get("BCRYPT_WORKERS", "4"))
+)
+
 # ============== AUTH HELPERS ==============
 
-async def get_current_user(request: Request) -> UserResponse:
-    """Extract and validate user from session token."""
+def get_session_token(request: Request) -> Optional[str]:
     session_token = request.cookies.get("session_token")
-    
     if not session_token:
         auth_header = request.headers.get("Authorization")
         if auth_header and auth_header.startswith("Bearer "):
             session_token = auth_header[7:]
-    
-    if not session_token:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    session = await db.user_sessions.find_one({"session_token": session_token}, {"_id": 0})
-    if not session:
-        raise HTTPException(status_code=401, detail="Invalid session")
-    
-    expires_at = session["expires_at"]
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    if expires_at < datetime.now(timezone.utc):
-        raise HTTPException(status_code=401, detail="Session expired")
-    
-    user = await db.users.find_one({"user_id": session["user_id"]}, {"_id": 0})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    
-    if isinstance(user.get("created_at"), str):
-        user["created_at"] = datetime.fromisoformat(user["created_at"])
-    
-    return UserResponse(**user)
+    return session_token
+
+async def get_current_user(request: Request) -> UserResponse:
+    """Extract and validate user from session token."""
+    with auth_phase():
+        session_token = get_session_token(request)
+        
+        if not session_token:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        
+        cached = await session_cache.get(session_token)
+        if cached is not None:
+            return cached
+        
+        session = await db.user_sessions.find_one({"session_token": session_token}, {"_id": 0})
+        if not session:
+            raise HTTPException(status_code=401, detail="Invalid session")
+        
+        expires_at = session["expires_at"]
+        if expires_at < datetime.now(timezone.utc):
+            raise HTTPException(status_code=401, detail="Session expired")
+        
+        user = await db.users.find_one({"user_id": session["user_id"]}, {"_id": 0})
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        
+        user_response = UserResponse(**user)
+        await session_cache.put(session_token, user_response, expires_at)
+        return user_response
 
 def require_role(allowed_roles: List[str]):
     async def role_checker(user: UserResponse = Depends(get_current_user)):
@@ -166,15 +830,90 @@ def require_role(allowed_roles: List[str]):
         return user
     return role_checker
 
+# ============== OAUTH CLIENT ==============
+
+OAUTH_SESSION_URL = "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
+
+class OAuthSessionClient:
+    """Long-lived pooled HTTP client for the OAuth session-data exchange.
+
+    Results are cached per session_id for ``cache_ttl`` seconds, and
+    concurrent requests for the same session_id share one upstream call, so
+    a double-submitted callback reaches the provider only once.
+    """
+
+    RETRY_STATUSES = {502, 503, 504}
+
+    def __init__(self, url: str, retries: int = 2, cache_ttl: float = 30.0):
+        self.url = url
+        self.retries = retries
+        self.cache_ttl = cache_ttl
+        self.client: Optional[httpx.AsyncClient] = None
+        self._results: dict = {}
+        self._inflight: dict = {}
+
+    def start(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                transport=transport or httpx.AsyncHTTPTransport(
+                    http2=True,
+                    retries=self.retries,
+                    limits=httpx.Limits(max_connections=50, max_keepalive_connections=10, keepalive_expiry=60.0)
+                )
+            )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def fetch(self, session_id: str) -> Optional[dict]:
+        """Return the provider's session data, or None if the session_id is invalid."""
+        now = time.monotonic()
+        for key in [k for k, (_, stale_at) in self._results.items() if stale_at <= now]:
+            del self._results[key]
+        if session_id in self._results:
+            return self._results[session_id][0]
+        
+        pending = self._inflight.get(session_id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._request(session_id))
+            self._inflight[session_id] = pending
+            pending.add_done_callback(lambda _: self._inflight.pop(session_id, None))
+        data = await asyncio.shield(pending)
+        if data is not None:
+            self._results[session_id] = (data, time.monotonic() + self.cache_ttl)
+        return data
+
+    async def _request(self, session_id: str) -> Optional[dict]:
+        self.start()
+        for attempt in range(self.retries + 1):
+            resp = await self.client.get(self.url, headers={"X-Session-ID": session_id})
+            if resp.status_code not in self.RETRY_STATUSES or attempt == self.retries:
+                break
+            await asyncio.sleep(0.2 * 2 ** attempt)
+        if resp.status_code != 200:
+            return None
+        return resp.json()
+
+oauth_client = OAuthSessionClient(
+    # REMINDER: DO NOT HARDCODE THE URL, OR ADD ANY FALLBACKS OR REDIRECT URLS, THIS BREAKS THE AUTH
+    OAUTH_SESSION_URL,
+    retries=int(os.environ.get("OAUTH_RETRIES", "2")),
+    cache_ttl=float(os.environ.get("OAUTH_SESSION_CACHE_TTL", "30"))
+)
+
 # ============== AUTH ENDPOINTS ==============
 
 @api_router.post("/auth/register", response_model=UserResponse)
-async def register(user_data: UserCreate):
+async def register(user_data: UserCreate, request: Request):
+    await rate_limiters["auth-ip"].check(client_ip(request))
     existing = await db.users.find_one({"email": user_data.email}, {"_id": 0})
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = bcrypt.hashpw(user_data.password.encode(), bcrypt.gensalt()).decode()
+    hashed_password = await password_hasher.hash(user_data.password)
     user_id = f"user_{uuid.uuid4().hex[:12]}"
     
     user_doc = {
@@ -184,31 +923,39 @@ async def register(user_data: UserCreate):
         "password": hashed_password,
         "role": user_data.role,
         "picture": None,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     }
     
     await db.users.insert_one(user_doc)
+    await collection_versions.bump("users")
     del user_doc["password"]
-    user_doc["created_at"] = datetime.fromisoformat(user_doc["created_at"])
     return UserResponse(**user_doc)
 
 @api_router.post("/auth/login")
-async def login(credentials: UserLogin, response: Response):
+async def login(credentials: UserLogin, request: Request, response: Response):
+    await rate_limiters["auth-ip"].check(client_ip(request))
+    await rate_limiters["login-email"].check(credentials.email.lower())
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not bcrypt.checkpw(credentials.password.encode(), user["password"].encode()):
+    if not user.get("password") or not await password_hasher.verify(credentials.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    if password_hasher.needs_rehash(user["password"]):
+        await db.users.update_one(
+            {"user_id": user["user_id"]},
+            {"$set": {"password": await password_hasher.hash(credentials.password)}}
+        )
+    
     session_token = f"session_{uuid.uuid4().hex}"
     expires_at = datetime.now(timezone.utc) + timedelta(days=7)
     
     await db.user_sessions.insert_one({
         "user_id": user["user_id"],
         "session_token": session_token,
-        "expires_at": expires_at.isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "expires_at": expires_at,
+        "created_at": datetime.now(timezone.utc)
     })
     
     response.set_cookie(
@@ -221,9 +968,6 @@ async def login(credentials: UserLogin, response: Response):
         max_age=7*24*60*60
     )
     
-    if isinstance(user.get("created_at"), str):
-        user["created_at"] = datetime.fromisoformat(user["created_at"])
-    
     return {
         "user": UserResponse(**{k: v for k, v in user.items() if k != "password"}),
         "session_token": session_token
@@ -232,24 +976,17 @@ async def login(credentials: UserLogin, response: Response):
 @api_router.post("/auth/session")
 async def exchange_session(request: Request, response: Response):
     """Exchange Emergent OAuth session_id for user data and session token."""
+    await rate_limiters["auth-ip"].check(client_ip(request))
     body = await request.json()
     session_id = body.get("session_id")
     
     if not session_id:
         raise HTTPException(status_code=400, detail="session_id required")
     
-    # REMINDER: DO NOT HARDCODE THE URL, OR ADD ANY FALLBACKS OR REDIRECT URLS, THIS BREAKS THE AUTH
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-            headers={"X-Session-ID": session_id}
-        )
-    
-    if resp.status_code != 200:
+    oauth_data = await oauth_client.fetch(session_id)
+    if oauth_data is None:
         raise HTTPException(status_code=401, detail="Invalid session_id")
     
-    oauth_data = resp.json()
-    
     existing_user = await db.users.find_one({"email": oauth_data["email"]}, {"_id": 0})
     
     if existing_user:
@@ -266,18 +1003,20 @@ async def exchange_session(request: Request, response: Response):
             "name": oauth_data["name"],
             "picture": oauth_data.get("picture"),
             "role": UserRole.VELDWERKER,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         })
+    await collection_versions.bump("users")
     
     session_token = oauth_data.get("session_token", f"session_{uuid.uuid4().hex}")
     expires_at = datetime.now(timezone.utc) + timedelta(days=7)
     
     await db.user_sessions.delete_many({"user_id": user_id})
+    await session_cache.invalidate_user(user_id)
     await db.user_sessions.insert_one({
         "user_id": user_id,
         "session_token": session_token,
-        "expires_at": expires_at.isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "expires_at": expires_at,
+        "created_at": datetime.now(timezone.utc)
     })
     
     response.set_cookie(
@@ -291,8 +1030,6 @@ async def exchange_session(request: Request, response: Response):
     )
     
     user = await db.users.find_one({"user_id": user_id}, {"_id": 0})
-    if isinstance(user.get("created_at"), str):
-        user["created_at"] = datetime.fromisoformat(user["created_at"])
     
     return {"user": UserResponse(**user), "session_token": session_token}
 
@@ -302,32 +1039,1334 @@ async def get_me(user: UserResponse = Depends(get_current_user)):
 
 @api_router.post("/auth/logout")
 async def logout(request: Request, response: Response):
-    session_token = request.cookies.get("session_token")
+    session_token = get_session_token(request)
     if session_token:
+        await session_cache.invalidate(session_token)
         await db.user_sessions.delete_many({"session_token": session_token})
     
     response.delete_cookie(key="session_token", path="/")
     return {"message": "Logged out"}
 
-# ============== ASSETS ENDPOINTS ==============
+# ============== HTTP CACHING ==============
+
+class CollectionVersions:
+    """Per-collection change counters used to derive ETags.
+
+    Mutating endpoints bump the counters of the collections they touch, so a
+    conditional GET can be answered with 304 without touching Mongo. The
+    counters live in shared state, so every worker derives the same ETag for
+    the same data. The epoch is regenerated whenever the state is lost, so
+    counters that restart from zero cannot reproduce an old ETag.
+    """
+
+    EPOCH_KEY = "versions:epoch"
+
+    def __init__(self, state):
+        self.state = state
+        self.not_modified = 0
+
+    async def bump(self, *collections: str):
+        for name in collections:
+            await self.state.incr(f"versions:{name}")
+
+    async def etag(self, request: Request, *collections: str, extra: str = "") -> str:
+        epoch, *counts = await self.state.mget([self.EPOCH_KEY, *(f"versions:{name}" for name in collections)])
+        if epoch is None:
+            await self.state.set(self.EPOCH_KEY, uuid.uuid4().hex[:8], only_if_absent=True)
+            epoch = await self.state.get(self.EPOCH_KEY)
+        versions = ".".join(f"{name}{count or 0}" for name, count in zip(collections, counts))
+        variant = zlib.crc32(f"{request.url.path}?{request.url.query}|{extra}".encode())
+        return f'"{epoch}.{versions}.{variant:08x}"'
+
+collection_versions = CollectionVersions(shared_state)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [c.strip().removeprefix("W/") for c in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+async def conditional(request: Request, response: Response, *collections: str, extra: str = "") -> Optional[Response]:
+    """Set ETag headers and return a 304 response if the client's copy is current."""
+    etag = await collection_versions.etag(request, *collections, extra=extra)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        collection_versions.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+# ============== FAST JSON ==============
+
+FAST_JSON_RESPONSES = os.environ.get("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NAIVE_UTC
+STREAM_CHUNK_DOCS = 500
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson, with datetimes in the same ``Z`` form pydantic uses."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+def model_projection(model) -> dict:
+    """Project exactly a model's fields, so documents can skip response_model validation."""
+    return {"_id": 0, **{name: 1 for name in model.model_fields}}
+
+async def stream_json_array(cursor):
+    """Encode a Motor cursor as a JSON array in chunks, without materialising the list."""
+    yield b"["
+    separator = b""
+    chunk = []
+    async for doc in cursor:
+        chunk.append(orjson.dumps(doc, option=ORJSON_OPTIONS))
+        if len(chunk) >= STREAM_CHUNK_DOCS:
+            yield separator + b",".join(chunk)
+            separator, chunk = b",", []
+    if chunk:
+        yield separator + b",".join(chunk)
+    yield b"]"
+
+def cache_headers(response: Response) -> dict:
+    return {k: v for k, v in response.headers.items() if k in ("etag", "cache-control")}
+
+def list_response(cursor, response: Response):
+    """Stream an unbounded list straight from the cursor."""
+    return StreamingResponse(stream_json_array(cursor), media_type="application/json", headers=cache_headers(response))
+
+# ============== COMPRESSION ==============
+
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "4"))
+STATIC_EXPORT_DIR = Path(os.environ.get("STATIC_EXPORT_DIR", ROOT_DIR.parent / "static-export"))
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/x-ndjson", "application/geo+json",
+    "application/javascript", "application/xml", "image/svg+xml",
+    "application/vnd.mapbox-vector-tile",
+)
+UNBUFFERED_TYPES = ("text/event-stream",)
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick ``br`` or ``gzip`` from an Accept-Encoding header, honouring q-values."""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+    wildcard = weights.get("*", 0.0)
+    candidates = [(weights.get(enc, wildcard), enc) for enc in ("br", "gzip")]
+    q, encoding = max(candidates, key=lambda c: c[0])
+    return encoding if q > 0 else None
+
+class _StreamCompressor:
+    """Incremental gzip/brotli encoder that flushes every chunk, so nothing is held back."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._gzip.flush(zlib.Z_FINISH)
+
+def compress_body(body: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+class CompressionMiddleware:
+    """Negotiated gzip/brotli response compression.
+
+    Single-body responses under ``minimum_size`` go out untouched. Streaming
+    responses are compressed chunk by chunk with a flush after each one, and
+    event streams, already-encoded bodies (precompressed static files) and
+    non-text media types are passed through as-is.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE,
+                 gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if passthrough:
+                await send(message)
+                return
+            if compressor is not None:
+                data = compressor.chunk(body)
+                if not more_body:
+                    data += compressor.finish()
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            headers = MutableHeaders(scope=start_message)
+            headers.add_vary_header("Accept-Encoding")
+            if not self._should_compress(start_message["status"], headers, body, more_body):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = encoding
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            if more_body:
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                compressor = _StreamCompressor(encoding, self.gzip_level, self.brotli_quality)
+                data = compressor.chunk(body)
+            else:
+                data = compress_body(body, encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Length"] = str(len(data))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _should_compress(self, status: int, headers, body: bytes, more_body: bool) -> bool:
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if media_type.startswith(UNBUFFERED_TYPES) or not media_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        return more_body or len(body) >= self.minimum_size
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves ``.br``/``.gz`` siblings written by ``precompress-static``."""
+
+    async def get_response(self, path: str, scope) -> Response:
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is not None and scope["method"] in ("GET", "HEAD"):
+            target = path if path not in ("", ".") and not path.endswith("/") else os.path.join(path, "index.html")
+            for candidate in ("br", "gzip") if encoding == "br" else ("gzip",):
+                full_path, stat_result = await anyio.to_thread.run_sync(
+                    self.lookup_path, target + PRECOMPRESSED_SUFFIXES[candidate]
+                )
+                if stat_result is not None and stat.S_ISREG(stat_result.st_mode):
+                    media_type = mimetypes.guess_type(target)[0] or "application/octet-stream"
+                    response = FileResponse(
+                        full_path, stat_result=stat_result, media_type=media_type,
+                        headers={"Content-Encoding": candidate, "Vary": "Accept-Encoding"},
+                    )
+                    if self.is_not_modified(response.headers, Headers(scope=scope)):
+                        return NotModifiedResponse(response.headers)
+                    return response
+        response = await super().get_response(path, scope)
+        response.headers.setdefault("Vary", "Accept-Encoding")
+        return response
+
+def precompress_static(directory: Path, gzip_level: int = 9, brotli_quality: int = 11) -> dict:
+    """Write .gz and .br siblings for every compressible file in a static export."""
+    written = 0
+    for source in sorted(directory.rglob("*")):
+        if not source.is_file() or source.suffix in (".gz", ".br"):
+            continue
+        media_type = mimetypes.guess_type(source.name)[0] or ""
+        if not media_type.startswith(COMPRESSIBLE_TYPES):
+            continue
+        body = source.read_bytes()
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+            data = compress_body(body, encoding, gzip_level, brotli_quality)
+            if len(data) < len(body):
+                source.with_name(source.name + suffix).write_bytes(data)
+                written += 1
+    return {"directory": str(directory), "files_written": written}
+
+# ============== METRICS ==============
+
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+SERVER_TIMING_HEADER = os.environ.get("SERVER_TIMING_HEADER", "true").lower() in ("1", "true", "yes")
+EVENT_LOOP_PROBE_INTERVAL = float(os.environ.get("EVENT_LOOP_PROBE_INTERVAL", "0.5"))
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+class Histogram:
+    """Prometheus histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict = {}
+
+    def observe(self, values: tuple, amount: float):
+        series = self._series.get(values)
+        if series is None:
+            series = self._series[values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, amount)] += 1
+        series[-1] += amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), values + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {cumulative}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict = {}
+
+    def inc(self, values: tuple, amount: float = 1):
+        self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_labels(self.labels, v)} {n:g}" for v, n in sorted(self._values.items()))
+        return lines
+
+def gauge(name: str, help: str, value: float, kind: str = "gauge") -> List[str]:
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value:g}"]
+
+class Metrics:
+    """Process-wide request, database and event-loop metrics in Prometheus text format."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.loop_lag = 0.0
+        self.requests = Counter("http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+        self.latency = Histogram("http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+        self.phases = Counter("http_request_phase_seconds_total", "Time spent per request phase", ("route", "phase"))
+        self.db_latency = Histogram("mongodb_operation_duration_seconds", "Motor call latency by collection and operation", ("collection", "operation"))
+        self.db_errors = Counter("mongodb_operation_errors_total", "Failed Motor calls by collection and operation", ("collection", "operation"))
+        self.loop_lag_histogram = Histogram("event_loop_lag_seconds", "Event-loop scheduling delay of a periodic probe")
+        self.rate_limited = Counter("rate_limit_rejections_total", "Requests refused with 429 by a rate limit", ("limit",))
+
+    def observe_request(self, method: str, route: str, status: int, timing: RequestTiming, finished: float):
+        self.requests.inc((method, route, str(status)))
+        self.latency.observe((method, route), finished - timing.started)
+        self.phases.inc((route, "auth"), timing.auth)
+        self.phases.inc((route, "db"), timing.db)
+        self.phases.inc((route, "serialize"), timing.serialize(finished))
+
+    def render(self) -> str:
+        cache = session_cache.stats()
+        hasher = password_hasher.stats()
+        lines = [
+            *self.requests.render(),
+            *self.latency.render(),
+            *self.phases.render(),
+            *gauge("http_requests_in_flight", "Requests currently being handled", self.in_flight),
+            *self.db_latency.render(),
+            *self.db_errors.render(),
+            *gauge("event_loop_lag_seconds_last", "Most recent event-loop probe delay", self.loop_lag),
+            *self.loop_lag_histogram.render(),
+            *gauge("auth_session_cache_hits_total", "Session lookups served from the cache", cache["hits"], "counter"),
+            *gauge("auth_session_cache_misses_total", "Session lookups that went to MongoDB", cache["misses"], "counter"),
+            *self.rate_limited.render(),
+            *gauge("bcrypt_queue_depth", "bcrypt jobs waiting for a pool thread", hasher["queue_depth"]),
+            *gauge("bcrypt_running", "bcrypt jobs currently running", hasher["running"]),
+            *gauge("bcrypt_operations_total", "Completed bcrypt hash/verify calls", hasher["completed"], "counter"),
+            *gauge("bcrypt_queue_seconds_total", "Time bcrypt jobs spent queued", hasher["queue_seconds_total"], "counter"),
+            *gauge("bcrypt_hash_seconds_total", "Time spent inside bcrypt", hasher["hash_seconds_total"], "counter"),
+        ]
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+def record_db_time(collection: str, operation: str, elapsed: float, call: Optional[tuple]):
+    metrics.db_latency.observe((collection, operation), elapsed)
+    if DIAGNOSTICS and elapsed >= SLOW_QUERY_SECONDS and call is not None:
+        query_diagnostics.slow(collection, operation, call, elapsed)
+
+async def timed_db_call(awaitable, collection: str, operation: str, call: Optional[tuple] = None):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    except Exception:
+        metrics.db_errors.inc((collection, operation))
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        record_db_time(collection, operation, elapsed, call)
+        timing = request_timing.get()
+        if timing is not None and timing.active is None:
+            timing.db += elapsed
+
+def _timed_result(result, collection: str, operation: str, call: Optional[tuple] = None):
+    if inspect.isawaitable(result):
+        return timed_db_call(result, collection, operation, call)
+    if hasattr(result, "find_one"):
+        return TimedCollection(result)
+    if hasattr(result, "to_list"):
+        return TimedCursor(result, collection, operation, call)
+    return result
+
+class TimedCursor:
+    """Cursor wrapper; a full iteration is recorded as one operation."""
+
+    def __init__(self, cursor, collection: str, operation: str, call: Optional[tuple] = None):
+        self._cursor = cursor
+        self._collection = collection
+        self._operation = operation
+        self._call = call
+        self._elapsed = 0.0
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if result is self._cursor:
+                return self
+            return _timed_result(result, self._collection, self._operation, self._call)
+        return call
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        started = time.perf_counter()
+        exhausted = False
+        try:
+            return await self._cursor.__anext__()
+        except StopAsyncIteration:
+            exhausted = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self._elapsed += elapsed
+            timing = request_timing.get()
+            if timing is not None and timing.active is None:
+                timing.db += elapsed
+            if exhausted:
+                record_db_time(self._collection, self._operation, self._elapsed, self._call)
+
+class TimedCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def call(*args, **kwargs):
+            return _timed_result(attr(*args, **kwargs), self._collection.name, name, (args, kwargs))
+        return call
+
+class TimedDatabase:
+    """Database wrapper that times every Motor call for /metrics and Server-Timing."""
+
+    def __init__(self, database):
+        self._database = database
+        self._collections: dict = {}
+
+    def __getitem__(self, name: str) -> TimedCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = TimedCollection(self._database[name])
+        return collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._database, name)
+        if hasattr(attr, "find_one"):
+            return self[name]
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def call(*args, **kwargs):
+            return _timed_result(attr(*args, **kwargs), "(database)", name)
+        return call
+
+class EventLoopMonitor:
+    """Measures how late a periodic sleep wakes up, i.e. how long the loop was blocked."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            metrics.loop_lag = lag
+            metrics.loop_lag_histogram.observe((), lag)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+event_loop_monitor = EventLoopMonitor(EVENT_LOOP_PROBE_INTERVAL)
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path_format
+    if "endpoint" in scope:
+        return scope.get("root_path", "") + "/{path}"
+    return "unmatched"
+
+class MetricsMiddleware:
+    """Counts in-flight requests, records latency per route template and adds Server-Timing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timing = RequestTiming()
+        token = request_timing.set(timing)
+        status = 500
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING_HEADER:
+                    MutableHeaders(scope=message).append("Server-Timing", timing.header(time.perf_counter()))
+            await send(message)
+
+        metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            metrics.in_flight -= 1
+            request_timing.reset(token)
+            metrics.observe_request(scope["method"], route_template(scope), status, timing, time.perf_counter())
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """Prometheus scrape endpoint; set METRICS_TOKEN to require ``Authorization: Bearer <token>``."""
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# ============== DIAGNOSTICS ==============
+
+DIAGNOSTICS = os.environ.get("DIAGNOSTICS", "false").lower() in ("1", "true", "yes")
+LOOP_BLOCK_THRESHOLD = float(os.environ.get("LOOP_BLOCK_THRESHOLD_MS", "100")) / 1000
+SLOW_QUERY_SECONDS = float(os.environ.get("SLOW_QUERY_MS", "100")) / 1000
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "60"))
+EXPLAIN_INTERVAL = 600
+FILTER_OPERATIONS = {
+    "find", "find_one", "aggregate", "count_documents", "distinct",
+    "update_one", "update_many", "replace_one", "delete_one", "delete_many",
+    "find_one_and_update", "find_one_and_replace", "find_one_and_delete",
+}
+
+class LoopBlockDetector:
+    """Reports event-loop stalls longer than ``threshold`` with the stack that caused them.
+
+    A heartbeat task wakes every quarter threshold; a watchdog thread that
+    sees the heartbeat overdue snapshots the loop thread's stack, and the
+    heartbeat logs it with the measured stall once the loop runs again.
+    """
+
+    def __init__(self, enabled: bool, threshold: float, history: int = 50):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.blocks: deque = deque(maxlen=history)
+        self.detected = 0
+        self.loop_thread: Optional[int] = None
+        self._beat = time.monotonic()
+        self._pending: Optional[List[str]] = None
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def _heartbeat(self):
+        interval = self.threshold / 4
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            self._beat = now
+            stack, self._pending = self._pending, None
+            stall = now - before - interval
+            if stall < self.threshold:
+                continue
+            self.detected += 1
+            self.blocks.append({
+                "at": datetime.now(timezone.utc).isoformat(),
+                "blocked_ms": round(stall * 1000, 1),
+                "stack": stack or []
+            })
+            logger.warning("Event loop blocked for %.0f ms\n%s", stall * 1000,
+                           "".join(stack) if stack else "(stall ended before a stack was captured)")
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 2):
+            if self._pending is None and time.monotonic() - self._beat > self.threshold * 1.25:
+                frame = sys._current_frames().get(self.loop_thread)
+                if frame is not None:
+                    self._pending = traceback.format_stack(frame)
+
+    def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        self.loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": self.threshold * 1000,
+            "detected": self.detected,
+            "recent": list(self.blocks)
+        }
+
+loop_block_detector = LoopBlockDetector(DIAGNOSTICS, LOOP_BLOCK_THRESHOLD)
+
+def query_shape(value):
+    """Replace literals with their type names, so one plan is fetched per query shape."""
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(v) for v in value[:1]]
+    return type(value).__name__
+
+def explain_command(collection: str, operation: str, args: tuple, kwargs: dict) -> Optional[dict]:
+    """The explainable command behind a Motor call; cursor modifiers such as sort are not seen."""
+    query = args[0] if args else kwargs.get("filter", {})
+    update = args[1] if len(args) > 1 else kwargs.get("update", kwargs.get("replacement"))
+    if operation in ("find", "find_one"):
+        return {"find": collection, "filter": query or {}, **({"limit": 1} if operation == "find_one" else {})}
+    if operation == "aggregate":
+        return {"aggregate": collection, "pipeline": query, "cursor": {}}
+    if operation == "count_documents":
+        return {"count": collection, "query": query}
+    if operation in ("update_one", "update_many", "replace_one", "find_one_and_update", "find_one_and_replace"):
+        return {"update": collection, "updates": [{"q": query, "u": update, "multi": operation == "update_many"}]}
+    if operation in ("delete_one", "delete_many", "find_one_and_delete"):
+        return {"delete": collection, "deletes": [{"q": query, "limit": 0 if operation == "delete_many" else 1}]}
+    return None
+
+def _find_key(doc, key: str):
+    if isinstance(doc, dict):
+        if key in doc:
+            return doc[key]
+        children = doc.values()
+    elif isinstance(doc, list):
+        children = doc
+    else:
+        return None
+    for child in children:
+        found = _find_key(child, key)
+        if found is not None:
+            return found
+    return None
+
+def plan_summary(explain: dict) -> str:
+    """Winning plan as a stage chain, e.g. ``LIMIT <- FETCH <- IXSCAN(asset_id_1)``."""
+    plan = _find_key(explain, "winningPlan") or {}
+    plan = plan.get("queryPlan", plan)
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage += f"({plan['indexName']})"
+        stages.append(stage)
+        plan = plan.get("inputStage") or next(iter(plan.get("inputStages") or []), None)
+    return " <- ".join(stages) or "unknown"
+
+class QueryDiagnostics:
+    """Logs Motor calls slower than ``SLOW_QUERY_MS`` with their filter and explain() plan."""
+
+    def __init__(self, history: int = 100):
+        self.slow_queries: deque = deque(maxlen=history)
+        self.detected = 0
+        self._explained: dict = {}
+        self._tasks: set = set()
+
+    def slow(self, collection: str, operation: str, call: tuple, elapsed: float):
+        self.detected += 1
+        args, kwargs = call
+        # Inserts and bulk writes carry whole documents, which stay out of the log
+        query = (args[0] if args else kwargs.get("filter")) if operation in FILTER_OPERATIONS else None
+        record = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "collection": collection,
+            "operation": operation,
+            "duration_ms": round(elapsed * 1000, 1),
+            "filter": json.dumps(query, default=str)[:500],
+            "plan": None
+        }
+        self.slow_queries.append(record)
+        command = explain_command(collection, operation, args, kwargs)
+        key = json.dumps([collection, operation, query_shape(query)], default=str)
+        now = time.monotonic()
+        if command is None or now - self._explained.get(key, -EXPLAIN_INTERVAL) < EXPLAIN_INTERVAL:
+            logger.warning("Slow query %s.%s %.0f ms filter=%s", collection, operation, elapsed * 1000, record["filter"])
+            return
+        self._explained[key] = now
+        task = asyncio.get_running_loop().create_task(self._explain(record, command))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _explain(self, record: dict, command: dict):
+        raw = getattr(db, "_database", db)
+        try:
+            explain = await raw.command("explain", command, verbosity="queryPlanner")
+            record["plan"] = plan_summary(explain)
+        except Exception as e:
+            record["plan"] = f"explain failed: {e}"
+        logger.warning("Slow query %s.%s %.0f ms filter=%s plan=%s", record["collection"], record["operation"],
+                       record["duration_ms"], record["filter"], record["plan"])
+
+    def stats(self) -> dict:
+        return {
+            "enabled": DIAGNOSTICS,
+            "threshold_ms": SLOW_QUERY_SECONDS * 1000,
+            "detected": self.detected,
+            "recent": list(self.slow_queries)
+        }
+
+query_diagnostics = QueryDiagnostics()
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval; one run at a time.
+
+    Output is aggregated per function (self and total samples) plus folded
+    stacks that flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def run(self, thread_id: int, seconds: float, interval: float) -> dict:
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            stacks: dict = {}
+            samples = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                frame = sys._current_frames().get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    key = tuple(reversed(stack))
+                    stacks[key] = stacks.get(key, 0) + 1
+                    samples += 1
+                time.sleep(interval)
+        finally:
+            self._lock.release()
+        return self._summarize(stacks, samples, seconds, interval)
+
+    @staticmethod
+    def _summarize(stacks: dict, samples: int, seconds: float, interval: float) -> dict:
+        own, total = {}, {}
+        for stack, count in stacks.items():
+            own[stack[-1]] = own.get(stack[-1], 0) + count
+            for function in set(stack):
+                total[function] = total.get(function, 0) + count
+        idle = sum(c for stack, c in stacks.items() if stack[-1].startswith("select ("))
+
+        def top(counts: dict) -> List[dict]:
+            ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:30]
+            return [{"function": f, "samples": c, "percent": round(100 * c / samples, 1)} for f, c in ranked]
+
+        return {
+            "seconds": seconds,
+            "interval_ms": interval * 1000,
+            "samples": samples,
+            "idle_percent": round(100 * idle / samples, 1) if samples else None,
+            "top_self": top(own),
+            "top_total": top(total),
+            "folded": "\n".join(f"{';'.join(stack)} {count}" for stack, count in stacks.items())
+        }
+
+sampling_profiler = SamplingProfiler()
+
+# ============== ASSETS ENDPOINTS ==============
+
+PAGE_MAX_LIMIT = 5000
+
+def parse_projection(fields: Optional[str], model, key: str) -> Optional[dict]:
+    """Turn a comma-separated ``fields`` parameter into a Mongo projection."""
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    projection = {"_id": 0, key: 1}
+    projection.update({f: 1 for f in requested})
+    return projection
+
+def paged_response(items: list, response: Response, next_cursor: Optional[str], projected: bool):
+    """Return a page, skipping response_model validation for partial documents."""
+    if FAST_JSON_RESPONSES:
+        response = FastJSONResponse(items, headers=cache_headers(response))
+    elif projected:
+        response = JSONResponse(jsonable_encoder(items), headers=cache_headers(response))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response if projected or FAST_JSON_RESPONSES else items
+
+@api_router.get("/assets", response_model=List[Asset])
+async def get_assets(
+    request: Request,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+    fields: Optional[str] = None,
+    user: UserResponse = Depends(get_current_user)
+):
+    """List assets ordered by asset_id; pass ``limit``/``after`` to page through them."""
+    not_modified = await conditional(request, response, "assets")
+    if not_modified:
+        return not_modified
+    projection = parse_projection(fields, Asset, "asset_id")
+    if projection is None and FAST_JSON_RESPONSES:
+        projection = model_projection(Asset)
+    query = {"asset_id": {"$gt": after}} if after else {}
+    cursor = db.assets.find(query, projection or {"_id": 0}).sort("asset_id", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    elif FAST_JSON_RESPONSES:
+        return list_response(cursor, response)
+    assets = await cursor.to_list(limit)
+    next_cursor = assets[-1]["asset_id"] if limit and len(assets) == limit else None
+    return paged_response(assets, response, next_cursor, projection is not None)
+
+MAP_FIELDS = {"_id": 0, "asset_id": 1, "name": 1, "type": 1, "status": 1, "latitude": 1, "longitude": 1, "health_score": 1}
+CLUSTER_MAX_ZOOM = int(os.environ.get("CLUSTER_MAX_ZOOM", "11"))
+CLUSTER_CELLS_PER_TILE = 4
+
+def asset_geo(latitude: float, longitude: float) -> dict:
+    """GeoJSON point stored alongside latitude/longitude for the 2dsphere index."""
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+def parse_bbox(bbox: str) -> tuple:
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be minLon,minLat,maxLon,maxLat")
+    if not (-180 <= min_lon < max_lon <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise HTTPException(status_code=400, detail="bbox is out of range or inverted")
+    return min_lon, min_lat, max_lon, max_lat
+
+# Above these spans a box polygon stops meaning "this lat/lon box" on a sphere
+BBOX_SPHERE_MAX_LON_SPAN = 90.0
+BBOX_SPHERE_MAX_LAT_SPAN = 45.0
+
+def bbox_query(bbox: tuple) -> dict:
+    """Match assets in a lat/lon box.
+
+    Small boxes use the 2dsphere index. Wide boxes (world and continent
+    views) use a plain lat/lon range: a polygon's edges are great circles,
+    so a wide one bulges past its latitudes and one spanning a hemisphere or
+    the full longitude range is ambiguous or rejected outright.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if max_lon - min_lon >= BBOX_SPHERE_MAX_LON_SPAN or max_lat - min_lat >= BBOX_SPHERE_MAX_LAT_SPAN:
+        return {"longitude": {"$gte": min_lon, "$lte": max_lon},
+                "latitude": {"$gte": min_lat, "$lte": max_lat}}
+    ring = [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]]
+    return {"geo": {"$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [ring]}}}}
+
+async def backfill_asset_geo():
+    """Add the GeoJSON point to assets written before it existed."""
+    result = await db.assets.update_many(
+        {"geo": {"$exists": False}, "latitude": {"$type": "number"}, "longitude": {"$type": "number"}},
+        [{"$set": {"geo": {"type": "Point", "coordinates": ["$longitude", "$latitude"]}}}]
+    )
+    if result.modified_count:
+        logger.info("Added geo point to %d assets", result.modified_count)
+
+@api_router.get("/assets/within")
+async def get_assets_within(
+    bbox: str,
+    status: Optional[str] = None,
+    limit: int = Query(5000, ge=1, le=PAGE_MAX_LIMIT),
+    user: UserResponse = Depends(get_current_user)
+):
+    """Assets inside a bounding box (minLon,minLat,maxLon,maxLat)."""
+    query = bbox_query(parse_bbox(bbox))
+    if status:
+        query["status"] = status
+    return await db.assets.find(query, MAP_FIELDS).limit(limit).to_list(limit)
+
+@api_router.get("/assets/near")
+async def get_assets_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    max_distance: float = Query(10000, gt=0, description="Metres"),
+    limit: int = Query(100, ge=1, le=PAGE_MAX_LIMIT),
+    user: UserResponse = Depends(get_current_user)
+):
+    """Assets within ``max_distance`` metres of a point, nearest first, with distance_m."""
+    pipeline = [
+        {"$geoNear": {
+            "near": {"type": "Point", "coordinates": [lon, lat]},
+            "distanceField": "distance_m",
+            "maxDistance": max_distance,
+            "spherical": True
+        }},
+        {"$limit": limit},
+        {"$project": {**MAP_FIELDS, "distance_m": 1}}
+    ]
+    return await db.assets.aggregate(pipeline).to_list(limit)
+
+@api_router.get("/assets/viewport")
+async def get_assets_viewport(
+    bbox: str,
+    zoom: int = Query(..., ge=0, le=22),
+    user: UserResponse = Depends(get_current_user)
+):
+    """Assets in view, grid-clustered server-side below ``CLUSTER_MAX_ZOOM``.
+
+    Clusters carry their count, centroid and worst status; cells holding a
+    single asset are returned as that asset.
+    """
+    query = bbox_query(parse_bbox(bbox))
+    if zoom > CLUSTER_MAX_ZOOM:
+        assets = await db.assets.find(query, MAP_FIELDS).limit(PAGE_MAX_LIMIT).to_list(PAGE_MAX_LIMIT)
+        return {"zoom": zoom, "clustered": False, "clusters": [], "assets": assets}
+    
+    cell = 360.0 / (2 ** zoom) / CLUSTER_CELLS_PER_TILE
+    pipeline = [
+        {"$match": query},
+        {"$group": {
+            "_id": {
+                "x": {"$floor": {"$divide": ["$longitude", cell]}},
+                "y": {"$floor": {"$divide": ["$latitude", cell]}}
+            },
+            "count": {"$sum": 1},
+            "latitude": {"$avg": "$latitude"},
+            "longitude": {"$avg": "$longitude"},
+            "statuses": {"$addToSet": "$status"},
+            "sample": {"$first": {k: f"${k}" for k in MAP_FIELDS if k != "_id"}}
+        }}
+    ]
+    clusters, assets = [], []
+    for group in await db.assets.aggregate(pipeline).to_list(None):
+        if group["count"] == 1:
+            assets.append(group["sample"])
+            continue
+        worst = next((s for s in ("critical", "warning", "maintenance") if s in group["statuses"]), "operational")
+        clusters.append({
+            "count": group["count"],
+            "latitude": group["latitude"],
+            "longitude": group["longitude"],
+            "status": worst
+        })
+    return {"zoom": zoom, "clustered": True, "clusters": clusters, "assets": assets}
+
+ASSET_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "geojson": "application/geo+json",
+}
+IMPORT_MEDIA_TYPES = {
+    **{media_type: name for name, media_type in ASSET_FORMATS.items()},
+    "application/jsonl": "ndjson",
+    "application/json": "geojson",
+}
+IMPORT_BATCH_SIZE = int(os.environ.get("ASSET_IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_ERRORS = int(os.environ.get("ASSET_IMPORT_MAX_ERRORS", "1000"))
+EXPORT_FIELDS = list(Asset.model_fields)
+
+def import_format(format: Optional[str], content_type: Optional[str]) -> str:
+    if format:
+        if format not in ASSET_FORMATS:
+            raise HTTPException(status_code=400, detail="format must be csv, ndjson or geojson")
+        return format
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type not in IMPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Pass format=csv|ndjson|geojson or a matching Content-Type")
+    return IMPORT_MEDIA_TYPES[media_type]
+
+async def decode_chunks(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+def feature_row(feature: dict) -> tuple:
+    """Flatten a GeoJSON Point feature into an asset row."""
+    geometry = feature.get("geometry") or {}
+    if geometry.get("type") != "Point":
+        return None, ["geometry: only Point features can be imported"]
+    try:
+        longitude, latitude = geometry["coordinates"][:2]
+    except (KeyError, TypeError, ValueError):
+        return None, ["geometry: invalid Point coordinates"]
+    row = dict(feature.get("properties") or {})
+    if feature.get("id") is not None:
+        row.setdefault("asset_id", str(feature["id"]))
+    row.update(latitude=latitude, longitude=longitude)
+    return row, None
+
+def json_row(text: str) -> tuple:
+    try:
+        row = orjson.loads(text)
+    except orjson.JSONDecodeError as e:
+        return None, [f"Invalid JSON: {e}"]
+    if not isinstance(row, dict):
+        return None, ["Expected a JSON object"]
+    if row.get("type") == "Feature":
+        return feature_row(row)
+    return row, None
+
+async def ndjson_lines(chunks):
+    """``(line_number, line)`` for every non-blank line of a chunked body."""
+    buffer, lineno = "", 0
+    async for text in decode_chunks(chunks):
+        buffer += text
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            lineno += 1
+            if line.strip():
+                yield lineno, line
+    if buffer.strip():
+        yield lineno + 1, buffer
+
+async def parse_ndjson_rows(chunks):
+    """One asset object (or GeoJSON feature) per line."""
+    async for _, line in ndjson_lines(chunks):
+        yield json_row(line)
+
+async def parse_csv_rows(chunks):
+    """CSV with a header row; only complete records (balanced quotes) are parsed."""
+    header = None
+    buffer = ""
+
+    def records(text: str):
+        nonlocal header
+        for record in csv.reader(io.StringIO(text, newline="")):
+            if header is None:
+                header = [column.strip() for column in record]
+            elif len(record) > len(header):
+                yield None, [f"Row has {len(record)} columns, header has {len(header)}"]
+            elif any(record):
+                yield {k: v for k, v in zip(header, record) if v != ""}, None
+
+    async for text in decode_chunks(chunks):
+        buffer += text
+        cut = buffer.rfind("\n") + 1
+        if not cut or buffer.count('"', 0, cut) % 2:
+            continue
+        ready, buffer = buffer[:cut], buffer[cut:]
+        for row in records(ready):
+            yield row
+    if buffer.strip():
+        for row in records(buffer):
+            yield row
+
+class GeoJSONFeatureScanner:
+    """Pull complete features out of a FeatureCollection while it is still arriving.
+
+    Only brackets and strings are tracked; each feature's text is handed to
+    orjson once its closing brace has been seen.
+    """
+
+    TOKENS = re.compile(r'["{}\[\]]')
+    STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.S)
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.last_key = None
+        self.in_features = False
+        self.feature_start = None
+
+    def feed(self, text: str) -> List[str]:
+        self.buffer += text
+        features = []
+        while True:
+            match = self.TOKENS.search(self.buffer, self.pos)
+            if not match:
+                self.pos = len(self.buffer)
+                break
+            char, i = match.group(), match.start()
+            if char == '"':
+                string = self.STRING.match(self.buffer, i)
+                if not string:
+                    self.pos = i
+                    break
+                if self.depth == 1:
+                    self.last_key = string.group()[1:-1]
+                self.pos = string.end()
+                continue
+            self.pos = i + 1
+            if char in "{[":
+                self.depth += 1
+                if char == "[" and self.depth == 2 and self.last_key == "features":
+                    self.in_features = True
+                elif char == "{" and self.depth == 3 and self.in_features:
+                    self.feature_start = i
+            else:
+                self.depth -= 1
+                if char == "}" and self.depth == 2 and self.feature_start is not None:
+                    features.append(self.buffer[self.feature_start:i + 1])
+                    self.feature_start = None
+                elif char == "]" and self.depth == 1:
+                    self.in_features = False
+        keep = self.pos if self.feature_start is None else self.feature_start
+        self.buffer = self.buffer[keep:]
+        self.pos -= keep
+        if self.feature_start is not None:
+            self.feature_start = 0
+        return features
+
+async def parse_geojson_rows(chunks):
+    scanner = GeoJSONFeatureScanner()
+    async for text in decode_chunks(chunks):
+        for feature in scanner.feed(text):
+            yield json_row(feature)
+    if scanner.depth != 0 or scanner.buffer.strip():
+        yield None, ["Truncated GeoJSON document"]
+
+IMPORT_PARSERS = {"csv": parse_csv_rows, "ndjson": parse_ndjson_rows, "geojson": parse_geojson_rows}
+
+def validate_asset_row(row: dict) -> tuple:
+    """Return ``(asset_id, fields, defaults, errors)`` for one imported row.
+
+    Only the columns a row actually carries are written to existing assets;
+    ``defaults`` fills the rest when the row creates a new one.
+    """
+    asset_id = str(row.get("asset_id") or "").strip() or None
+    try:
+        asset = AssetCreate.model_validate(row)
+    except ValidationError as e:
+        errors = [f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()]
+        return asset_id, None, None, errors
+    fields = asset.model_dump(exclude_unset=True)
+    fields["geo"] = asset_geo(asset.latitude, asset.longitude)
+    defaults = {k: v for k, v in asset.model_dump().items() if k not in fields}
+    return asset_id or f"AST-{uuid.uuid4().hex[:8].upper()}", fields, defaults, None
+
+def record_import_error(report: dict, row: int, asset_id: Optional[str], errors: List[str]):
+    report["failed"] += 1
+    if len(report["errors"]) < IMPORT_MAX_ERRORS:
+        report["errors"].append({"row": row, "asset_id": asset_id, "errors": errors})
+    else:
+        report["errors_truncated"] = True
+
+async def write_asset_batch(batch: list, report: dict):
+    """Upsert one batch keyed on asset_id; new assets get the same defaults as POST /assets."""
+    now = datetime.now(timezone.utc)
+    on_insert = {"sensors": [], "created_at": now, "last_inspection": now, "next_maintenance": now + timedelta(days=90)}
+    operations = [
+        UpdateOne({"asset_id": asset_id}, {"$set": fields, "$setOnInsert": {**on_insert, **defaults}}, upsert=True)
+        for _, asset_id, fields, defaults in batch
+    ]
+    try:
+        details = (await db.assets.bulk_write(operations, ordered=False)).bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        for error in details.get("writeErrors", []):
+            row, asset_id, _, _ = batch[error["index"]]
+            record_import_error(report, row, asset_id, [error.get("errmsg", "write failed")])
+    report["inserted"] += details.get("nUpserted", 0)
+    report["updated"] += details.get("nMatched", 0)
+
+async def import_asset_rows(rows) -> dict:
+    report = {"rows": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": []}
+    batch = []
+    async for row, errors in rows:
+        report["rows"] += 1
+        asset_id = None
+        if row is not None:
+            asset_id, fields, defaults, errors = validate_asset_row(row)
+        if errors:
+            record_import_error(report, report["rows"], asset_id, errors)
+            continue
+        batch.append((report["rows"], asset_id, fields, defaults))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await write_asset_batch(batch, report)
+            batch = []
+    if batch:
+        await write_asset_batch(batch, report)
+    if report["inserted"] or report["updated"]:
+        if ANALYTICS_MATERIALIZED:
+            await rebuild_asset_summary()
+        # A bulk import touches tiles across every zoom; one generation bump is
+        # cheaper than enumerating them and broadcasting the key list
+        await tile_cache.clear()
+        await collection_versions.bump("assets")
+    return report
+
+def asset_feature(doc: dict) -> dict:
+    properties = {k: v for k, v in doc.items() if k not in ("latitude", "longitude")}
+    return {
+        "type": "Feature",
+        "id": doc["asset_id"],
+        "geometry": {"type": "Point", "coordinates": [doc["longitude"], doc["latitude"]]},
+        "properties": properties
+    }
+
+def csv_value(value) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return "|".join(str(v) for v in value)
+    return "" if value is None else str(value)
+
+async def encoded_chunks(cursor, encode):
+    chunk = []
+    async for doc in cursor:
+        chunk.append(encode(doc))
+        if len(chunk) >= STREAM_CHUNK_DOCS:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+async def export_ndjson(cursor):
+    options = ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE
+    async for chunk in encoded_chunks(cursor, lambda doc: orjson.dumps(doc, option=options)):
+        yield b"".join(chunk)
 
-@api_router.get("/assets", response_model=List[Asset])
-async def get_assets(user: UserResponse = Depends(get_current_user)):
-    assets = await db.assets.find({}, {"_id": 0}).to_list(1000)
-    for asset in assets:
-        for field in ["last_inspection", "next_maintenance", "created_at"]:
-            if isinstance(asset.get(field), str):
-                asset[field] = datetime.fromisoformat(asset[field])
-    return assets
+async def export_geojson(cursor):
+    yield b'{"type":"FeatureCollection","features":['
+    separator = b""
+    async for chunk in encoded_chunks(cursor, lambda doc: orjson.dumps(asset_feature(doc), option=ORJSON_OPTIONS)):
+        yield separator + b",".join(chunk)
+        separator = b","
+    yield b"]}"
+
+async def export_csv(cursor):
+    def rows(records: list) -> bytes:
+        out = io.StringIO()
+        csv.writer(out, lineterminator="\n").writerows(records)
+        return out.getvalue().encode()
+    yield rows([EXPORT_FIELDS])
+    async for chunk in encoded_chunks(cursor, lambda doc: [csv_value(doc.get(f)) for f in EXPORT_FIELDS]):
+        yield rows(chunk)
+
+ASSET_EXPORTERS = {"csv": export_csv, "ndjson": export_ndjson, "geojson": export_geojson}
+
+@api_router.post("/assets/import")
+async def import_assets(
+    request: Request,
+    format: Optional[str] = None,
+    user: UserResponse = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER]))
+):
+    """Bulk upsert assets from a CSV, NDJSON or GeoJSON request body, keyed on asset_id.
+
+    The body is parsed as it arrives and written in ``ASSET_IMPORT_BATCH_SIZE``
+    batches; rows that fail validation or the write are listed in ``errors``
+    by their 1-based row number.
+    """
+    fmt = import_format(format, request.headers.get("content-type"))
+    report = await import_asset_rows(IMPORT_PARSERS[fmt](request.stream()))
+    return {"format": fmt, **report}
+
+@api_router.get("/assets/export")
+async def export_assets(
+    format: str = Query("ndjson", pattern="^(csv|ndjson|geojson)$"),
+    user: UserResponse = Depends(get_current_user)
+):
+    """Stream every asset as CSV, NDJSON or a GeoJSON FeatureCollection."""
+    cursor = db.assets.find({}, model_projection(Asset)).sort("asset_id", 1)
+    return StreamingResponse(
+        ASSET_EXPORTERS[format](cursor),
+        media_type=ASSET_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="assets.{format}"'}
+    )
 
 @api_router.get("/assets/{asset_id}", response_model=Asset)
-async def get_asset(asset_id: str, user: UserResponse = Depends(get_current_user)):
+async def get_asset(
+    asset_id: str,
+    request: Request,
+    response: Response,
+    user: UserResponse = Depends(get_current_user)
+):
+    not_modified = await conditional(request, response, "assets")
+    if not_modified:
+        return not_modified
     asset = await db.assets.find_one({"asset_id": asset_id}, {"_id": 0})
     if not asset:
         raise HTTPException(status_code=404, detail="Asset not found")
-    for field in ["last_inspection", "next_maintenance", "created_at"]:
-        if isinstance(asset.get(field), str):
-            asset[field] = datetime.fromisoformat(asset[field])
     return asset
 
 @api_router.post("/assets", response_model=Asset)
@@ -348,10 +2387,11 @@ async def create_asset(
     )
     
     doc = asset.model_dump()
-    for field in ["last_inspection", "next_maintenance", "created_at"]:
-        doc[field] = doc[field].isoformat()
-    
+    doc["geo"] = asset_geo(asset.latitude, asset.longitude)
     await db.assets.insert_one(doc)
+    await apply_asset_summary_delta(new=doc)
+    await invalidate_asset_tiles(doc)
+    await collection_versions.bump("assets")
     return asset
 
 @api_router.put("/assets/{asset_id}", response_model=Asset)
@@ -360,17 +2400,21 @@ async def update_asset(
     asset_data: AssetCreate,
     user: UserResponse = Depends(require_role([UserRole.ADMIN, UserRole.MANAGER]))
 ):
-    existing = await db.assets.find_one({"asset_id": asset_id}, {"_id": 0})
+    update_data = asset_data.model_dump()
+    update_data["geo"] = asset_geo(asset_data.latitude, asset_data.longitude)
+    # The summary delta needs the document this write replaced, not one read beforehand
+    existing = await db.assets.find_one_and_update(
+        {"asset_id": asset_id},
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
     if not existing:
         raise HTTPException(status_code=404, detail="Asset not found")
-    
-    update_data = asset_data.model_dump()
-    await db.assets.update_one({"asset_id": asset_id}, {"$set": update_data})
-    
-    updated = await db.assets.find_one({"asset_id": asset_id}, {"_id": 0})
-    for field in ["last_inspection", "next_maintenance", "created_at"]:
-        if isinstance(updated.get(field), str):
-            updated[field] = datetime.fromisoformat(updated[field])
+    updated = {**existing, **update_data}
+    await apply_asset_summary_delta(old=existing, new=updated)
+    await invalidate_asset_tiles(existing, updated)
+    await collection_versions.bump("assets")
     return Asset(**updated)
 
 @api_router.delete("/assets/{asset_id}")
@@ -378,29 +2422,311 @@ async def delete_asset(
     asset_id: str,
     user: UserResponse = Depends(require_role([UserRole.ADMIN]))
 ):
-    result = await db.assets.delete_one({"asset_id": asset_id})
-    if result.deleted_count == 0:
+    deleted = await db.assets.find_one_and_delete({"asset_id": asset_id}, projection={"_id": 0})
+    if not deleted:
         raise HTTPException(status_code=404, detail="Asset not found")
+    await apply_asset_summary_delta(old=deleted)
+    await invalidate_asset_tiles(deleted)
+    await collection_versions.bump("assets")
     return {"message": "Asset deleted"}
 
+# ============== ASSET TILES ==============
+
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+TILE_MAX_ZOOM = 18
+TILE_LAYER = "assets"
+TILE_PROPERTIES = ["asset_id", "name", "type", "status", "health_score"]
+MERCATOR_MAX_LAT = 85.0511287798
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def _field(number: int, payload: bytes) -> bytes:
+    """Length-delimited protobuf field."""
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 31)
+
+def _mvt_value(value) -> bytes:
+    if isinstance(value, bool):
+        return _varint(7 << 3) + _varint(int(value))
+    if isinstance(value, int):
+        return _varint(6 << 3) + _varint((value << 1) ^ (value >> 63))
+    if isinstance(value, float):
+        return _varint(3 << 3 | 1) + struct.pack("<d", value)
+    return _field(1, str(value).encode())
+
+def encode_point_tile(layer: str, features: List[tuple]) -> bytes:
+    """Encode (x, y, properties) points as a Mapbox Vector Tile (spec v2) layer."""
+    keys, key_index, values, value_index = [], {}, [], {}
+    encoded = []
+    for feature_id, (x, y, properties) in enumerate(features, start=1):
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            value_key = (type(value).__name__, value)
+            if value_key not in value_index:
+                value_index[value_key] = len(values)
+                values.append(value)
+            tags += [key_index[key], value_index[value_key]]
+        geometry = [9, _zigzag(x), _zigzag(y)]  # MoveTo(1)
+        feature = _varint(1 << 3) + _varint(feature_id)
+        feature += _field(2, b"".join(_varint(t) for t in tags))
+        feature += _varint(3 << 3) + _varint(1)  # GeomType.POINT
+        feature += _field(4, b"".join(_varint(g) for g in geometry))
+        encoded.append(_field(2, feature))
+    body = _varint(15 << 3) + _varint(2) + _field(1, layer.encode()) + b"".join(encoded)
+    body += b"".join(_field(3, k.encode()) for k in keys)
+    body += b"".join(_field(4, _mvt_value(v)) for v in values)
+    body += _varint(5 << 3) + _varint(TILE_EXTENT)
+    return _field(3, body)
+
+def lonlat_to_tile(longitude: float, latitude: float, z: int) -> tuple:
+    """Fractional web-mercator tile coordinates of a point at zoom ``z``."""
+    n = 2 ** z
+    latitude = max(-MERCATOR_MAX_LAT, min(MERCATOR_MAX_LAT, latitude))
+    x = (longitude + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2.0 * n
+    return x, y
+
+def tile_bounds(z: int, x: int, y: int) -> tuple:
+    """(min_lon, min_lat, max_lon, max_lat) of a web-mercator tile."""
+    n = 2 ** z
+    def lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+class TileCache:
+    """Two-level (memory LRU + disk) cache for rendered tiles.
+
+    Invalidations are broadcast over shared state, so other workers (and
+    other nodes, with their own disk cache) drop the same tiles. Each one
+    also bumps a shared generation; a render started before it is not
+    cached, since it may have read the assets before the change.
+    """
+
+    CHANNEL = "tiles-invalidated"
+    GENERATION = "tiles:generation"
+
+    def __init__(self, directory: Path, state, max_memory: int = 2048):
+        self.directory = directory
+        self.state = state
+        self.max_memory = max_memory
+        self._drops: set = set()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stale_puts = 0
+        self._memory: "OrderedDict[tuple, bytes]" = OrderedDict()
+
+    def _path(self, key: tuple) -> Path:
+        z, x, y = key
+        return self.directory / str(z) / str(x) / f"{y}.mvt"
+
+    def _remember(self, key: tuple, data: bytes):
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: tuple) -> Optional[bytes]:
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return data
+        path = self._path(key)
+        try:
+            data = await asyncio.to_thread(path.read_bytes)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self._remember(key, data)
+        return data
+
+    async def generation(self) -> int:
+        return await self.state.get(self.GENERATION) or 0
+
+    async def put(self, key: tuple, data: bytes, generation: Optional[int] = None):
+        """Store a rendered tile unless an invalidation has happened since ``generation`` was read."""
+        if generation is not None and await self.generation() != generation:
+            self.stale_puts += 1
+            return
+        self._remember(key, data)
+        path = self._path(key)
+        def write():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        await asyncio.to_thread(write)
+        # An invalidation that landed during the write may have dropped the tile before it existed
+        if generation is not None and await self.generation() != generation:
+            self.stale_puts += 1
+            await self._drop([key])
+
+    async def invalidate(self, keys: List[tuple]):
+        await self.state.incr(self.GENERATION)
+        await self._drop(keys)
+        await self.state.publish(self.CHANNEL, {"origin": worker_id, "keys": keys})
+
+    async def clear(self):
+        await self.state.incr(self.GENERATION)
+        await self._drop(None)
+        await self.state.publish(self.CHANNEL, {"origin": worker_id, "keys": None})
+
+    async def _drop(self, keys: Optional[List[tuple]]):
+        if keys is None:
+            self._memory.clear()
+            def remove():
+                for path in self.directory.glob("*/*/*.mvt"):
+                    path.unlink(missing_ok=True)
+        else:
+            for key in keys:
+                self._memory.pop(key, None)
+            def remove():
+                for key in keys:
+                    self._path(key).unlink(missing_ok=True)
+        await asyncio.to_thread(remove)
+
+    def _on_invalidated(self, message: dict):
+        if message["origin"] == worker_id:
+            return
+        keys = None if message["keys"] is None else [tuple(key) for key in message["keys"]]
+        task = asyncio.create_task(self._drop(keys))
+        self._drops.add(task)
+        task.add_done_callback(self._drops.discard)
+
+    async def start(self):
+        await self.state.subscribe(self.CHANNEL, self._on_invalidated)
+
+    async def stop(self):
+        await self.state.unsubscribe(self.CHANNEL, self._on_invalidated)
+
+    def stats(self) -> dict:
+        return {
+            "memory_tiles": len(self._memory),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stale_puts": self.stale_puts
+        }
+
+tile_cache = TileCache(Path(os.environ.get("TILE_CACHE_DIR", str(ROOT_DIR / "tile_cache"))), shared_state)
+
+def tiles_for_asset(asset: Optional[dict]) -> List[tuple]:
+    """Every tile, at every zoom, whose buffered area contains the asset."""
+    if not asset or asset.get("latitude") is None or asset.get("longitude") is None:
+        return []
+    keys = []
+    margin = TILE_BUFFER / TILE_EXTENT
+    for z in range(TILE_MAX_ZOOM + 1):
+        fx, fy = lonlat_to_tile(asset["longitude"], asset["latitude"], z)
+        n = 2 ** z
+        for x in {int(fx - margin), int(fx), int(fx + margin)}:
+            for y in {int(fy - margin), int(fy), int(fy + margin)}:
+                if 0 <= x < n and 0 <= y < n:
+                    keys.append((z, x, y))
+    return keys
+
+async def invalidate_asset_tiles(*assets: Optional[dict]):
+    keys = sorted({key for asset in assets for key in tiles_for_asset(asset)})
+    if keys:
+        await tile_cache.invalidate(keys)
+
+async def render_asset_tile(z: int, x: int, y: int) -> bytes:
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(z, x, y)
+    pad_lon = (max_lon - min_lon) * TILE_BUFFER / TILE_EXTENT
+    pad_lat = (max_lat - min_lat) * TILE_BUFFER / TILE_EXTENT
+    query = bbox_query((max(min_lon - pad_lon, -180.0), max(min_lat - pad_lat, -90.0),
+                        min(max_lon + pad_lon, 180.0), min(max_lat + pad_lat, 90.0)))
+    features = []
+    async for asset in db.assets.find(query, MAP_FIELDS):
+        fx, fy = lonlat_to_tile(asset["longitude"], asset["latitude"], z)
+        px, py = round((fx - x) * TILE_EXTENT), round((fy - y) * TILE_EXTENT)
+        if -TILE_BUFFER <= px <= TILE_EXTENT + TILE_BUFFER and -TILE_BUFFER <= py <= TILE_EXTENT + TILE_BUFFER:
+            features.append((px, py, {k: asset.get(k) for k in TILE_PROPERTIES}))
+    return encode_point_tile(TILE_LAYER, features)
+
+@api_router.get("/tiles/assets/{z}/{x}/{y}.mvt")
+async def get_asset_tile(z: int, x: int, y: int, user: UserResponse = Depends(get_current_user)):
+    """Asset layer as a Mapbox Vector Tile, served from the memory/disk tile cache."""
+    if not 0 <= z <= TILE_MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    key = (z, x, y)
+    data = await tile_cache.get(key)
+    if data is None:
+        generation = await tile_cache.generation()
+        data = await render_asset_tile(z, x, y)
+        await tile_cache.put(key, data, generation)
+    return Response(
+        content=data,
+        media_type="application/vnd.mapbox-vector-tile",
+        headers={"Cache-Control": "private, max-age=60"}
+    )
+
 # ============== ALERTS ENDPOINTS ==============
 
 @api_router.get("/alerts", response_model=List[Alert])
 async def get_alerts(
+    request: Request,
+    response: Response,
     status: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT),
+    fields: Optional[str] = None,
     user: UserResponse = Depends(get_current_user)
 ):
+    """List alerts newest first; pass ``limit``/``before`` to page.
+
+    The cursor is ``<created_at>|<alert_id>`` of the last alert on the previous
+    page, so alerts sharing a timestamp are not skipped at a page boundary.
+    """
+    not_modified = await conditional(request, response, "alerts")
+    if not_modified:
+        return not_modified
+    projection = parse_projection(fields, Alert, "alert_id")
+    if projection is not None:
+        projection["created_at"] = 1
+    elif FAST_JSON_RESPONSES:
+        projection = model_projection(Alert)
     query = {}
     if status:
         query["status"] = status
+    if before:
+        created, _, alert_id = before.partition("|")
+        try:
+            created_at = datetime.fromisoformat(created.replace(" ", "+"))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid before cursor")
+        if alert_id:
+            query["$or"] = [{"created_at": {"$lt": created_at}}, {"created_at": created_at, "alert_id": {"$lt": alert_id}}]
+        else:
+            query["created_at"] = {"$lt": created_at}
     
-    alerts = await db.alerts.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    for alert in alerts:
-        if isinstance(alert.get("created_at"), str):
-            alert["created_at"] = datetime.fromisoformat(alert["created_at"])
-        if alert.get("resolved_at") and isinstance(alert["resolved_at"], str):
-            alert["resolved_at"] = datetime.fromisoformat(alert["resolved_at"])
-    return alerts
+    cursor = db.alerts.find(query, projection or {"_id": 0}).sort([("created_at", -1), ("alert_id", -1)])
+    if limit:
+        cursor = cursor.limit(limit)
+    elif FAST_JSON_RESPONSES:
+        return list_response(cursor, response)
+    alerts = await cursor.to_list(limit)
+    next_cursor = f"{as_datetime(alerts[-1]['created_at']).isoformat()}|{alerts[-1]['alert_id']}" if limit and len(alerts) == limit else None
+    return paged_response(alerts, response, next_cursor, projection is not None)
 
 @api_router.put("/alerts/{alert_id}/acknowledge")
 async def acknowledge_alert(
@@ -413,6 +2739,7 @@ async def acknowledge_alert(
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Alert not found")
+    await collection_versions.bump("alerts")
     return {"message": "Alert acknowledged"}
 
 @api_router.put("/alerts/{alert_id}/resolve")
@@ -422,81 +2749,1243 @@ async def resolve_alert(
 ):
     result = await db.alerts.update_one(
         {"alert_id": alert_id},
-        {"$set": {"status": "resolved", "resolved_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"status": "resolved", "resolved_at": datetime.now(timezone.utc)}, "$unset": {"open": ""}}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Alert not found")
+    await collection_versions.bump("alerts")
     return {"message": "Alert resolved"}
 
+# ============== SENSOR STORAGE ==============
+
+def _retention_days(name: str, default: str) -> float:
+    return float(os.environ.get(name, default))
+
+# Storage tiers from finest to coarsest; retention_days == 0 keeps data forever
+SENSOR_TIERS = [
+    {"name": "raw", "collection": "sensor_readings", "step": 0,
+     "retention_days": _retention_days("SENSOR_RETENTION_RAW_DAYS", "7")},
+    {"name": "1m", "collection": "sensor_readings_1m", "step": 60, "unit": "minute",
+     "retention_days": _retention_days("SENSOR_RETENTION_1M_DAYS", "90")},
+    {"name": "1h", "collection": "sensor_readings_1h", "step": 3600, "unit": "hour",
+     "retention_days": _retention_days("SENSOR_RETENTION_1H_DAYS", "0")},
+]
+SENSOR_META_FIELDS = ("asset_id", "sensor_id", "type", "unit")
+
+def reading_to_doc(reading: SensorReading) -> dict:
+    """Shape a reading for the time-series collection (identity fields under ``meta``)."""
+    data = reading.model_dump()
+    return {"timestamp": data["timestamp"], "value": data["value"], "meta": {f: data[f] for f in SENSOR_META_FIELDS}}
+
+def flatten_reading(doc: dict) -> dict:
+    doc.update(doc.pop("meta", {}))
+    return doc
+
+def select_sensor_tier(resolution: Optional[float]) -> dict:
+    """Pick the coarsest tier whose step evenly divides the requested resolution (seconds)."""
+    chosen = SENSOR_TIERS[0]
+    for tier in SENSOR_TIERS[1:]:
+        if resolution and resolution >= tier["step"] and resolution % tier["step"] == 0:
+            chosen = tier
+    return chosen
+
+def rollup_values(source: dict) -> dict:
+    """$group accumulators folding ``source`` tier documents into min/max/sum/count."""
+    if source["step"] == 0:
+        return {"min": {"$min": "$value"}, "max": {"$max": "$value"},
+                "sum": {"$sum": "$value"}, "count": {"$sum": 1}}
+    return {"min": {"$min": "$min"}, "max": {"$max": "$max"},
+            "sum": {"$sum": "$sum"}, "count": {"$sum": "$count"}}
+
+async def sensor_tier_spans(tier: dict, start: datetime, end: datetime) -> list:
+    """Split [start, end) into (tier, start, end) spans, coarsest first.
+
+    A rollup tier only holds buckets up to its watermark; the rest of the
+    range (at least the current, unfinished bucket) comes from the next finer
+    tier, down to the raw readings.
+    """
+    watermarks = {}
+    async for state in db.sensor_rollup_state.find({}):
+        watermark = state["watermark"]
+        watermarks[state["_id"]] = watermark if watermark.tzinfo else watermark.replace(tzinfo=timezone.utc)
+    spans = []
+    for source in reversed(SENSOR_TIERS[:SENSOR_TIERS.index(tier) + 1]):
+        edge = end if source["step"] == 0 else min(end, watermarks.get(source["name"], start))
+        if edge > start:
+            spans.append((source, start, edge))
+            start = edge
+    return spans
+
+async def rollup_sensor_buckets(match: dict, tier: dict, start: datetime, end: datetime,
+                                group_id, extra: Optional[dict] = None) -> list:
+    """Group readings in [start, end) by ``group_id`` across ``tier`` and the finer tiers behind it.
+
+    Buckets that straddle a span boundary are merged, so the result matches
+    grouping the raw readings directly.
+    """
+    buckets = {}
+    for source, lo, hi in await sensor_tier_spans(tier, start, end):
+        pipeline = [
+            {"$match": {**match, "timestamp": {"$gte": lo, "$lt": hi}}},
+            {"$group": {"_id": group_id, **rollup_values(source), **(extra or {})}}
+        ]
+        async for bucket in db[source["collection"]].aggregate(pipeline):
+            key = tuple(sorted(bucket["_id"].items())) if isinstance(bucket["_id"], dict) else bucket["_id"]
+            merged = buckets.get(key)
+            if merged is None:
+                buckets[key] = bucket
+                continue
+            merged["min"] = min(merged["min"], bucket["min"])
+            merged["max"] = max(merged["max"], bucket["max"])
+            merged["sum"] += bucket["sum"]
+            merged["count"] += bucket["count"]
+    return list(buckets.values())
+
+async def sensor_collection_is_timeseries(name: str) -> bool:
+    infos = await (await db.list_collections(filter={"name": name})).to_list(None)
+    return bool(infos) and infos[0].get("type") == "timeseries"
+
+async def ensure_sensor_collections():
+    """Create the raw time-series collection and rollup collections with their retention."""
+    existing = set(await db.list_collection_names())
+    for tier in SENSOR_TIERS:
+        name = tier["collection"]
+        expire = int(tier["retention_days"] * 86400) or None
+        if tier["step"] == 0:
+            if name not in existing:
+                options = {"timeseries": {"timeField": "timestamp", "metaField": "meta", "granularity": "seconds"}}
+                if expire:
+                    options["expireAfterSeconds"] = expire
+                await db.create_collection(name, **options)
+            elif not await sensor_collection_is_timeseries(name):
+                logger.warning("%s is a regular collection from an older release; run "
+                               "`python server.py migrate-sensor-readings` to convert it", name)
+            elif expire:
+                await db.command("collMod", name, expireAfterSeconds=expire)
+            continue
+        if not expire:
+            continue
+        try:
+            await db[name].create_index([("timestamp", ASCENDING)], name="retention", expireAfterSeconds=expire)
+        except OperationFailure:
+            await db.command("collMod", name, index={"name": "retention", "expireAfterSeconds": expire})
+
+class SensorRollupWorker:
+    """Periodically rolls raw readings up into the 1-minute and 1-hour tiers.
+
+    Each run recomputes every bucket from the tier's watermark (minus
+    ``lateness`` seconds, to absorb late readings) up to the last complete
+    bucket and upserts the results with $merge, so reruns are idempotent.
+    """
+
+    def __init__(self, interval: float = 60.0, lateness: float = 120.0):
+        self.interval = interval
+        self.lateness = lateness
+        self.runs = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Sensor rollup failed")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, now: Optional[datetime] = None):
+        now = now or datetime.now(timezone.utc)
+        for source, tier in zip(SENSOR_TIERS, SENSOR_TIERS[1:]):
+            step = tier["step"]
+            end = datetime.fromtimestamp(now.timestamp() // step * step, timezone.utc)
+            state = await db.sensor_rollup_state.find_one({"_id": tier["name"]})
+            if state:
+                start = state["watermark"] - timedelta(seconds=max(self.lateness, step))
+            else:
+                start = end - timedelta(days=source["retention_days"] or 1)
+            start = datetime.fromtimestamp(start.timestamp() // step * step, timezone.utc)
+            if start < end:
+                await db[source["collection"]].aggregate(self._pipeline(source, tier, start, end)).to_list(None)
+            await db.sensor_rollup_state.update_one({"_id": tier["name"]}, {"$set": {"watermark": end}}, upsert=True)
+        self.runs += 1
+
+    @staticmethod
+    def _pipeline(source: dict, tier: dict, start: datetime, end: datetime) -> list:
+        return [
+            {"$match": {"timestamp": {"$gte": start, "$lt": end}}},
+            {"$group": {
+                "_id": {
+                    "asset_id": "$meta.asset_id",
+                    "sensor_id": "$meta.sensor_id",
+                    "type": "$meta.type",
+                    "timestamp": {"$dateTrunc": {"date": "$timestamp", "unit": tier["unit"]}}
+                },
+                "unit": {"$first": "$meta.unit"},
+                **rollup_values(source)
+            }},
+            {"$project": {
+                "timestamp": "$_id.timestamp",
+                "meta": {"asset_id": "$_id.asset_id", "sensor_id": "$_id.sensor_id", "type": "$_id.type", "unit": "$unit"},
+                "min": 1, "max": 1, "sum": 1, "count": 1,
+                "avg": {"$divide": ["$sum", "$count"]}
+            }},
+            {"$merge": {"into": tier["collection"], "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ]
+
+sensor_rollups = SensorRollupWorker(
+    interval=float(os.environ.get("SENSOR_ROLLUP_INTERVAL", "60"))
+)
+
+# ============== ALERT ENGINE ==============
+
+SENSOR_LABELS = {
+    "water_level": "Waterstand",
+    "pressure": "Druk",
+    "temperature": "Temperatuur",
+    "vibration": "Trilling",
+    "wind_speed": "Windsnelheid",
+}
+
+# Per sensor type: (low, high) warning/critical bands and max change per second
+SENSOR_RULES = {
+    "water_level": {"warning": (None, 3.0), "critical": (None, 3.5), "max_rate": 0.01},
+    "pressure": {"warning": (975.0, 1030.0), "critical": (960.0, 1045.0), "max_rate": 0.5},
+    "temperature": {"warning": (-5.0, 30.0), "critical": (-15.0, 40.0), "max_rate": 0.05},
+    "vibration": {"warning": (None, 2.5), "critical": (None, 4.0), "max_rate": 0.5},
+    "wind_speed": {"warning": (None, 60.0), "critical": (None, 90.0), "max_rate": 5.0},
+}
+
+def _outside(values: np.ndarray, band) -> np.ndarray:
+    low, high = band
+    mask = np.zeros(len(values), dtype=bool)
+    if low is not None:
+        mask |= values < low
+    if high is not None:
+        mask |= values > high
+    return mask
+
+ALERT_RULES = ("critical", "warning", "rate_of_change", "zscore", "ewma_drift")
+
+def sensor_bands(sensor_type: str) -> tuple:
+    """(warning low, warning high, critical low, critical high, max rate), open-ended as +-inf."""
+    rules = SENSOR_RULES.get(sensor_type)
+    if rules is None:
+        return (-np.inf, np.inf, -np.inf, np.inf, np.inf)
+    (warn_lo, warn_hi), (crit_lo, crit_hi) = rules["warning"], rules["critical"]
+    return (
+        -np.inf if warn_lo is None else warn_lo, np.inf if warn_hi is None else warn_hi,
+        -np.inf if crit_lo is None else crit_lo, np.inf if crit_hi is None else crit_hi,
+        rules["max_rate"]
+    )
+
+class AlertEngine:
+    """Evaluates batches of readings against threshold and anomaly rules.
+
+    Rules per (asset, sensor): static warning/critical bands, rate of change,
+    rolling z-score against the previous ``window`` readings, and EWMA drift
+    away from that window's mean. Per-sensor state lives in row-per-sensor
+    arrays (a ring buffer of the last ``window`` values plus the previous
+    reading and EWMA). A batch is evaluated along the time axis of every
+    sensor at once: each reading gathers its preceding window from the
+    sensor's history and the batch, so the cost follows the batch size
+    whether it holds one reading per sensor or a backfill for one sensor.
+    An alert is only written when no open alert exists for the same asset,
+    sensor and rule; a partial unique index enforces that across workers.
+    """
+
+    def __init__(self, window: int = 120, min_periods: int = 30, zscore: float = 4.0,
+                 ewma_alpha: float = 0.05, drift: float = 3.0, dedupe_ttl: float = 60.0):
+        self.window = window
+        self.min_periods = min_periods
+        self.zscore = zscore
+        self.ewma_alpha = ewma_alpha
+        self.drift = drift
+        self.dedupe_ttl = dedupe_ttl
+        self.evaluated = 0
+        self.eval_seconds = 0.0
+        self.raised = 0
+        self.suppressed = 0
+        self._rows: dict = {}
+        self._keys: list = []
+        self._units: list = []
+        self._hist = np.zeros((0, window))
+        self._count = np.zeros(0, dtype=np.int64)
+        self._last_time = np.zeros(0)
+        self._last_value = np.zeros(0)
+        self._last_ewma = np.zeros(0)
+        self._bands = np.zeros((0, 5))
+        self._open: dict = {}
+
+    def _grow(self, capacity: int):
+        size = len(self._keys)
+        for name in ("_hist", "_count", "_last_time", "_last_value", "_last_ewma", "_bands"):
+            array = getattr(self, name)
+            grown = np.zeros((capacity, *array.shape[1:]), dtype=array.dtype)
+            grown[:size] = array[:size]
+            setattr(self, name, grown)
+
+    def _row(self, key: tuple, unit: str) -> int:
+        row = len(self._keys)
+        if row == len(self._count):
+            self._grow(max(1024, row * 2))
+        self._rows[key] = row
+        self._keys.append(key)
+        self._units.append(unit)
+        self._bands[row] = sensor_bands(key[2])
+        return row
+
+    def evaluate(self, docs: List[dict]) -> List[dict]:
+        """Return one trigger per (asset, sensor, rule) violated in this batch."""
+        started = time.perf_counter()
+        n = len(docs)
+        if not n:
+            return []
+        rows = np.empty(n, dtype=np.int64)
+        times = np.empty(n, dtype=np.float64)
+        values = np.empty(n, dtype=np.float64)
+        lookup = self._rows
+        for i, doc in enumerate(docs):
+            meta = doc["meta"]
+            key = (meta["asset_id"], meta["sensor_id"], meta["type"])
+            row = lookup.get(key)
+            rows[i] = self._row(key, meta.get("unit", "")) if row is None else row
+            times[i] = doc["timestamp"].timestamp()
+            values[i] = doc["value"]
+        
+        # Sort by sensor then time, and number each sensor's readings 0, 1, 2, ...
+        order = np.lexsort((times, rows))
+        rows, times, values = rows[order], times[order], values[order]
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        sizes = np.diff(np.r_[starts, n])
+        rank = np.arange(n) - np.repeat(starts, sizes)
+        local = np.repeat(np.arange(len(starts)), sizes)
+        group_rows = rows[starts]
+        count = self._count[group_rows]
+        
+        # Bands and rate of change against the previous reading, stored or in this batch
+        bands = self._bands[rows]
+        critical = (values < bands[:, 2]) | (values > bands[:, 3])
+        warning = ((values < bands[:, 0]) | (values > bands[:, 1])) & ~critical
+        first = rank == 0
+        seen = (count[local] + rank) > 0
+        previous_time = np.where(first, self._last_time[rows], np.r_[0.0, times[:-1]])
+        previous_value = np.where(first, self._last_value[rows], np.r_[0.0, values[:-1]])
+        elapsed = np.maximum(times - previous_time, 1e-3)
+        rate = seen & (np.abs(values - previous_value) / elapsed > bands[:, 4])
+        
+        mean, std = self._window_stats(group_rows, count, local, rank, sizes, values)
+        smoothed = self._smooth(group_rows, count, local, rank, starts, values)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            valid = np.isfinite(std) & (std > 1e-9)
+            zscore = valid & (np.abs(values - mean) / std > self.zscore)
+            drift = valid & (np.abs(smoothed - mean) / std > self.drift)
+        masks = np.column_stack((critical, warning, rate, zscore, drift))
+        
+        # Fold the batch into the per-sensor state; only each sensor's last ``window`` readings reach the ring
+        last = starts + sizes - 1
+        keep = rank >= (sizes - self.window)[local]
+        self._hist[rows[keep], (count[local[keep]] + rank[keep]) % self.window] = values[keep]
+        self._count[group_rows] = count + sizes
+        self._last_time[group_rows] = times[last]
+        self._last_value[group_rows] = values[last]
+        self._last_ewma[group_rows] = smoothed[last]
+        
+        hits = np.add.reduceat(masks.astype(np.int64), starts, axis=0)
+        last_hit = np.maximum.reduceat(np.where(masks, np.arange(n)[:, None], -1), starts, axis=0)
+        triggers = []
+        for group, rule in zip(*np.nonzero(hits)):
+            i = last_hit[group, rule]
+            asset_id, sensor_id, sensor_type = self._keys[rows[i]]
+            triggers.append({
+                "asset_id": asset_id, "sensor_id": sensor_id, "sensor_type": sensor_type,
+                "rule": ALERT_RULES[rule], "value": float(values[i]), "unit": self._units[rows[i]],
+                "count": int(hits[group, rule]),
+                "timestamp": datetime.fromtimestamp(times[i], timezone.utc)
+            })
+        self.evaluated += n
+        self.eval_seconds += time.perf_counter() - started
+        return triggers
+
+    def _window_stats(self, group_rows, count, local, rank, sizes, values) -> tuple:
+        """Mean and std of the ``window`` readings preceding each reading (NaN below ``min_periods``).
+
+        Each sensor's stored history and its new readings are laid out as one
+        chronological segment, and every reading gathers the slice before it.
+        """
+        window = self.window
+        held = np.minimum(count, window)
+        length = held + sizes
+        segment = np.r_[0, np.cumsum(length)[:-1]]
+        sequence = np.empty(length.sum())
+        owner = np.repeat(np.arange(len(held)), held)
+        k = np.arange(len(owner)) - np.repeat(np.cumsum(held) - held, held)
+        sequence[segment[owner] + k] = self._hist[group_rows[owner], (count[owner] - held[owner] + k) % window]
+        position = segment[local] + held[local] + rank
+        sequence[position] = values
+        
+        index = position[:, None] + np.arange(-window, 0)
+        inside = index >= segment[local][:, None]
+        history = np.where(inside, sequence[np.maximum(index, 0)], 0.0)
+        n = inside.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = history.sum(axis=1) / n
+            deviation = np.where(inside, history - mean[:, None], 0.0)
+            std = np.sqrt(np.einsum("ij,ij->i", deviation, deviation) / n)
+        std[n < self.min_periods] = np.nan
+        return mean, std
+
+    def _smooth(self, group_rows, count, local, rank, starts, values) -> np.ndarray:
+        """EWMA of every reading, continuing each sensor's stored EWMA (or starting at its first value).
+
+        Uses the closed form over blocks of readings per sensor, so the loop
+        runs once per block of the longest run rather than once per reading,
+        and the decay weights stay well inside float64 range.
+        """
+        alpha = self.ewma_alpha
+        decay = 1.0 - alpha
+        if decay <= 0:
+            return values.copy()
+        block = 256 if decay >= 1 else max(1, min(256, int(27 / -math.log(decay))))
+        seeds = np.where(count > 0, self._last_ewma[group_rows], values[starts])
+        smoothed = np.empty(len(values))
+        by_block = np.argsort(rank // block, kind="stable")
+        bounds = np.searchsorted(rank[by_block] // block, np.arange(rank.max() // block + 2))
+        for b in range(len(bounds) - 1):
+            idx = by_block[bounds[b]:bounds[b + 1]]
+            groups = local[idx]
+            column = rank[idx] - b * block
+            powers = decay ** (column + 1)
+            # One padded row per sensor, so no sensor's sums pass through another's
+            run = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+            row = np.repeat(np.arange(len(run)), np.diff(np.r_[run, len(idx)]))
+            weighted = np.zeros((len(run), column.max() + 1))
+            weighted[row, column] = values[idx] / powers
+            np.cumsum(weighted, axis=1, out=weighted)
+            smoothed[idx] = powers * (seeds[groups] + alpha * weighted[row, column])
+            ends = np.r_[run[1:], len(idx)] - 1
+            seeds[groups[ends]] = smoothed[idx[ends]]
+        return smoothed
+
+    @staticmethod
+    def build_alert(trigger: dict, asset_name: str) -> dict:
+        label = SENSOR_LABELS.get(trigger["sensor_type"], trigger["sensor_type"])
+        value = f"{round(trigger['value'], 2)} {trigger['unit']}".strip()
+        rule = trigger["rule"]
+        if rule == "critical":
+            alert_type, severity, title = "critical", "critical", f"{label} kritiek"
+            description = f"{label} van {value} overschrijdt de kritieke grens."
+        elif rule == "warning":
+            alert_type, severity, title = "warning", "medium", f"{label} buiten normaal bereik"
+            description = f"{label} van {value} valt buiten het normale bereik."
+        elif rule == "rate_of_change":
+            alert_type, severity, title = "warning", "medium", f"Snelle verandering in {label.lower()}"
+            description = f"{label} verandert sneller dan toegestaan (laatste waarde {value})."
+        elif rule == "zscore":
+            alert_type, severity, title = "predictive", "medium", f"Afwijkende {label.lower()} gedetecteerd"
+            description = f"{label} van {value} wijkt sterk af van het recente patroon."
+        else:
+            alert_type, severity, title = "predictive", "low", f"Geleidelijke drift in {label.lower()}"
+            description = f"{label} drijft weg van het recente gemiddelde (laatste waarde {value})."
+        alert = Alert(
+            asset_id=trigger["asset_id"],
+            asset_name=asset_name,
+            type=alert_type,
+            title=title,
+            description=description,
+            severity=severity,
+            created_at=trigger["timestamp"],
+            rule=f"{trigger['sensor_id']}:{rule}"
+        )
+        return alert.model_dump()
+
+    async def process(self, docs: List[dict]) -> int:
+        """Evaluate readings and write new alerts; returns the number raised."""
+        triggers = self.evaluate(docs)
+        now = time.monotonic()
+        for key in [k for k, stale_at in self._open.items() if stale_at <= now]:
+            del self._open[key]
+        pending = []
+        for trigger in triggers:
+            if (trigger["asset_id"], trigger["sensor_id"], trigger["rule"]) in self._open:
+                self.suppressed += 1
+            else:
+                pending.append(trigger)
+        if not pending:
+            return 0
+        
+        asset_ids = list({t["asset_id"] for t in pending})
+        names = {
+            a["asset_id"]: a["name"]
+            for a in await db.assets.find({"asset_id": {"$in": asset_ids}}, {"_id": 0, "asset_id": 1, "name": 1}).to_list(None)
+        }
+        raised = 0
+        for trigger in pending:
+            alert = self.build_alert(trigger, names.get(trigger["asset_id"], trigger["asset_id"]))
+            try:
+                result = await db.alerts.update_one(
+                    {"asset_id": alert["asset_id"], "rule": alert["rule"], "open": True},
+                    {"$setOnInsert": alert},
+                    upsert=True
+                )
+                inserted = result.upserted_id is not None
+            except DuplicateKeyError:
+                # Another worker opened the same alert between our match and insert
+                inserted = False
+            self._open[(trigger["asset_id"], trigger["sensor_id"], trigger["rule"])] = now + self.dedupe_ttl
+            if inserted:
+                raised += 1
+            else:
+                self.suppressed += 1
+        self.raised += raised
+        if raised:
+            await collection_versions.bump("alerts")
+        return raised
+
+    def stats(self) -> dict:
+        return {
+            "evaluated": self.evaluated,
+            "readings_per_second": round(self.evaluated / self.eval_seconds) if self.eval_seconds else 0,
+            "raised": self.raised,
+            "suppressed": self.suppressed,
+            "tracked_sensors": len(self._keys)
+        }
+
+alert_engine = AlertEngine(
+    window=int(os.environ.get("ALERT_WINDOW", "120")),
+    zscore=float(os.environ.get("ALERT_ZSCORE", "4.0")),
+    ewma_alpha=float(os.environ.get("ALERT_EWMA_ALPHA", "0.05")),
+    drift=float(os.environ.get("ALERT_DRIFT", "3.0"))
+)
+
+# ============== SENSOR SIMULATOR ==============
+
+# Signal shape per sensor type: daily/tidal cycle, slow weather-scale
+# variation and fast noise, each as (amplitude, period or period range in seconds)
+SIMULATED_SENSORS = {
+    "water_level": {"unit": "m", "base": 2.0, "spread": 0.3, "cycle": (1.1, 44712.0),
+                    "slow": (0.2, 3600.0, 6 * 3600.0), "fast": (0.05, 120.0, 1800.0), "gust": 0.0, "decimals": 2},
+    "pressure": {"unit": "hPa", "base": 1000.0, "spread": 5.0, "cycle": (1.0, 43200.0),
+                 "slow": (10.0, 86400.0, 4 * 86400.0), "fast": (0.3, 600.0, 3600.0), "gust": 0.0, "decimals": 1},
+    "temperature": {"unit": "°C", "base": 14.0, "spread": 2.0, "cycle": (5.0, 86400.0),
+                    "slow": (2.0, 6 * 3600.0, 3 * 86400.0), "fast": (0.4, 600.0, 3 * 3600.0), "gust": 0.0, "decimals": 1},
+    "vibration": {"unit": "mm/s", "base": 1.0, "spread": 0.3, "cycle": (0.3, 86400.0),
+                  "slow": (0.2, 1800.0, 4 * 3600.0), "fast": (0.3, 5.0, 120.0), "gust": 0.0, "decimals": 2},
+    "wind_speed": {"unit": "km/h", "base": 22.0, "spread": 5.0, "cycle": (4.0, 86400.0),
+                   "slow": (8.0, 3 * 3600.0, 12 * 3600.0), "fast": (3.0, 10.0, 300.0), "gust": 25.0, "decimals": 1},
+}
+SIMULATOR_COMPONENTS = 3
+
+def sensor_status(sensor_type: str, value: float) -> str:
+    rules = SENSOR_RULES.get(sensor_type)
+    if rules is None:
+        return "normal"
+    if _outside(np.array([value]), rules["critical"])[0]:
+        return "critical"
+    if _outside(np.array([value]), rules["warning"])[0]:
+        return "warning"
+    return "normal"
+
+class SensorSimulator:
+    """Deterministic, seeded simulator for temporally correlated sensor signals.
+
+    Every value is a pure function of (seed, asset_id, sensor type, time):
+    a tidal or diurnal cycle plus sums of sinusoids with per-sensor random
+    periods and phases. Any client, worker or replay therefore sees the same
+    value for the same instant. When ``ingest`` is on, every tracked sensor
+    is sampled each ``interval`` seconds and fed into the ingestion buffer.
+    """
+
+    def __init__(self, seed: int = 42, interval: float = 1.0, synthetic_assets: int = 0, ingest: bool = False):
+        self.seed = seed
+        self.interval = interval
+        self.synthetic_assets = synthetic_assets
+        self.ingest = ingest
+        self.ticks = 0
+        self.generated = 0
+        self.dropped = 0
+        self._params: dict = {}
+        self._tracked: dict = {sensor_type: set() for sensor_type in SIMULATED_SENSORS}
+        self._matrices: dict = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _row(self, asset_id: str, sensor_type: str) -> np.ndarray:
+        key = (asset_id, sensor_type)
+        row = self._params.get(key)
+        if row is None:
+            spec = SIMULATED_SENSORS[sensor_type]
+            rng = np.random.default_rng([self.seed, zlib.crc32(asset_id.encode()), zlib.crc32(sensor_type.encode())])
+            k = SIMULATOR_COMPONENTS
+            row = np.concatenate((
+                [spec["base"] + rng.uniform(-1, 1) * spec["spread"], rng.uniform(0, 2 * np.pi)],
+                rng.uniform(spec["slow"][1], spec["slow"][2], k), rng.uniform(0, 2 * np.pi, k),
+                rng.uniform(spec["fast"][1], spec["fast"][2], k), rng.uniform(0, 2 * np.pi, k)
+            ))
+            self._params[key] = row
+        return row
+
+    @staticmethod
+    def _evaluate(sensor_type: str, params: np.ndarray, t: float) -> np.ndarray:
+        spec = SIMULATED_SENSORS[sensor_type]
+        k = SIMULATOR_COMPONENTS
+        base, phase = params[:, 0], params[:, 1]
+        slow = np.sin(2 * np.pi * t / params[:, 2:2 + k] + params[:, 2 + k:2 + 2 * k]).mean(axis=1)
+        fast = np.sin(2 * np.pi * t / params[:, 2 + 2 * k:2 + 3 * k] + params[:, 2 + 3 * k:2 + 4 * k]).mean(axis=1)
+        cycle_amp, cycle_period = spec["cycle"]
+        values = base + cycle_amp * np.sin(2 * np.pi * t / cycle_period + phase) + spec["slow"][0] * slow + spec["fast"][0] * fast
+        if spec["gust"]:
+            values += spec["gust"] * np.maximum(fast, 0.0) ** 3
+        return np.maximum(values, 0.0) if sensor_type != "temperature" else values
+
+    def value(self, asset_id: str, sensor_type: str, t: Optional[float] = None) -> float:
+        t = time.time() if t is None else t
+        return float(self._evaluate(sensor_type, self._row(asset_id, sensor_type)[None, :], t)[0])
+
+    def snapshot(self, asset_id: str, t: Optional[float] = None) -> dict:
+        """Current values for every simulated sensor on an asset, in the live-data shape."""
+        t = time.time() if t is None else t
+        sensors = {}
+        for sensor_type, spec in SIMULATED_SENSORS.items():
+            value = round(self.value(asset_id, sensor_type, t), spec["decimals"])
+            sensors[sensor_type] = {"value": value, "unit": spec["unit"], "status": sensor_status(sensor_type, value)}
+        return {
+            "asset_id": asset_id,
+            "timestamp": datetime.fromtimestamp(t, timezone.utc).isoformat(),
+            "sensors": sensors
+        }
+
+    def track(self, asset_id: str, sensors: Optional[List[str]] = None):
+        for sensor_type in sensors or SIMULATED_SENSORS:
+            if sensor_type in SIMULATED_SENSORS and asset_id not in self._tracked[sensor_type]:
+                self._tracked[sensor_type].add(asset_id)
+                self._matrices.pop(sensor_type, None)
+
+    def readings(self, t: float) -> List[dict]:
+        """Sample every tracked sensor at time ``t`` as ingest-ready documents."""
+        timestamp = datetime.fromtimestamp(t, timezone.utc)
+        docs = []
+        for sensor_type, asset_ids in self._tracked.items():
+            if not asset_ids:
+                continue
+            # Rows follow the set's iteration order, which holds until track() changes it and drops the matrix
+            matrix = self._matrices.get(sensor_type)
+            if matrix is None:
+                matrix = np.stack([self._row(a, sensor_type) for a in asset_ids])
+                self._matrices[sensor_type] = matrix
+            spec = SIMULATED_SENSORS[sensor_type]
+            values = np.round(self._evaluate(sensor_type, matrix, t), spec["decimals"]).tolist()
+            for asset_id, value in zip(asset_ids, values):
+                docs.append({
+                    "timestamp": timestamp,
+                    "value": value,
+                    "meta": {"asset_id": asset_id, "sensor_id": f"{asset_id}-{sensor_type}", "type": sensor_type, "unit": spec["unit"]}
+                })
+        return docs
+
+    async def load_assets(self):
+        async for asset in db.assets.find({}, {"_id": 0, "asset_id": 1, "sensors": 1}):
+            self.track(asset["asset_id"], asset.get("sensors") or None)
+        for i in range(self.synthetic_assets):
+            self.track(f"SIM-{i:05d}")
+
+    def start(self):
+        if self.ingest and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        await self.load_assets()
+        logger.info("Sensor simulator feeding %d sensors every %.1fs", sum(len(a) for a in self._tracked.values()), self.interval)
+        next_tick = time.time() // self.interval * self.interval
+        while True:
+            next_tick += self.interval
+            await asyncio.sleep(max(0.0, next_tick - time.time()))
+            docs = self.readings(next_tick)
+            self.ticks += 1
+            self.generated += len(docs)
+            if not sensor_ingest.offer(docs):
+                self.dropped += len(docs)
+
+    def stats(self) -> dict:
+        return {
+            "seed": self.seed,
+            "ingest": self.ingest,
+            "interval_seconds": self.interval,
+            "sensors": sum(len(a) for a in self._tracked.values()),
+            "ticks": self.ticks,
+            "generated": self.generated,
+            "dropped": self.dropped
+        }
+
+sensor_simulator = SensorSimulator(
+    seed=int(os.environ.get("SIMULATOR_SEED", "42")),
+    interval=float(os.environ.get("SIMULATOR_INTERVAL", "1.0")),
+    synthetic_assets=int(os.environ.get("SIMULATOR_SYNTHETIC_ASSETS", "0")),
+    ingest=os.environ.get("SIMULATOR_INGEST", "false").lower() in ("1", "true", "yes")
+)
+
+# ============== SENSOR INGESTION ==============
+
+class SensorIngestBuffer:
+    """Buffers incoming readings and writes them with batched insert_many.
+
+    A batch is flushed once ``batch_size`` readings are queued or
+    ``flush_interval`` seconds have passed since the first queued reading.
+    """
+
+    def __init__(self, max_size: int = 100000, batch_size: int = 5000, flush_interval: float = 1.0):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: Optional[asyncio.Queue] = None
+        self.accepted = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.flushed = 0
+        self.failed = 0
+        self.flushes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self.queue = asyncio.Queue(maxsize=self.max_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.queue is not None:
+            remaining = []
+            while not self.queue.empty():
+                remaining.append(self.queue.get_nowait())
+            for i in range(0, len(remaining), self.batch_size):
+                await self._flush(remaining[i:i + self.batch_size])
+
+    def free_slots(self) -> int:
+        if self.queue is None:
+            return 0
+        return self.max_size - self.queue.qsize()
+
+    def offer(self, docs: List[dict]) -> bool:
+        """Queue all docs, or none of them if the buffer lacks room."""
+        if len(docs) > self.free_slots():
+            self.throttled += len(docs)
+            return False
+        for doc in docs:
+            self.queue.put_nowait(doc)
+        self.accepted += len(docs)
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[dict]):
+        if not batch:
+            return
+        self.flushes += 1
+        try:
+            result = await db.sensor_readings.insert_many(batch, ordered=False)
+            self.flushed += len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted = e.details.get("nInserted", 0)
+            self.flushed += inserted
+            self.failed += len(batch) - inserted
+            logger.warning("Sensor flush: %d of %d readings failed", len(batch) - inserted, len(batch))
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Sensor flush of %d readings failed", len(batch))
+            return
+        try:
+            await alert_engine.process(batch)
+        except Exception:
+            logger.exception("Alert evaluation failed")
+
+    def stats(self) -> dict:
+        return {
+            "buffered": self.queue.qsize() if self.queue is not None else 0,
+            "max_size": self.max_size,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "flushes": self.flushes
+        }
+
+sensor_ingest = SensorIngestBuffer(
+    max_size=int(os.environ.get("SENSOR_INGEST_BUFFER", "100000")),
+    batch_size=int(os.environ.get("SENSOR_INGEST_BATCH", "5000")),
+    flush_interval=float(os.environ.get("SENSOR_INGEST_FLUSH_SECONDS", "1.0"))
+)
+
+SENSOR_INGEST_MAX_BYTES = int(os.environ.get("SENSOR_INGEST_MAX_BYTES", str(16 * 1024 * 1024)))
+SENSOR_INGEST_MAX_READINGS = int(os.environ.get("SENSOR_INGEST_MAX_READINGS", "50000"))
+
+async def limited_body(request: Request, max_bytes: int):
+    """The request body as it arrives, failing with 413 once it passes ``max_bytes``."""
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Body exceeds {max_bytes} bytes")
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Body exceeds {max_bytes} bytes")
+        yield chunk
+
+async def sensor_payload_items(request: Request, content_type: str):
+    """``(position, item_or_None, error)`` per reading in an NDJSON or JSON (object or array) body.
+
+    NDJSON is parsed line by line as the body streams in; a JSON document has
+    to arrive whole before it can be parsed.
+    """
+    body = limited_body(request, SENSOR_INGEST_MAX_BYTES)
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        async for lineno, line in ndjson_lines(body):
+            row, errors = json_row(line)
+            yield lineno, row, errors[0] if errors else None
+        return
+    
+    try:
+        payload = orjson.loads(b"".join([chunk async for chunk in body]))
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    if isinstance(payload, dict):
+        payload = payload.get("readings", [payload])
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Expected a reading or a list of readings")
+    for index, item in enumerate(payload):
+        yield index, item, None
+
+@api_router.post("/sensors/ingest")
+async def ingest_sensor_readings(request: Request, user: UserResponse = Depends(get_current_user)):
+    """Accept a batch of readings as NDJSON or a JSON array and queue them for writing.
+
+    Bodies over ``SENSOR_INGEST_MAX_BYTES`` or batches over
+    ``SENSOR_INGEST_MAX_READINGS`` readings are refused with 413.
+    """
+    content_type = request.headers.get("content-type", "")
+    key = "line" if "ndjson" in content_type or "jsonlines" in content_type else "index"
+    
+    docs, errors = [], []
+    async for position, item, error in sensor_payload_items(request, content_type):
+        if len(docs) + len(errors) >= SENSOR_INGEST_MAX_READINGS:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {SENSOR_INGEST_MAX_READINGS} readings")
+        if error is not None:
+            errors.append({key: position, "error": error})
+            continue
+        try:
+            reading = SensorReading.model_validate(item)
+        except ValidationError as e:
+            errors.append({key: position, "error": e.errors(include_url=False)[0]["msg"]})
+            continue
+        docs.append(reading_to_doc(reading))
+    sensor_ingest.rejected += len(errors)
+    
+    if docs and not sensor_ingest.offer(docs):
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(max(1, int(sensor_ingest.flush_interval)))},
+            content={"detail": "Ingestion buffer full", "accepted": 0, "rejected": len(errors), "throttled": len(docs)}
+        )
+    
+    return {
+        "accepted": len(docs),
+        "rejected": len(errors),
+        "errors": errors[:100],
+        "buffered": sensor_ingest.stats()["buffered"]
+    }
+
+@api_router.get("/sensors/ingest/stats")
+async def get_sensor_ingest_stats(user: UserResponse = Depends(get_current_user)):
+    return sensor_ingest.stats()
+
 # ============== SENSOR DATA ENDPOINTS ==============
 
 @api_router.get("/sensors/{asset_id}/readings")
 async def get_sensor_readings(
     asset_id: str,
     limit: int = 100,
+    resolution: Optional[int] = Query(None, ge=1),
     user: UserResponse = Depends(get_current_user)
 ):
-    readings = await db.sensor_readings.find(
-        {"asset_id": asset_id},
-        {"_id": 0}
-    ).sort("timestamp", -1).limit(limit).to_list(limit)
+    """Latest readings, served from the coarsest tier matching ``resolution`` seconds.
+
+    Rollup tiers return min/max/avg/count per bucket, with ``value`` set to the
+    average. Buckets the rollup worker has not reached yet, including the
+    current one, are aggregated from the finer tiers on the fly.
+    """
+    tier = select_sensor_tier(resolution)
+    query = {"meta.asset_id": asset_id}
+    readings = []
+    if tier["step"]:
+        step = tier["step"]
+        now = datetime.now(timezone.utc)
+        since = datetime.fromtimestamp(now.timestamp() // step * step - (limit - 1) * step, timezone.utc)
+        group_id = {"sensor_id": "$meta.sensor_id", "type": "$meta.type",
+                    "timestamp": {"$dateTrunc": {"date": "$timestamp", "unit": tier["unit"]}}}
+        buckets = await rollup_sensor_buckets(query, tier, since, now, group_id, {"unit": {"$first": "$meta.unit"}})
+        for bucket in buckets:
+            readings.append({"asset_id": asset_id, **bucket.pop("_id"), **bucket, "avg": bucket["sum"] / bucket["count"]})
+        readings.sort(key=lambda r: r["timestamp"], reverse=True)
+        query["timestamp"] = {"$lt": since}
+    older = await db[tier["collection"]].find(query, {"_id": 0}).sort("timestamp", -1).limit(limit).to_list(limit)
+    readings = (readings + [flatten_reading(reading) for reading in older])[:limit]
+    if tier["step"]:
+        for reading in readings:
+            reading["value"] = reading["avg"]
     return readings
 
+SERIES_BUCKET_UNITS = {"s": "second", "m": "minute", "h": "hour", "d": "day"}
+SERIES_BUCKET_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+SERIES_MAX_BUCKETS = 10000
+SERIES_MAX_RAW_POINTS = int(os.environ.get("SERIES_MAX_RAW_POINTS", "500000"))
+
+def parse_bucket(bucket: str):
+    """Parse a bucket size such as ``5m`` or ``1h`` into (unit, bin_size, seconds)."""
+    match = re.fullmatch(r"(\d+)([smhd])", bucket)
+    if not match or int(match.group(1)) < 1:
+        raise HTTPException(status_code=400, detail="bucket must look like 30s, 5m, 1h or 1d")
+    size, unit = int(match.group(1)), match.group(2)
+    return SERIES_BUCKET_UNITS[unit], size, size * SERIES_BUCKET_SECONDS[unit]
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets downsampling; returns indices of kept points."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_start = end
+        avg_x = x[next_start:next_end].mean() if next_end > next_start else x[-1]
+        avg_y = y[next_start:next_end].mean() if next_end > next_start else y[-1]
+        ax, ay = x[selected], y[selected]
+        areas = np.abs((ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay))
+        selected = start + int(np.argmax(areas))
+        indices[i + 1] = selected
+    return indices
+
+@api_router.get("/sensors/{asset_id}/series")
+async def get_sensor_series(
+    asset_id: str,
+    type: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: str = "5m",
+    mode: str = Query("aggregate", pattern="^(aggregate|lttb)$"),
+    points: int = Query(500, ge=3, le=SERIES_MAX_BUCKETS),
+    user: UserResponse = Depends(get_current_user)
+):
+    """Downsampled time series for one sensor type.
+
+    ``aggregate`` returns min/max/avg/count per ``bucket``; ``lttb`` returns
+    at most ``points`` raw readings chosen to preserve the visual shape.
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=1)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    match = {"meta.asset_id": asset_id, "meta.type": type, "timestamp": {"$gte": start, "$lt": end}}
+    
+    if mode == "lttb":
+        timestamps, values = [], []
+        cursor = db.sensor_readings.find(match, {"_id": 0, "timestamp": 1, "value": 1}).sort("timestamp", 1)
+        async for reading in cursor.limit(SERIES_MAX_RAW_POINTS):
+            timestamps.append(reading["timestamp"].timestamp())
+            values.append(reading["value"])
+        x, y = np.asarray(timestamps, dtype=np.float64), np.asarray(values, dtype=np.float64)
+        series = [
+            {"timestamp": datetime.fromtimestamp(x[i], timezone.utc).isoformat(), "value": float(y[i])}
+            for i in lttb(x, y, points)
+        ]
+        return {"asset_id": asset_id, "type": type, "from": start, "to": end, "mode": mode, "raw_points": len(x), "points": series}
+    
+    unit, bin_size, bucket_seconds = parse_bucket(bucket)
+    if (end - start).total_seconds() / bucket_seconds > SERIES_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range needs more than {SERIES_MAX_BUCKETS} buckets; use a larger bucket")
+    tier = select_sensor_tier(bucket_seconds)
+    buckets = await rollup_sensor_buckets(
+        {"meta.asset_id": asset_id, "meta.type": type}, tier, start, end,
+        {"$dateTrunc": {"date": "$timestamp", "unit": unit, "binSize": bin_size}}
+    )
+    series = [
+        {"timestamp": b["_id"].isoformat(), "min": b["min"], "max": b["max"], "avg": b["sum"] / b["count"], "count": b["count"]}
+        for b in sorted(buckets, key=lambda b: b["_id"])
+    ]
+    return {
+        "asset_id": asset_id, "type": type, "from": start, "to": end, "mode": mode,
+        "bucket": bucket, "tier": tier["name"], "points": series
+    }
+
+def generate_live_sensor_data(asset_id: str) -> dict:
+    """Build one simulated live sensor snapshot for an asset."""
+    return sensor_simulator.snapshot(asset_id)
+
+class LiveSensorHub:
+    """Fans live sensor snapshots out to stream subscribers on every worker.
+
+    Snapshots travel over one shared-state channel per asset, so clients see
+    the same readings whichever worker they are connected to. Every worker
+    with subscribers for an asset runs a producer loop for it, but only the
+    holder of the asset's lease generates snapshots; the others take the
+    lease over if its holder goes away. Producers stop when their last local
+    subscriber leaves.
+    """
+
+    def __init__(self, state, interval: float = 3.0, queue_size: int = 64):
+        self.state = state
+        self.interval = interval
+        self.queue_size = queue_size
+        self.lease_ttl = interval * 3
+        self._subscribers: dict = {}
+        self._callbacks: dict = {}
+        self._producers: dict = {}
+        self._leased: set = set()
+
+    async def latest(self, asset_id: str) -> Optional[dict]:
+        return await self.state.get(f"live:{asset_id}")
+
+    async def subscribe(self, asset_ids: List[str]) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        for asset_id in asset_ids:
+            subscribers = self._subscribers.get(asset_id)
+            if subscribers is None:
+                subscribers = self._subscribers[asset_id] = set()
+                self._callbacks[asset_id] = callback = functools.partial(self._fan_out, asset_id)
+                await self.state.subscribe(f"live:{asset_id}", callback)
+                self._producers[asset_id] = asyncio.create_task(self._produce(asset_id))
+            subscribers.add(queue)
+        for snapshot in await self.state.mget([f"live:{asset_id}" for asset_id in asset_ids]):
+            if snapshot is not None:
+                self._deliver(queue, snapshot)
+        return queue
+
+    async def unsubscribe(self, queue: asyncio.Queue, asset_ids: List[str]):
+        for asset_id in asset_ids:
+            subscribers = self._subscribers.get(asset_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[asset_id]
+                producer = self._producers.pop(asset_id, None)
+                if producer is not None:
+                    producer.cancel()
+                await self.state.unsubscribe(f"live:{asset_id}", self._callbacks.pop(asset_id))
+                if asset_id in self._leased:
+                    self._leased.discard(asset_id)
+                    await self.state.delete(f"live-lease:{asset_id}")
+
+    def _fan_out(self, asset_id: str, snapshot: dict):
+        for queue in self._subscribers.get(asset_id, ()):
+            self._deliver(queue, snapshot)
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, snapshot: dict):
+        # Slow consumers lose their oldest snapshot rather than stalling the producer
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(snapshot)
+
+    async def _hold_lease(self, asset_id: str) -> bool:
+        # Renewal is read-then-write, so two workers may both produce for one
+        # tick around an expiry; subscribers then just see an extra snapshot
+        key = f"live-lease:{asset_id}"
+        if asset_id in self._leased and await self.state.get(key) == worker_id:
+            await self.state.set(key, worker_id, self.lease_ttl)
+            return True
+        if await self.state.set(key, worker_id, self.lease_ttl, only_if_absent=True):
+            self._leased.add(asset_id)
+            return True
+        self._leased.discard(asset_id)
+        return False
+
+    async def _produce(self, asset_id: str):
+        while True:
+            try:
+                if await self._hold_lease(asset_id):
+                    snapshot = generate_live_sensor_data(asset_id)
+                    await self.state.set(f"live:{asset_id}", snapshot, self.lease_ttl)
+                    await self.state.publish(f"live:{asset_id}", snapshot)
+            except Exception as e:
+                logger.warning("Live sensor producer for %s failed: %s", asset_id, e)
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {
+            "assets": len(self._producers),
+            "producing": len(self._leased),
+            "subscriptions": sum(len(s) for s in self._subscribers.values()),
+            "interval_seconds": self.interval
+        }
+
+live_sensor_hub = LiveSensorHub(
+    shared_state,
+    interval=float(os.environ.get("LIVE_SENSOR_INTERVAL", "3.0"))
+)
+
+SENSOR_STREAM_MAX_ASSETS = int(os.environ.get("SENSOR_STREAM_MAX_ASSETS", "200"))
+SENSOR_STREAM_HEARTBEAT = 15.0
+
+@api_router.get("/sensors/stream")
+async def stream_sensor_data(
+    request: Request,
+    asset_ids: str,
+    user: UserResponse = Depends(get_current_user)
+):
+    """Server-Sent Events stream of live sensor data for a comma-separated list of assets."""
+    ids = list(dict.fromkeys(a.strip() for a in asset_ids.split(",") if a.strip()))
+    if not ids:
+        raise HTTPException(status_code=400, detail="asset_ids required")
+    if len(ids) > SENSOR_STREAM_MAX_ASSETS:
+        raise HTTPException(status_code=400, detail=f"At most {SENSOR_STREAM_MAX_ASSETS} asset_ids per stream")
+    
+    async def event_stream():
+        queue = await live_sensor_hub.subscribe(ids)
+        try:
+            yield f"retry: {int(live_sensor_hub.interval * 1000)}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    snapshot = await asyncio.wait_for(queue.get(), SENSOR_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: reading\ndata: {json.dumps(snapshot)}\n\n"
+        finally:
+            await live_sensor_hub.unsubscribe(queue, ids)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.get("/sensors/live/{asset_id}")
 async def get_live_sensor_data(
     asset_id: str,
     user: UserResponse = Depends(get_current_user)
 ):
     """Get simulated live sensor data for an asset."""
+    return await live_sensor_hub.latest(asset_id) or generate_live_sensor_data(asset_id)
+
+# ============== ANALYTICS ENDPOINTS ==============
+
+ASSET_STATUSES = ["operational", "maintenance", "warning", "critical"]
+ANALYTICS_MATERIALIZED = os.environ.get("ANALYTICS_MATERIALIZED", "true").lower() in ("1", "true", "yes")
+ASSET_SUMMARY_ID = "assets"
+
+async def compute_asset_summary() -> dict:
+    """Aggregate asset count, health total and status counts in one pipeline."""
+    pipeline = [{"$facet": {
+        "totals": [{"$group": {"_id": None, "total": {"$sum": 1}, "health_sum": {"$sum": {"$ifNull": ["$health_score", 0]}}}}],
+        "statuses": [{"$group": {"_id": {"$ifNull": ["$status", "operational"]}, "count": {"$sum": 1}}}]
+    }}]
+    result = (await db.assets.aggregate(pipeline).to_list(1))[0]
+    totals = result["totals"][0] if result["totals"] else {"total": 0, "health_sum": 0}
     return {
-        "asset_id": asset_id,
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "sensors": {
-            "water_level": {
-                "value": round(random.uniform(0.5, 3.5), 2),
-                "unit": "m",
-                "status": "normal"
-            },
-            "pressure": {
-                "value": round(random.uniform(980, 1020), 1),
-                "unit": "hPa",
-                "status": "normal"
-            },
-            "temperature": {
-                "value": round(random.uniform(8, 22), 1),
-                "unit": "°C",
-                "status": "normal"
-            },
-            "vibration": {
-                "value": round(random.uniform(0.1, 2.5), 2),
-                "unit": "mm/s",
-                "status": "normal" if random.random() > 0.1 else "warning"
-            },
-            "wind_speed": {
-                "value": round(random.uniform(5, 45), 1),
-                "unit": "km/h",
-                "status": "normal" if random.random() > 0.15 else "warning"
-            }
-        }
+        "total": totals["total"],
+        "health_sum": totals["health_sum"],
+        "status": {row["_id"]: row["count"] for row in result["statuses"]}
     }
 
-# ============== ANALYTICS ENDPOINTS ==============
+async def rebuild_asset_summary() -> dict:
+    summary = await compute_asset_summary()
+    await db.analytics_summary.replace_one({"_id": ASSET_SUMMARY_ID}, summary, upsert=True)
+    return summary
+
+async def apply_asset_summary_delta(old: Optional[dict] = None, new: Optional[dict] = None):
+    """Incrementally adjust the materialized summary for one asset change."""
+    if not ANALYTICS_MATERIALIZED:
+        return
+    inc = {}
+    for doc, sign in ((old, -1), (new, 1)):
+        if doc is None:
+            continue
+        status_key = f"status.{doc.get('status') or 'operational'}"
+        inc["total"] = inc.get("total", 0) + sign
+        inc["health_sum"] = inc.get("health_sum", 0) + sign * doc.get("health_score", 0)
+        inc[status_key] = inc.get(status_key, 0) + sign
+    inc = {k: v for k, v in inc.items() if v}
+    if not inc:
+        return
+    # Only adjust an existing summary; a missing one is rebuilt on next read
+    await db.analytics_summary.update_one({"_id": ASSET_SUMMARY_ID}, {"$inc": inc})
 
 @api_router.get("/analytics/overview")
-async def get_analytics_overview(user: UserResponse = Depends(get_current_user)):
+async def get_analytics_overview(
+    request: Request,
+    response: Response,
+    user: UserResponse = Depends(get_current_user)
+):
     """Get dashboard overview analytics."""
-    total_assets = await db.assets.count_documents({})
+    not_modified = await conditional(request, response, "assets", "alerts")
+    if not_modified:
+        return not_modified
+    if ANALYTICS_MATERIALIZED:
+        summary = await db.analytics_summary.find_one({"_id": ASSET_SUMMARY_ID})
+        if summary is None:
+            summary = await rebuild_asset_summary()
+    else:
+        summary = await compute_asset_summary()
     active_alerts = await db.alerts.count_documents({"status": "active"})
     
-    assets = await db.assets.find({}, {"_id": 0, "status": 1, "health_score": 1}).to_list(1000)
-    
-    status_counts = {"operational": 0, "maintenance": 0, "warning": 0, "critical": 0}
-    total_health = 0
-    for asset in assets:
-        status_counts[asset.get("status", "operational")] += 1
-        total_health += asset.get("health_score", 0)
-    
-    avg_health = round(total_health / total_assets, 1) if total_assets > 0 else 0
+    total_assets = summary.get("total", 0)
+    status_counts = {status: 0 for status in ASSET_STATUSES}
+    status_counts.update({k: v for k, v in summary.get("status", {}).items() if v})
+    avg_health = round(summary.get("health_sum", 0) / total_assets, 1) if total_assets > 0 else 0
     
     return {
         "total_assets": total_assets,
@@ -508,37 +3997,56 @@ async def get_analytics_overview(user: UserResponse = Depends(get_current_user))
     }
 
 @api_router.get("/analytics/maintenance-forecast")
-async def get_maintenance_forecast(user: UserResponse = Depends(get_current_user)):
-    """Get maintenance forecast for next 30 days."""
-    now = datetime.now(timezone.utc)
-    next_30_days = now + timedelta(days=30)
-    
-    assets = await db.assets.find({}, {"_id": 0}).to_list(1000)
-    
-    forecast = []
-    for asset in assets:
-        next_maintenance = asset.get("next_maintenance")
-        if isinstance(next_maintenance, str):
-            next_maintenance = datetime.fromisoformat(next_maintenance)
-        if next_maintenance and next_maintenance.replace(tzinfo=timezone.utc) <= next_30_days:
-            forecast.append({
-                "asset_id": asset["asset_id"],
-                "asset_name": asset["name"],
-                "type": asset["type"],
-                "scheduled_date": next_maintenance.isoformat() if isinstance(next_maintenance, datetime) else next_maintenance,
-                "priority": "high" if asset.get("health_score", 100) < 70 else "normal"
-            })
+async def get_maintenance_forecast(
+    request: Request,
+    response: Response,
+    days: int = Query(30, ge=1, le=3650),
+    type: Optional[str] = None,
+    user: UserResponse = Depends(get_current_user)
+):
+    """Get maintenance forecast (including overdue work) up to the end of the UTC day ``days`` days from now."""
+    # The window moves in whole UTC days, so the ETag only has to roll over with the date
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    not_modified = await conditional(request, response, "assets", extra=today.date().isoformat())
+    if not_modified:
+        return not_modified
+    horizon = today + timedelta(days=days + 1)
+    query = {"next_maintenance": {"$lt": horizon}}
+    if type:
+        query["type"] = type
+    
+    assets = await db.assets.find(
+        query,
+        {"_id": 0, "asset_id": 1, "name": 1, "type": 1, "next_maintenance": 1, "health_score": 1}
+    ).sort("next_maintenance", 1).to_list(None)
+    
+    forecast = [
+        {
+            "asset_id": asset["asset_id"],
+            "asset_name": asset["name"],
+            "type": asset["type"],
+            "scheduled_date": as_datetime(asset["next_maintenance"]).isoformat(),
+            "priority": "high" if asset.get("health_score", 100) < 70 else "normal"
+        }
+        for asset in assets
+    ]
     
     return {"forecast": forecast, "total_scheduled": len(forecast)}
 
 # ============== USERS MANAGEMENT (ADMIN) ==============
 
 @api_router.get("/users", response_model=List[UserResponse])
-async def get_users(user: UserResponse = Depends(require_role([UserRole.ADMIN]))):
+async def get_users(
+    request: Request,
+    response: Response,
+    user: UserResponse = Depends(require_role([UserRole.ADMIN]))
+):
+    not_modified = await conditional(request, response, "users")
+    if not_modified:
+        return not_modified
+    if FAST_JSON_RESPONSES:
+        return list_response(db.users.find({}, model_projection(UserResponse)), response)
     users = await db.users.find({}, {"_id": 0, "password": 0}).to_list(1000)
-    for u in users:
-        if isinstance(u.get("created_at"), str):
-            u["created_at"] = datetime.fromisoformat(u["created_at"])
     return users
 
 @api_router.put("/users/{user_id}/role")
@@ -553,12 +4061,76 @@ async def update_user_role(
     result = await db.users.update_one({"user_id": user_id}, {"$set": {"role": role}})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    await session_cache.invalidate_user(user_id)
+    await collection_versions.bump("users")
     return {"message": "Role updated"}
 
+@api_router.get("/admin/session-cache")
+async def get_session_cache_stats(admin: UserResponse = Depends(require_role([UserRole.ADMIN]))):
+    """Hit/miss counters of this worker's session lookups."""
+    return session_cache.stats()
+
+@api_router.get("/admin/database")
+async def get_database_stats(admin: UserResponse = Depends(require_role([UserRole.ADMIN]))):
+    """Pool settings and the last readiness ping of this worker's Mongo client."""
+    return database_health.stats()
+
+@api_router.get("/admin/shared-state")
+async def get_shared_state_stats(admin: UserResponse = Depends(require_role([UserRole.ADMIN]))):
+    """Backend of the cross-worker state, with this worker's rate-limit and live-stream counters."""
+    return {
+        "worker_id": worker_id,
+        **shared_state.stats(),
+        "rate_limits": {name: limiter.stats() for name, limiter in rate_limiters.items()},
+        "live_streams": live_sensor_hub.stats()
+    }
+
+@api_router.get("/admin/password-hasher")
+async def get_password_hasher_stats(admin: UserResponse = Depends(require_role([UserRole.ADMIN]))):
+    """Queue depth and queue-wait vs hashing time for the bcrypt pool."""
+    return password_hasher.stats()
+
+@api_router.get("/admin/alert-engine")
+async def get_alert_engine_stats(admin: UserResponse = Depends(require_role([UserRole.ADMIN]))):
+    """Throughput and raised/suppressed counts for the alert rule engine."""
+    return alert_engine.stats()
+
+@api_router.get("/admin/tile-cache")
+async def get_tile_cache_stats(admin: UserResponse = Depends(require_role([UserRole.ADMIN]))):
+    return tile_cache.stats()
+
+@api_router.get("/admin/simulator")
+async def get_simulator_stats(admin: UserResponse = Depends(require_role([UserRole.ADMIN]))):
+    return sensor_simulator.stats()
+
+@api_router.get("/admin/diagnostics")
+async def get_diagnostics(admin: UserResponse = Depends(require_role([UserRole.ADMIN]))):
+    """Recent event-loop blocks and slow queries (DIAGNOSTICS mode only)."""
+    return {"loop_blocks": loop_block_detector.stats(), "slow_queries": query_diagnostics.stats()}
+
+@api_router.post("/admin/profile")
+async def run_profiler(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=100),
+    format: str = Query("json", pattern="^(json|folded)$"),
+    admin: UserResponse = Depends(require_role([UserRole.ADMIN]))
+):
+    """Sample the event-loop thread for ``seconds``; ``format=folded`` returns flamegraph input."""
+    if not DIAGNOSTICS:
+        raise HTTPException(status_code=404, detail="Diagnostics mode is disabled")
+    try:
+        profile = await asyncio.to_thread(sampling_profiler.run, threading.get_ident(), seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "folded":
+        return Response(profile["folded"], media_type="text/plain")
+    return profile
+
 # ============== CONTACT & HEALTH ==============
 
 @api_router.post("/contact", response_model=ContactResponse)
-async def submit_contact_form(contact: ContactRequest):
+async def submit_contact_form(contact: ContactRequest, request: Request):
+    await rate_limiters["contact-ip"].check(client_ip(request))
     contact_obj = ContactResponse(
         name=contact.name,
         email=contact.email,
@@ -566,17 +4138,29 @@ async def submit_contact_form(contact: ContactRequest):
         message=contact.message
     )
     doc = contact_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.contact_requests.insert_one(doc)
     return contact_obj
 
 @api_router.get("/health")
 async def health_check():
-    return {
-        "status": "healthy",
-        "database": "connected",
-        "timestamp": datetime.now(timezone.utc).isoformat()
-    }
+    """Readiness probe: 503 unless this worker is serving and MongoDB answers a ping in time."""
+    rtt = await database_health.ping() if client is not None else None
+    ready = database_health.accepting and rtt is not None
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "healthy" if ready else "unavailable",
+            "database": "connected" if rtt is not None else "unreachable",
+            "database_rtt_ms": round(rtt * 1000, 2) if rtt is not None else None,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        },
+        headers={"Cache-Control": "no-store"}
+    )
+
+@api_router.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the event loop is responsive; never touches MongoDB."""
+    return {"status": "alive", "timestamp": datetime.now(timezone.utc).isoformat()}
 
 @api_router.get("/")
 async def root():
@@ -609,9 +4193,9 @@ async def seed_database():
             "status": "operational",
             "health_score": 94,
             "sensors": ["water_level", "pressure", "vibration"],
-            "last_inspection": (datetime.now(timezone.utc) - timedelta(days=15)).isoformat(),
-            "next_maintenance": (datetime.now(timezone.utc) + timedelta(days=45)).isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "last_inspection": (datetime.now(timezone.utc) - timedelta(days=15)),
+            "next_maintenance": (datetime.now(timezone.utc) + timedelta(days=45)),
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "asset_id": "AST-AFSLUIT02",
@@ -623,9 +4207,9 @@ async def seed_database():
             "status": "operational",
             "health_score": 88,
             "sensors": ["water_level", "pressure", "temperature"],
-            "last_inspection": (datetime.now(timezone.utc) - timedelta(days=30)).isoformat(),
-            "next_maintenance": (datetime.now(timezone.utc) + timedelta(days=20)).isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "last_inspection": (datetime.now(timezone.utc) - timedelta(days=30)),
+            "next_maintenance": (datetime.now(timezone.utc) + timedelta(days=20)),
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "asset_id": "AST-AFSLUIT03",
@@ -637,9 +4221,9 @@ async def seed_database():
             "status": "maintenance",
             "health_score": 72,
             "sensors": ["water_level", "pressure", "vibration", "temperature"],
-            "last_inspection": (datetime.now(timezone.utc) - timedelta(days=5)).isoformat(),
-            "next_maintenance": (datetime.now(timezone.utc) + timedelta(days=3)).isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "last_inspection": (datetime.now(timezone.utc) - timedelta(days=5)),
+            "next_maintenance": (datetime.now(timezone.utc) + timedelta(days=3)),
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "asset_id": "AST-AFSLUIT04",
@@ -651,9 +4235,9 @@ async def seed_database():
             "status": "operational",
             "health_score": 91,
             "sensors": ["water_level", "wind_speed"],
-            "last_inspection": (datetime.now(timezone.utc) - timedelta(days=20)).isoformat(),
-            "next_maintenance": (datetime.now(timezone.utc) + timedelta(days=60)).isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "last_inspection": (datetime.now(timezone.utc) - timedelta(days=20)),
+            "next_maintenance": (datetime.now(timezone.utc) + timedelta(days=60)),
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "asset_id": "AST-AFSLUIT05",
@@ -665,9 +4249,9 @@ async def seed_database():
             "status": "warning",
             "health_score": 78,
             "sensors": ["water_level", "pressure", "wind_speed"],
-            "last_inspection": (datetime.now(timezone.utc) - timedelta(days=45)).isoformat(),
-            "next_maintenance": (datetime.now(timezone.utc) + timedelta(days=7)).isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "last_inspection": (datetime.now(timezone.utc) - timedelta(days=45)),
+            "next_maintenance": (datetime.now(timezone.utc) + timedelta(days=7)),
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "asset_id": "AST-MAESLANT",
@@ -679,9 +4263,9 @@ async def seed_database():
             "status": "operational",
             "health_score": 96,
             "sensors": ["water_level", "pressure", "vibration", "temperature"],
-            "last_inspection": (datetime.now(timezone.utc) - timedelta(days=10)).isoformat(),
-            "next_maintenance": (datetime.now(timezone.utc) + timedelta(days=90)).isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "last_inspection": (datetime.now(timezone.utc) - timedelta(days=10)),
+            "next_maintenance": (datetime.now(timezone.utc) + timedelta(days=90)),
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "asset_id": "AST-RDAM01",
@@ -693,13 +4277,18 @@ async def seed_database():
             "status": "operational",
             "health_score": 89,
             "sensors": ["vibration", "temperature", "wind_speed"],
-            "last_inspection": (datetime.now(timezone.utc) - timedelta(days=25)).isoformat(),
-            "next_maintenance": (datetime.now(timezone.utc) + timedelta(days=35)).isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "last_inspection": (datetime.now(timezone.utc) - timedelta(days=25)),
+            "next_maintenance": (datetime.now(timezone.utc) + timedelta(days=35)),
+            "created_at": datetime.now(timezone.utc)
         }
     ]
     
+    for asset in assets_data:
+        asset["geo"] = asset_geo(asset["latitude"], asset["longitude"])
     await db.assets.insert_many(assets_data)
+    await tile_cache.clear()
+    if ANALYTICS_MATERIALIZED:
+        await rebuild_asset_summary()
     
     # Alerts
     alerts_data = [
@@ -712,7 +4301,7 @@ async def seed_database():
             "description": "Predictive analytics toont verhoogde slijtage aan de zuidelijke sectie. Inspectie aanbevolen binnen 7 dagen.",
             "severity": "medium",
             "status": "active",
-            "created_at": (datetime.now(timezone.utc) - timedelta(hours=6)).isoformat()
+            "created_at": (datetime.now(timezone.utc) - timedelta(hours=6))
         },
         {
             "alert_id": "ALR-002",
@@ -724,7 +4313,7 @@ async def seed_database():
             "severity": "low",
             "status": "acknowledged",
             "acknowledged_by": "system",
-            "created_at": (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+            "created_at": (datetime.now(timezone.utc) - timedelta(days=1))
         },
         {
             "alert_id": "ALR-003",
@@ -735,7 +4324,7 @@ async def seed_database():
             "description": "Sensoren detecteren lichte drukdaling in het hydraulische systeem. Monitoring actief.",
             "severity": "medium",
             "status": "active",
-            "created_at": (datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()
+            "created_at": (datetime.now(timezone.utc) - timedelta(hours=2))
         },
         {
             "alert_id": "ALR-004",
@@ -746,14 +4335,142 @@ async def seed_database():
             "description": "Weersvoorspelling toont windsnelheden > 80 km/u voor de komende 24 uur.",
             "severity": "high",
             "status": "active",
-            "created_at": (datetime.now(timezone.utc) - timedelta(minutes=30)).isoformat()
+            "created_at": (datetime.now(timezone.utc) - timedelta(minutes=30))
         }
     ]
     
     await db.alerts.insert_many(alerts_data)
+    await collection_versions.bump("assets", "alerts")
     
     return {"message": "Database seeded successfully", "assets": len(assets_data), "alerts": len(alerts_data)}
 
+# ============== DATETIME MIGRATION ==============
+
+# Fields that older releases stored as ISO-8601 strings
+DATETIME_FIELDS = {
+    "users": ["created_at"],
+    "user_sessions": ["expires_at", "created_at"],
+    "assets": ["last_inspection", "next_maintenance", "created_at"],
+    "alerts": ["created_at", "resolved_at"],
+    "contact_requests": ["created_at"],
+    "sensor_readings": ["timestamp"],
+}
+
+def as_datetime(value) -> datetime:
+    """Read a datetime field that may still hold an ISO string until ``migrate-datetimes`` has run."""
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+async def migrate_datetimes(collection: str, fields: List[str], batch_size: int = 1000) -> int:
+    """Convert string datetime fields to BSON dates in batches.
+
+    Converted documents no longer match the filter, so an interrupted run
+    simply resumes where it stopped when started again.
+    """
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    convert = [{"$set": {
+        field: {"$cond": [{"$eq": [{"$type": f"${field}"}, "string"]}, {"$toDate": f"${field}"}, f"${field}"]}
+        for field in fields
+    }}]
+    migrated = 0
+    while True:
+        batch = await db[collection].find(query, {"_id": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return migrated
+        result = await db[collection].update_many({"_id": {"$in": [d["_id"] for d in batch]}}, convert)
+        migrated += result.modified_count
+        logger.info("Migrated %d %s documents (%d total)", result.modified_count, collection, migrated)
+
+async def migrate_all_datetimes(batch_size: int = 1000) -> dict:
+    return {c: await migrate_datetimes(c, fields, batch_size) for c, fields in DATETIME_FIELDS.items()}
+
+async def migrate_sensor_readings(batch_size: int = 1000) -> int:
+    """Move readings from a regular ``sensor_readings`` collection into the time-series one.
+
+    The old collection is renamed to ``sensor_readings_legacy`` and drained
+    in ``_id`` order, each batch deleted once it is copied, so an interrupted
+    run resumes where it stopped (re-copying at most the batch in flight). Rollup watermarks are reset afterwards so
+    the worker rolls the migrated history up.
+    """
+    raw, legacy = SENSOR_TIERS[0]["collection"], SENSOR_TIERS[0]["collection"] + "_legacy"
+    existing = set(await db.list_collection_names())
+    if raw in existing and not await sensor_collection_is_timeseries(raw):
+        if legacy in existing:
+            raise RuntimeError(f"both {raw} and {legacy} hold unmigrated readings; merge them by hand")
+        await db[raw].rename(legacy)
+        existing.discard(raw)
+        existing.add(legacy)
+    if legacy not in existing:
+        return 0
+    await ensure_sensor_collections()
+    await migrate_datetimes(legacy, ["timestamp"], batch_size)
+    migrated = 0
+    while True:
+        batch = await db[legacy].find({}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        docs = [
+            {"timestamp": doc["timestamp"], "value": doc["value"],
+             "meta": doc.get("meta") or {f: doc.get(f) for f in SENSOR_META_FIELDS}}
+            for doc in batch
+        ]
+        await db[raw].insert_many(docs, ordered=False)
+        await db[legacy].delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+        migrated += len(docs)
+        logger.info("Migrated %d sensor readings (%d total)", len(docs), migrated)
+    await db[legacy].drop()
+    await db.sensor_rollup_state.delete_many({})
+    return migrated
+
+async def migrate_session_expiry():
+    """Convert legacy session datetimes so the TTL index and session lookups apply."""
+    await migrate_datetimes("user_sessions", DATETIME_FIELDS["user_sessions"])
+
+# ============== INDEXES ==============
+
+# (collection, keys, options) for every lookup and sort server.py performs
+INDEXES = [
+    ("user_sessions", [("session_token", ASCENDING)], {"unique": True}),
+    ("user_sessions", [("user_id", ASCENDING)], {}),
+    ("user_sessions", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ("users", [("email", ASCENDING)], {"unique": True}),
+    ("users", [("user_id", ASCENDING)], {"unique": True}),
+    ("assets", [("asset_id", ASCENDING)], {"unique": True}),
+    ("assets", [("next_maintenance", ASCENDING)], {}),
+    ("assets", [("geo", GEOSPHERE)], {}),
+    ("assets", [("longitude", ASCENDING), ("latitude", ASCENDING)], {}),
+    ("assets", [("type", ASCENDING), ("next_maintenance", ASCENDING)], {}),
+    ("alerts", [("alert_id", ASCENDING)], {"unique": True}),
+    ("alerts", [("created_at", DESCENDING), ("alert_id", DESCENDING)], {}),
+    ("alerts", [("status", ASCENDING), ("created_at", DESCENDING), ("alert_id", DESCENDING)], {}),
+    # At most one open alert per asset and rule, even with several workers raising them
+    ("alerts", [("asset_id", ASCENDING), ("rule", ASCENDING)],
+     {"unique": True, "partialFilterExpression": {"open": True}, "name": "open_alert_per_rule"}),
+    ("sensor_readings", [("meta.asset_id", ASCENDING), ("timestamp", DESCENDING)], {}),
+    ("sensor_readings", [("meta.asset_id", ASCENDING), ("meta.type", ASCENDING), ("timestamp", ASCENDING)], {}),
+    ("sensor_readings_1m", [("meta.asset_id", ASCENDING), ("timestamp", DESCENDING)], {}),
+    ("sensor_readings_1m", [("meta.asset_id", ASCENDING), ("meta.type", ASCENDING), ("timestamp", ASCENDING)], {}),
+    ("sensor_readings_1h", [("meta.asset_id", ASCENDING), ("timestamp", DESCENDING)], {}),
+    ("sensor_readings_1h", [("meta.asset_id", ASCENDING), ("meta.type", ASCENDING), ("timestamp", ASCENDING)], {}),
+]
+
+async def ensure_indexes():
+    """Idempotently create all indexes; failures are logged, not fatal."""
+    for collection, keys, options in INDEXES:
+        try:
+            await db[collection].create_index(keys, **options)
+        except OperationFailure as e:
+            logger.error("Could not create index %s on %s: %s", keys, collection, e)
+
+async def log_index_usage():
+    for collection in sorted({c for c, _, _ in INDEXES}):
+        try:
+            stats = await db[collection].aggregate([{"$indexStats": {}}]).to_list(None)
+        except OperationFailure as e:
+            logger.warning("Index stats unavailable for %s: %s", collection, e)
+            continue
+        usage = ", ".join(f"{s['name']}={s['accesses']['ops']}" for s in stats)
+        logger.info("Index usage %s: %s", collection, usage or "none")
+
 # ============== APP SETUP ==============
 
 app.include_router(api_router)
@@ -764,7 +4481,13 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+if STATIC_EXPORT_DIR.is_dir():
+    app.mount("/static", PrecompressedStaticFiles(directory=STATIC_EXPORT_DIR, html=True), name="static")
 
 logging.basicConfig(
     level=logging.INFO,
@@ -772,6 +4495,61 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def startup():
+    connect_database()
+    await database_health.warm_up(MONGO_WARMUP_PINGS)
+    await migrate_session_expiry()
+    await ensure_sensor_collections()
+    await backfill_asset_geo()
+    await ensure_indexes()
+    await log_index_usage()
+    sensor_ingest.start()
+    sensor_rollups.start()
+    sensor_simulator.start()
+    oauth_client.start()
+    await tile_cache.start()
+    event_loop_monitor.start()
+    loop_block_detector.start()
+    database_health.accepting = True
+
+async def shutdown():
+    database_health.accepting = False
+    await event_loop_monitor.stop()
+    await loop_block_detector.stop()
+    await sensor_simulator.stop()
+    await sensor_ingest.stop()
+    await sensor_rollups.stop()
+    password_hasher.shutdown()
+    await oauth_client.close()
+    await tile_cache.stop()
+    await shared_state.close()
+    close_database()
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Digital Delta maintenance commands")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subcommands.add_parser("migrate-datetimes", help="Convert ISO string datetimes to BSON dates")
+    migrate_parser.add_argument("--batch-size", type=int, default=1000)
+    sensor_parser = subcommands.add_parser("migrate-sensor-readings",
+                                           help="Move readings from a regular collection into the time-series one")
+    sensor_parser.add_argument("--batch-size", type=int, default=1000)
+    precompress_parser = subcommands.add_parser("precompress-static", help="Write .gz/.br siblings for the static export")
+    precompress_parser.add_argument("--directory", type=Path, default=STATIC_EXPORT_DIR)
+    args = parser.parse_args()
+    
+    if args.command == "migrate-datetimes":
+        connect_database()
+        try:
+            print(json.dumps(asyncio.run(migrate_all_datetimes(args.batch_size))))
+        finally:
+            close_database()
+    elif args.command == "migrate-sensor-readings":
+        connect_database()
+        try:
+            print(json.dumps({"migrated": asyncio.run(migrate_sensor_readings(args.batch_size))}))
+        finally:
+            close_database()
+    elif args.command == "precompress-static":
+        print(json.dumps(precompress_static(args.directory)))
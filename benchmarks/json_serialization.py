@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Compare the default response path with the FAST_JSON_RESPONSES path.
+
+The default path is what FastAPI does for ``response_model=List[Asset]``:
+validate every document into the model, dump it back to JSON-compatible
+Python and encode with the stdlib ``json`` module. The fast path encodes the
+documents read from Mongo directly with orjson, either in one go or in
+streamed chunks.
+
+    python benchmarks/json_serialization.py --assets 1000 --repeat 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from pydantic import TypeAdapter  # noqa: E402
+
+import server  # noqa: E402
+
+
+def make_assets(count: int) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "asset_id": f"AST-{i:08d}",
+            "name": f"Kunstwerk {i}",
+            "type": ("bridge", "lock", "barrier", "road")[i % 4],
+            "location": "Nederland",
+            "latitude": 51.0 + (i % 300) / 100,
+            "longitude": 3.5 + (i % 350) / 100,
+            "status": ("operational", "maintenance", "warning", "critical")[i % 4],
+            "last_inspection": now - timedelta(days=i % 90),
+            "next_maintenance": now + timedelta(days=i % 120),
+            "health_score": 50 + i % 50,
+            "sensors": ["water_level", "pressure", "vibration"],
+            "created_at": now,
+        }
+        for i in range(count)
+    ]
+
+
+class ListCursor:
+    """Async iterator over a list, standing in for a Motor cursor."""
+
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+def default_path(adapter: TypeAdapter, docs: List[dict]) -> bytes:
+    validated = adapter.validate_python(docs)
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def fast_path(docs: List[dict]) -> bytes:
+    return server.FastJSONResponse(docs).body
+
+
+def streamed_path(loop: asyncio.AbstractEventLoop, docs: List[dict]) -> bytes:
+    async def collect():
+        return b"".join([chunk async for chunk in server.stream_json_array(ListCursor(docs))])
+    return loop.run_until_complete(collect())
+
+
+def measure(fn, repeat: int) -> dict:
+    fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "median_ms": round(timings[len(timings) // 2] * 1000, 3),
+        "min_ms": round(timings[0] * 1000, 3),
+        "bytes": len(body),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--assets", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    docs = make_assets(args.assets)
+    adapter = TypeAdapter(List[server.Asset])
+    loop = asyncio.new_event_loop()
+    results = {
+        "default": measure(lambda: default_path(adapter, docs), args.repeat),
+        "orjson": measure(lambda: fast_path(docs), args.repeat),
+        "orjson_streamed": measure(lambda: streamed_path(loop, docs), args.repeat),
+    }
+    loop.close()
+    baseline = results["default"]["median_ms"]
+    print(f"{args.assets} assets, median of {args.repeat} runs")
+    for name, result in results.items():
+        speedup = baseline / result["median_ms"] if result["median_ms"] else float("inf")
+        print(f"  {name:<16} {result['median_ms']:>9.3f} ms  {result['bytes']:>9} bytes  x{speedup:.1f}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"assets": args.assets, "repeat": args.repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""Replay dashboard traffic against the API and record latency per endpoint.
+
+``run`` boots ``server.py`` under uvicorn in a child process, backed by the
+MongoDB at ``--mongo-url`` or, with ``--in-memory``, by mongomock-motor. The
+child seeds the database at the requested scale before it starts serving.
+Virtual users then log in and behave like the dashboard pages:
+
+* Overview refreshes overview analytics, active alerts and assets every 30 s
+* Monitoring polls live sensor data for one asset every 3 s
+* Login bursts of ``--login-burst-size`` users arrive together, like a shift change
+
+``--time-scale`` shrinks every interval by the same factor, so a short run
+still keeps the same traffic mix. Results (p50/p95/p99 latency and requests
+per second for each endpoint) are written as JSON under
+``benchmarks/results/`` together with the commit and server settings, and
+``compare`` diffs two result files.
+
+    python benchmarks/load_test.py run --in-memory --assets 5000 --users 50 --duration 60 --time-scale 0.1
+    python benchmarks/load_test.py run --mongo-url mongodb://localhost:27017 --db-name digital_delta_bench
+    python benchmarks/load_test.py run --url http://localhost:8001 --users 20
+    python benchmarks/load_test.py compare before.json after.json --threshold 10
+
+Seeding wipes the assets, alerts and sensor readings of the target database,
+so point ``--db-name`` at a scratch database.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = REPO_ROOT / "backend"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+BENCH_PASSWORD = "benchmark-password"
+ASSET_TYPES = ("bridge", "lock", "barrier", "road")
+ASSET_STATUSES = ("operational", "operational", "operational", "maintenance", "warning", "critical")
+ALERT_SEVERITIES = ("low", "medium", "high", "critical")
+ALERT_STATUSES = ("active", "acknowledged", "resolved")
+
+
+# ---------------------------------------------------------------- server side
+
+def make_assets(count: int, rng: random.Random) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    assets = []
+    for i in range(count):
+        latitude = round(rng.uniform(50.8, 53.5), 5)
+        longitude = round(rng.uniform(3.4, 7.2), 5)
+        assets.append({
+            "asset_id": f"AST-B{i:07d}",
+            "name": f"Kunstwerk {i}",
+            "type": ASSET_TYPES[i % len(ASSET_TYPES)],
+            "location": "Nederland",
+            "latitude": latitude,
+            "longitude": longitude,
+            "geo": {"type": "Point", "coordinates": [longitude, latitude]},
+            "status": rng.choice(ASSET_STATUSES),
+            "health_score": rng.randint(35, 100),
+            "sensors": ["water_level", "pressure", "vibration", "temperature"],
+            "last_inspection": now - timedelta(days=rng.randint(0, 180)),
+            "next_maintenance": now + timedelta(days=rng.randint(-10, 120)),
+            "created_at": now - timedelta(days=rng.randint(0, 365)),
+        })
+    return assets
+
+
+def make_alerts(count: int, assets: List[dict], rng: random.Random) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    alerts = []
+    for i in range(count):
+        asset = rng.choice(assets)
+        severity = rng.choice(ALERT_SEVERITIES)
+        status = rng.choice(ALERT_STATUSES)
+        created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+        alerts.append({
+            "alert_id": f"ALR-B{i:07d}",
+            "asset_id": asset["asset_id"],
+            "asset_name": asset["name"],
+            "type": "critical" if severity == "critical" else "warning",
+            "title": f"Benchmark alert {i}",
+            "description": "Synthetic alert for load testing",
+            "severity": severity,
+            "status": status,
+            "created_at": created_at,
+            "acknowledged_by": "bench" if status != "active" else None,
+            "resolved_at": created_at + timedelta(hours=1) if status == "resolved" else None,
+        })
+    return alerts
+
+
+async def insert_chunked(collection, docs: List[dict], chunk: int = 5000):
+    for start in range(0, len(docs), chunk):
+        await collection.insert_many(docs[start:start + chunk], ordered=False)
+
+
+async def seed(server, args):
+    """Replace assets, alerts and raw readings with deterministic synthetic data."""
+    rng = random.Random(args.seed)
+    db = server.db
+    started = time.perf_counter()
+    await db.assets.delete_many({})
+    await db.alerts.delete_many({})
+    try:
+        await db.sensor_readings.delete_many({})
+    except server.OperationFailure as e:
+        server.logger.warning("Could not clear sensor_readings: %s", e)
+
+    assets = make_assets(args.assets, rng)
+    await insert_chunked(db.assets, assets)
+    await insert_chunked(db.alerts, make_alerts(args.alerts, assets, rng))
+
+    if args.readings:
+        simulator = server.SensorSimulator(seed=args.seed)
+        for asset in assets[:args.reading_assets]:
+            simulator.track(asset["asset_id"])
+        per_tick = max(1, args.reading_assets * len(server.SIMULATED_SENSORS))
+        ticks = max(1, args.readings // per_tick)
+        end = time.time()
+        step = 86400 / ticks
+        batch = []
+        for tick in range(ticks):
+            batch.extend(simulator.readings(end - (ticks - tick) * step))
+            if len(batch) >= 5000:
+                await insert_chunked(db.sensor_readings, batch)
+                batch = []
+        if batch:
+            await insert_chunked(db.sensor_readings, batch)
+
+    await server.rebuild_asset_summary()
+    await server.tile_cache.clear()
+    if server.sensor_simulator.ingest:
+        await server.sensor_simulator.load_assets()
+    await server.collection_versions.bump("assets", "alerts")
+    server.logger.info("Seeded %d assets, %d alerts, ~%d readings in %.1fs",
+                       args.assets, args.alerts, args.readings, time.perf_counter() - started)
+
+
+def use_in_memory_db(server):
+    """Swap in mongomock-motor and skip the provisioning steps it cannot run."""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("--in-memory needs mongomock-motor: pip install mongomock-motor")
+
+    async def skip():
+        return None
+
+    server.client = AsyncMongoMockClient(tz_aware=True)
+    server.db = server.TimedDatabase(server.client[os.environ["DB_NAME"]])
+    # No time-series collections, $indexStats, pipeline updates or $merge in mongomock
+    for name in ("migrate_session_expiry", "ensure_sensor_collections", "backfill_asset_geo", "log_index_usage"):
+        setattr(server, name, skip)
+    server.sensor_rollups.start = lambda: None
+
+
+def serve(args):
+    import uvicorn
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+
+    if args.in_memory:
+        use_in_memory_db(server)
+    if not args.no_seed:
+        startup = server.startup
+
+        async def startup_and_seed():
+            await startup()
+            await seed(server, args)
+        # The app's lifespan looks startup() up at call time
+        server.startup = startup_and_seed
+    uvicorn.run(server.app, host="127.0.0.1", port=args.port, log_level="warning", workers=1)
+
+
+# ---------------------------------------------------------------- client side
+
+class Recorder:
+    """Latency samples and status codes per endpoint, ignoring the warm-up period."""
+
+    def __init__(self, record_from: float):
+        self.record_from = record_from
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    async def call(self, http: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await http.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        if started >= self.record_from:
+            self.samples[name].append(time.perf_counter() - started)
+            self.statuses[name][status] += 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name in sorted(self.samples):
+            latencies = np.array(self.samples[name]) * 1000
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            statuses = self.statuses[name]
+            endpoints[name] = {
+                "requests": len(latencies),
+                "errors": sum(n for s, n in statuses.items() if not s.isdigit() or int(s) >= 400),
+                "rps": round(len(latencies) / elapsed, 2),
+                "mean_ms": round(float(latencies.mean()), 2),
+                "p50_ms": round(float(p50), 2),
+                "p95_ms": round(float(p95), 2),
+                "p99_ms": round(float(p99), 2),
+                "max_ms": round(float(latencies.max()), 2),
+                "status": dict(statuses),
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "total": {
+                "requests": total,
+                "errors": sum(e["errors"] for e in endpoints.values()),
+                "rps": round(total / elapsed, 2) if elapsed else 0,
+            },
+            "endpoints": endpoints,
+        }
+
+
+class VirtualUser:
+    """One dashboard tab: logs in, then polls its page like the frontend does."""
+
+    def __init__(self, index: int, args, recorder: Recorder, http: httpx.AsyncClient, asset_ids: List[str]):
+        self.email = bench_email(index)
+        self.args = args
+        self.recorder = recorder
+        self.http = http
+        self.rng = random.Random(args.seed * 100003 + index)
+        self.asset_id = self.rng.choice(asset_ids) if asset_ids else None
+        self.page = "monitoring" if index < round(args.users * args.monitoring_share) else "overview"
+        self.headers = {}
+        self.etags = {}
+
+    async def get(self, name: str, url: str):
+        headers = dict(self.headers)
+        if self.args.etags and url in self.etags:
+            headers["If-None-Match"] = self.etags[url]
+        response = await self.recorder.call(self.http, name, "GET", url, headers=headers)
+        if response is not None and response.status_code == 200 and "etag" in response.headers:
+            self.etags[url] = response.headers["etag"]
+
+    async def run(self, deadline: float):
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(self.rng.uniform(0, self.args.overview_interval * self.args.time_scale))
+        token = await login(self.recorder, self.http, self.email)
+        if token is None:
+            return
+        self.headers = {"Authorization": f"Bearer {token}"}
+        if self.page == "monitoring":
+            await self.get("GET /assets", "/assets")
+            interval, tick = self.args.monitoring_interval, self.monitoring
+        else:
+            interval, tick = self.args.overview_interval, self.overview
+        interval *= self.args.time_scale
+        next_at = loop.time()
+        while next_at < deadline:
+            await tick()
+            next_at += interval
+            while next_at < loop.time():
+                next_at += interval  # like setInterval, missed ticks are dropped
+            await asyncio.sleep(max(0.0, min(next_at, deadline) - loop.time()))
+
+    async def overview(self):
+        await asyncio.gather(
+            self.get("GET /analytics/overview", "/analytics/overview"),
+            self.get("GET /alerts", "/alerts?status=active"),
+            self.get("GET /assets", "/assets"),
+        )
+
+    async def monitoring(self):
+        if self.asset_id:
+            await self.get("GET /sensors/live/{asset_id}", f"/sensors/live/{self.asset_id}")
+
+
+def bench_email(index: int) -> str:
+    return f"bench-{index:05d}@loadtest.example.nl"
+
+
+async def login(recorder: Recorder, http: httpx.AsyncClient, email: str) -> Optional[str]:
+    response = await recorder.call(http, "POST /auth/login", "POST", "/auth/login",
+                                   json={"email": email, "password": BENCH_PASSWORD})
+    if response is None or response.status_code != 200:
+        return None
+    return response.json()["session_token"]
+
+
+async def login_bursts(args, recorder: Recorder, http: httpx.AsyncClient, deadline: float):
+    loop = asyncio.get_running_loop()
+    rng = random.Random(args.seed - 1)
+    interval = args.login_burst_interval * args.time_scale
+    await asyncio.sleep(interval / 2)
+    while loop.time() < deadline:
+        emails = [bench_email(rng.randrange(args.users)) for _ in range(args.login_burst_size)]
+        await asyncio.gather(*(login(recorder, http, email) for email in emails))
+        await asyncio.sleep(max(0.0, min(interval, deadline - loop.time())))
+
+
+async def register_users(http: httpx.AsyncClient, count: int):
+    """Create the benchmark accounts; existing ones (reused database) are fine."""
+    semaphore = asyncio.Semaphore(16)
+
+    async def register(index: int):
+        async with semaphore:
+            response = await http.post("/auth/register", json={
+                "email": bench_email(index), "password": BENCH_PASSWORD,
+                "name": f"Benchmark {index}", "role": "veldwerker",
+            })
+            if response.status_code not in (200, 400):
+                response.raise_for_status()
+
+    await asyncio.gather(*(register(i) for i in range(count)))
+
+
+async def drive(args, base_url: str) -> dict:
+    limits = httpx.Limits(max_connections=args.users * 3 + args.login_burst_size + 8)
+    async with httpx.AsyncClient(base_url=f"{base_url}/api", timeout=args.timeout, limits=limits) as http:
+        await register_users(http, max(args.users, 1))
+        setup = Recorder(record_from=float("inf"))
+        token = await login(setup, http, bench_email(0))
+        response = await http.get("/assets?fields=asset_id&limit=5000", headers={"Authorization": f"Bearer {token}"})
+        asset_ids = [a["asset_id"] for a in response.json()]
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + args.warmup + args.duration
+        recorder = Recorder(record_from=time.perf_counter() + args.warmup)
+        users = [VirtualUser(i, args, recorder, http, asset_ids) for i in range(args.users)]
+        tasks = [user.run(deadline) for user in users]
+        if args.login_burst_size:
+            tasks.append(login_bursts(args, recorder, http, deadline))
+        await asyncio.gather(*tasks)
+        return recorder.report(loop.time() - started - args.warmup)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"server exited with code {process.returncode} during startup")
+        try:
+            if httpx.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    sys.exit(f"server did not become ready within {timeout:.0f}s")
+
+
+def git_revision() -> dict:
+    def git(*cmd):
+        try:
+            return subprocess.run(["git", *cmd], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def server_settings() -> dict:
+    """Environment overrides of settings server.py reads, so runs can be told apart."""
+    source = (BACKEND_DIR / "server.py").read_text()
+    names = set(re.findall(r'os\.environ\.get\("([A-Z0-9_]+)"', source))
+    return {name: os.environ[name] for name in sorted(names) if name in os.environ}
+
+
+def print_report(result: dict):
+    print(f"{'endpoint':<32} {'reqs':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, e in result["endpoints"].items():
+        print(f"{name:<32} {e['requests']:>7} {e['errors']:>5} {e['rps']:>8.1f} {e['p50_ms']:>9.2f} {e['p95_ms']:>9.2f} {e['p99_ms']:>9.2f}")
+    total = result["total"]
+    print(f"{'total':<32} {total['requests']:>7} {total['errors']:>5} {total['rps']:>8.1f}")
+
+
+def run(args):
+    process = None
+    base_url = args.url
+    if not base_url:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        env = dict(os.environ, MONGO_URL=args.mongo_url, DB_NAME=args.db_name)
+        # Every virtual user logs in from 127.0.0.1, and bursts reuse the same accounts
+        env.setdefault("AUTH_IP_RATE_LIMIT", "0/60")
+        env.setdefault("LOGIN_RATE_LIMIT", "0/300")
+        command = [sys.executable, __file__, "serve", "--port", str(port), "--seed", str(args.seed),
+                   "--assets", str(args.assets), "--alerts", str(args.alerts),
+                   "--readings", str(args.readings), "--reading-assets", str(args.reading_assets)]
+        if args.in_memory:
+            command.append("--in-memory")
+        process = subprocess.Popen(command, env=env)
+    try:
+        if process:
+            wait_until_ready(base_url, process, args.startup_timeout)
+        result = asyncio.run(drive(args, base_url))
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+
+    result = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "target": args.url or ("in-memory" if args.in_memory else args.mongo_url),
+            "config": {k: v for k, v in vars(args).items() if k not in ("func", "output")},
+            "settings": server_settings(),
+        },
+        **result,
+    }
+    print_report(result)
+    output = Path(args.output) if args.output else RESULTS_DIR / (
+        f"load-{(result['meta']['commit'] or 'nogit')[:10]}-{datetime.now():%Y%m%dT%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"results written to {output}")
+
+
+def compare(args):
+    """Print per-endpoint changes; exit 1 if any p95 regressed by more than the threshold."""
+    before = json.loads(Path(args.before).read_text())
+    after = json.loads(Path(args.after).read_text())
+    regressions = []
+    print(f"{'endpoint':<32} {'metric':<7} {'before':>10} {'after':>10} {'change':>8}")
+    for name in sorted(set(before["endpoints"]) | set(after["endpoints"])):
+        old, new = before["endpoints"].get(name), after["endpoints"].get(name)
+        if old is None or new is None:
+            print(f"{name:<32} only in {'after' if old is None else 'before'}")
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+            change = (new[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            print(f"{name:<32} {metric[:-3] if metric != 'rps' else metric:<7} {old[metric]:>10.2f} {new[metric]:>10.2f} {change:>+7.1f}%")
+            if metric == "p95_ms" and change > args.threshold:
+                regressions.append(name)
+    if regressions:
+        print(f"p95 regressed more than {args.threshold:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+def add_scale_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--assets", type=int, default=1000)
+    parser.add_argument("--alerts", type=int, default=2000)
+    parser.add_argument("--readings", type=int, default=100000, help="Raw sensor readings over the last 24 h")
+    parser.add_argument("--reading-assets", type=int, default=50, help="Assets that get raw readings")
+    parser.add_argument("--in-memory", action="store_true", help="Use mongomock-motor instead of MongoDB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subcommands.add_parser("run", help="Boot (or target) a server and drive traffic")
+    add_scale_arguments(run_parser)
+    run_parser.add_argument("--url", help="Drive an already running server instead of booting one (no seeding)")
+    run_parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    run_parser.add_argument("--db-name", default="digital_delta_bench")
+    run_parser.add_argument("--users", type=int, default=50)
+    run_parser.add_argument("--monitoring-share", type=float, default=0.5, help="Fraction of users on the Monitoring page")
+    run_parser.add_argument("--overview-interval", type=float, default=30.0)
+    run_parser.add_argument("--monitoring-interval", type=float, default=3.0)
+    run_parser.add_argument("--login-burst-size", type=int, default=20)
+    run_parser.add_argument("--login-burst-interval", type=float, default=120.0)
+    run_parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply every interval by this factor")
+    run_parser.add_argument("--duration", type=float, default=120.0, help="Measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=5.0, help="Unrecorded seconds before measuring")
+    run_parser.add_argument("--no-etags", dest="etags", action="store_false", help="Do not revalidate with If-None-Match")
+    run_parser.add_argument("--timeout", type=float, default=30.0)
+    run_parser.add_argument("--startup-timeout", type=float, default=120.0)
+    run_parser.add_argument("--output", help="Result file (default: benchmarks/results/load-<commit>-<time>.json)")
+    run_parser.set_defaults(func=run)
+
+    serve_parser = subcommands.add_parser("serve", help="Seed and serve server.py (used by run)")
+    add_scale_arguments(serve_parser)
+    serve_parser.add_argument("--port", type=int, default=8001)
+    serve_parser.add_argument("--no-seed", action="store_true")
+    serve_parser.set_defaults(func=serve)
+
+    compare_parser = subcommands.add_parser("compare", help="Diff two result files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="Allowed p95 regression in percent")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
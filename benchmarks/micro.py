@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Time the CPU-bound hot paths of server.py in isolation.
+
+Each case runs on synthetic input of a fixed, seeded size, so results can be
+compared between commits like the load test's:
+
+    python benchmarks/micro.py --repeat 20 --output micro.json
+    python benchmarks/micro.py --only lttb,mvt_encode
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from json_serialization import ListCursor, make_assets, server
+
+
+async def drain(gen) -> int:
+    return sum([1 async for _ in gen])
+
+
+async def byte_chunks(data: bytes, size: int = 65536):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def build_cases(loop: asyncio.AbstractEventLoop) -> dict:
+    rng = np.random.default_rng(42)
+    series_x = np.arange(100_000, dtype=np.float64)
+    series_y = np.cumsum(rng.normal(size=series_x.size))
+
+    simulator = server.SensorSimulator(seed=42)
+    for i in range(2500):
+        simulator.track(f"SIM-{i:05d}")
+    now = time.time()
+    readings = []
+    for step in range(2):
+        readings.extend(simulator.readings(now + step))
+    engine_template = server.AlertEngine(window=120, zscore=4.0, ewma_alpha=0.05, drift=3.0)
+    # A gateway backfill: one flush of 5000 readings from one sensor, or from five
+    backfill = [dict(readings[0], timestamp=datetime.fromtimestamp(now + i, timezone.utc)) for i in range(5000)]
+    backfill_five = [dict(readings[i % 5], timestamp=datetime.fromtimestamp(now + i // 5, timezone.utc))
+                     for i in range(5000)]
+
+    tile_points = [(int(x), int(y), {"asset_id": f"AST-{i:06d}", "status": "operational", "health_score": 80})
+                   for i, (x, y) in enumerate(rng.integers(0, server.TILE_EXTENT, size=(5000, 2)))]
+
+    assets = make_assets(1000)
+    assets_json = server.FastJSONResponse(assets).body
+    csv_body = loop.run_until_complete(collect_bytes(server.export_csv(ListCursor(assets))))
+    geojson_body = loop.run_until_complete(collect_bytes(server.export_geojson(ListCursor(assets))))
+
+    return {
+        "lttb": lambda: server.lttb(series_x, series_y, 1000),
+        "simulator_tick": lambda: simulator.readings(now),
+        "alert_engine": lambda: copy.deepcopy(engine_template).evaluate(readings),
+        "alert_engine_one_sensor": lambda: copy.deepcopy(engine_template).evaluate(backfill),
+        "alert_engine_five_sensors": lambda: copy.deepcopy(engine_template).evaluate(backfill_five),
+        "mvt_encode": lambda: server.encode_point_tile("assets", tile_points),
+        "gzip_assets": lambda: server.compress_body(assets_json, "gzip", server.GZIP_LEVEL, server.BROTLI_QUALITY),
+        "brotli_assets": lambda: server.compress_body(assets_json, "br", server.GZIP_LEVEL, server.BROTLI_QUALITY),
+        "csv_import_parse": lambda: loop.run_until_complete(drain(server.parse_csv_rows(byte_chunks(csv_body)))),
+        "geojson_import_parse": lambda: loop.run_until_complete(drain(server.parse_geojson_rows(byte_chunks(geojson_body)))),
+    }
+
+
+async def collect_bytes(gen) -> bytes:
+    return b"".join([chunk async for chunk in gen])
+
+
+def measure(fn, repeat: int) -> dict:
+    fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "median_ms": round(timings[len(timings) // 2] * 1000, 3),
+        "min_ms": round(timings[0] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", help="Comma-separated case names")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    cases = build_cases(loop)
+    if args.only:
+        cases = {name: cases[name] for name in args.only.split(",")}
+    results = {}
+    for name, fn in cases.items():
+        results[name] = result = measure(fn, args.repeat)
+        print(f"  {name:<22} {result['median_ms']:>9.3f} ms  (min {result['min_ms']:.3f})")
+    loop.close()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"repeat": args.repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
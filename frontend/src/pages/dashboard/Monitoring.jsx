@@ -205,25 +205,25 @@ export default function MonitoringPage() {
     };
   }, [loading, assets]);
 
-  // Fetch live sensor data for selected asset
+  // Subscribe to live sensor data for selected asset
   useEffect(() => {
     if (!selectedAsset) return;
 
-    const fetchSensorData = async () => {
-      try {
-        const response = await axios.get(
-          `${API}/sensors/live/${selectedAsset.asset_id}`,
-          { withCredentials: true }
-        );
-        setSensorData(response.data.sensors);
-      } catch (error) {
-        console.error('Failed to fetch sensor data:', error);
+    const source = new EventSource(
+      `${API}/sensors/stream?asset_ids=${encodeURIComponent(selectedAsset.asset_id)}`,
+      { withCredentials: true }
+    );
+    source.addEventListener('reading', (event) => {
+      const data = JSON.parse(event.data);
+      if (data.asset_id === selectedAsset.asset_id) {
+        setSensorData(data.sensors);
       }
+    });
+    source.onerror = (error) => {
+      console.error('Sensor stream error:', error);
     };
 
-    fetchSensorData();
-    const interval = setInterval(fetchSensorData, 3000);
-    return () => clearInterval(interval);
+    return () => source.close();
   }, [selectedAsset]);
 
   // Zoom controls
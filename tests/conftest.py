@@ -0,0 +1,66 @@
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+# server.py reads its settings at import time; keep tests off real services and fast
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "digital_delta_test")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("SHARED_STATE_URL", "memory://")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """TestClient against an in-memory MongoDB and fresh shared state."""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from fastapi.testclient import TestClient
+
+    async def skip():
+        return None
+
+    mongo = mongomock_motor.AsyncMongoMockClient(tz_aware=True)
+    monkeypatch.setattr(server, "client", mongo)
+    monkeypatch.setattr(server, "db", server.TimedDatabase(mongo[os.environ["DB_NAME"]]))
+    # No time-series collections, $indexStats, pipeline updates or $merge in mongomock
+    for name in ("migrate_session_expiry", "ensure_sensor_collections", "backfill_asset_geo", "log_index_usage"):
+        monkeypatch.setattr(server, name, skip)
+    monkeypatch.setattr(server.sensor_rollups, "start", lambda: None)
+    state = server.MemoryState()
+    for holder in (server.session_cache, server.collection_versions, server.tile_cache, server.live_sensor_hub,
+                   *server.rate_limiters.values()):
+        monkeypatch.setattr(holder, "state", state)
+    monkeypatch.setattr(server, "shared_state", state)
+    with TestClient(server.app) as client:
+        yield client
+
+
+@pytest.fixture
+def login(api):
+    """Register and log in a user; returns its Authorization headers."""
+    def login_as(email: str = "admin@example.nl", role: str = "admin") -> dict:
+        api.post("/api/auth/register", json={"email": email, "password": "secret1", "name": "Test", "role": role})
+        response = api.post("/api/auth/login", json={"email": email, "password": "secret1"})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['session_token']}"}
+    return login_as
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freeze ``datetime.now`` inside server; assign ``clock.now_value`` to move it."""
+    class Clock(datetime):
+        # today, so sessions issued under the real clock stay valid
+        now_value = datetime.now(timezone.utc).replace(hour=9, minute=0, second=0, microsecond=0)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.now_value
+
+    monkeypatch.setattr(server, "datetime", Clock)
+    return Clock
@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime, timezone
+
+import numpy as np
+from pymongo.errors import DuplicateKeyError
+
+import server
+
+T0 = 1_700_000_000.0
+
+
+def reading(value: float, t: float, sensor: str = "S-1", sensor_type: str = "pressure", asset: str = "AST-1") -> dict:
+    return {"timestamp": datetime.fromtimestamp(T0 + t, timezone.utc), "value": value,
+            "meta": {"asset_id": asset, "sensor_id": sensor, "type": sensor_type, "unit": "hPa"}}
+
+
+def steady(n: int, start: float = 0.0, level: float = 1000.0, seed: int = 0, **meta) -> list:
+    noise = np.random.default_rng(seed).normal(0, 0.1, n)
+    return [reading(level + float(noise[i]), start + 60 * i, **meta) for i in range(n)]
+
+
+def rules(triggers) -> set:
+    return {t["rule"] for t in triggers}
+
+
+def engine(**options) -> server.AlertEngine:
+    return server.AlertEngine(**{"window": 20, "min_periods": 10, **options})
+
+
+def test_bands_raise_critical_or_warning_not_both():
+    assert rules(engine().evaluate([reading(1050.0, 0)])) == {"critical"}
+    assert rules(engine().evaluate([reading(1035.0, 0)])) == {"warning"}
+    assert engine().evaluate([reading(1000.0, 0)]) == []
+
+
+def test_one_trigger_per_rule_per_batch_with_count_and_latest_value():
+    triggers = engine().evaluate([reading(1050.0, 0), reading(1000.0, 60), reading(1060.0, 120), reading(1055.0, 180)])
+    critical = [t for t in triggers if t["rule"] == "critical"]
+    assert len(critical) == 1
+    assert critical[0]["count"] == 3
+    assert critical[0]["value"] == 1055.0
+    assert critical[0]["timestamp"] == datetime.fromtimestamp(T0 + 180, timezone.utc)
+
+
+def test_rate_of_change_uses_the_reading_from_the_previous_batch():
+    alerts = engine()
+    assert alerts.evaluate([reading(1000.0, 0)]) == []
+    assert rules(alerts.evaluate([reading(1010.0, 1)])) == {"rate_of_change"}
+    # The same jump spread over a minute stays under 0.5 hPa/s
+    assert alerts.evaluate([reading(1020.0, 61)]) == []
+
+
+def test_zscore_waits_for_min_periods():
+    spike = 1003.0
+    early = engine()
+    early.evaluate(steady(9))
+    assert "zscore" not in rules(early.evaluate([reading(spike, 60 * 9)]))
+
+    warmed = engine()
+    warmed.evaluate(steady(10))
+    assert "zscore" in rules(warmed.evaluate([reading(spike, 60 * 10)]))
+
+
+def test_window_forgets_readings_older_than_window():
+    alerts = engine()
+    alerts.evaluate(steady(20))
+    shifted = steady(40, start=60 * 20, level=1010.0, seed=1)
+    fired = [rules(alerts.evaluate([doc])) for doc in shifted]
+    assert "zscore" in fired[0]
+    # Once the window holds only the new level, it is normal again
+    assert all("zscore" not in f for f in fired[25:])
+
+
+def engine_last_ewma(docs) -> float:
+    alerts = engine()
+    for doc in sorted(docs, key=lambda d: d["timestamp"]):
+        alerts.evaluate([doc])
+    return alerts._last_ewma[alerts._rows[("AST-1", "S-1", "pressure")]]
+
+
+def test_batch_split_does_not_change_the_outcome():
+    docs = steady(60) + steady(60, level=1004.0, seed=3, sensor="S-2") + [reading(1040.0, 630), reading(1012.0, 3030)]
+    docs[45] = dict(docs[45], value=1006.0)
+    whole = engine().evaluate(list(reversed(docs)))
+
+    split = engine()
+    pieces = []
+    ordered = sorted(docs, key=lambda d: d["timestamp"])
+    for start in range(0, len(ordered), 7):
+        pieces += split.evaluate(ordered[start:start + 7])
+
+    def hits(triggers):
+        counts = {}
+        for t in triggers:
+            key = (t["sensor_id"], t["rule"])
+            counts[key] = counts.get(key, 0) + t["count"]
+        return counts
+
+    assert hits(pieces) == hits(whole)
+    assert np.isclose(split._last_ewma[0], engine_last_ewma(docs))
+
+
+def test_process_opens_one_alert_per_rule_until_resolved(api, login):
+    headers = login()
+    call = api.portal.call
+    first = engine(dedupe_ttl=0)
+
+    assert call(first.process, [reading(1050.0, 0)]) == 1
+    # A fresh engine has no local cooldown; the open alert in Mongo still blocks a second one
+    second = engine(dedupe_ttl=0)
+    assert call(second.process, [reading(1051.0, 60)]) == 0
+    assert second.suppressed == 1
+
+    alerts = api.get("/api/alerts", headers=headers).json()
+    assert len(alerts) == 1 and alerts[0]["rule"] == "S-1:critical"
+    api.put(f"/api/alerts/{alerts[0]['alert_id']}/resolve", headers=headers)
+
+    assert call(second.process, [reading(1052.0, 120)]) == 1
+    assert call(server.db.alerts.count_documents, {"rule": "S-1:critical"}) == 2
+
+
+def test_cooldown_suppresses_without_touching_mongo(api, monkeypatch):
+    alerts = engine(dedupe_ttl=60)
+    assert api.portal.call(alerts.process, [reading(1050.0, 0)]) == 1
+
+    async def unexpected(*args, **kwargs):
+        raise AssertionError("cooldown should skip the upsert")
+
+    monkeypatch.setattr(server.db.alerts, "update_one", unexpected)
+    assert api.portal.call(alerts.process, [reading(1050.0, 60)]) == 0
+    assert alerts.suppressed == 1
+
+
+def test_concurrent_insert_by_another_worker_counts_as_suppressed(api, monkeypatch):
+    async def taken(*args, **kwargs):
+        raise DuplicateKeyError("open_alert_per_rule")
+
+    monkeypatch.setattr(server.db.alerts, "update_one", taken)
+    alerts = engine()
+    assert api.portal.call(alerts.process, [reading(1050.0, 0)]) == 0
+    assert (alerts.raised, alerts.suppressed) == (0, 1)
@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def alert(alert_id: str, created_at: datetime) -> dict:
+    return {
+        "alert_id": alert_id, "asset_id": "AST-1", "asset_name": "Sluis", "type": "warning",
+        "title": "Test", "description": "Test", "severity": "low", "status": "active", "created_at": created_at,
+    }
+
+
+def test_paging_keeps_alerts_sharing_a_timestamp(api, login):
+    headers = login()
+    tick = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    older = datetime(2024, 12, 31, tzinfo=timezone.utc)
+    docs = [alert(f"ALR-{i}", tick) for i in range(5)] + [alert("ALR-OLD", older)]
+    api.portal.call(server.db.alerts.insert_many, docs)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"before": cursor} if cursor else {})}
+        response = api.get("/api/alerts", params=params, headers=headers)
+        assert response.status_code == 200
+        seen += [a["alert_id"] for a in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+
+    assert seen == ["ALR-4", "ALR-3", "ALR-2", "ALR-1", "ALR-0", "ALR-OLD"]
+
+
+def test_bare_timestamp_cursor_still_accepted(api, login):
+    headers = login()
+    api.portal.call(server.db.alerts.insert_many, [
+        alert("ALR-A", datetime(2025, 1, 2, tzinfo=timezone.utc)),
+        alert("ALR-B", datetime(2025, 1, 1, tzinfo=timezone.utc)),
+    ])
+    response = api.get("/api/alerts", params={"before": "2025-01-02T00:00:00+00:00"}, headers=headers)
+    assert [a["alert_id"] for a in response.json()] == ["ALR-B"]
+
+
+def test_invalid_cursor_is_rejected(api, login):
+    headers = login()
+    assert api.get("/api/alerts", params={"before": "yesterday|ALR-1"}, headers=headers).status_code == 400
+
+
+def test_parse_projection():
+    assert server.parse_projection(None, server.Asset, "asset_id") is None
+    assert server.parse_projection(" name, status ,", server.Asset, "asset_id") == {
+        "_id": 0, "asset_id": 1, "name": 1, "status": 1
+    }
+
+
+def test_parse_projection_rejects_unknown_fields():
+    with pytest.raises(HTTPException) as error:
+        server.parse_projection("name,password", server.Asset, "asset_id")
+    assert error.value.status_code == 400
+    assert "password" in error.value.detail
+
+
+def test_projected_pages_still_carry_the_cursor(api, login):
+    headers = login()
+    api.portal.call(server.db.alerts.insert_many, [
+        alert("ALR-A", datetime(2025, 1, 2, tzinfo=timezone.utc)),
+        alert("ALR-B", datetime(2025, 1, 1, tzinfo=timezone.utc)),
+    ])
+    response = api.get("/api/alerts", params={"fields": "title", "limit": 1}, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == [{"alert_id": "ALR-A", "title": "Test", "created_at": "2025-01-02T00:00:00+00:00"}]
+    assert response.headers["x-next-cursor"] == "2025-01-02T00:00:00+00:00|ALR-A"
+    assert api.get("/api/alerts", params={"fields": "secret"}, headers=headers).status_code == 400
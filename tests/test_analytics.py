@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+
+
+def asset(asset_id: str, due: datetime, type: str = "lock", health_score: int = 90) -> dict:
+    return {"asset_id": asset_id, "name": asset_id, "type": type, "location": "IJmuiden", "latitude": 52.46,
+            "longitude": 4.6, "status": "operational", "health_score": health_score, "sensors": [],
+            "last_inspection": due - timedelta(days=180), "next_maintenance": due, "created_at": due}
+
+
+def forecast(api, headers, **params) -> list:
+    response = api.get("/api/analytics/maintenance-forecast", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["total_scheduled"] == len(body["forecast"])
+    return body["forecast"]
+
+
+def test_forecast_window_runs_to_the_end_of_the_last_day(api, login, clock):
+    today = clock.now_value.replace(hour=0)
+    api.portal.call(server.db.assets.insert_many, [
+        asset("AST-LAST", today + timedelta(days=8) - timedelta(microseconds=1000)),
+        asset("AST-AFTER", today + timedelta(days=8)),
+        asset("AST-OVERDUE", today - timedelta(days=30), health_score=50),
+        asset("AST-NOW", clock.now_value),
+    ])
+
+    rows = forecast(api, login(), days=7)
+
+    assert [row["asset_id"] for row in rows] == ["AST-OVERDUE", "AST-NOW", "AST-LAST"]
+    assert rows[0] == {"asset_id": "AST-OVERDUE", "asset_name": "AST-OVERDUE", "type": "lock",
+                       "scheduled_date": (today - timedelta(days=30)).isoformat(), "priority": "high"}
+    assert rows[1]["priority"] == "normal"
+
+
+def test_forecast_window_moves_at_midnight(api, login, clock):
+    today = clock.now_value.replace(hour=0)
+    api.portal.call(server.db.assets.insert_one, asset("AST-1", today + timedelta(days=2)))
+    headers = login()
+
+    assert forecast(api, headers, days=1) == []
+    clock.now_value = today + timedelta(days=1, minutes=1)
+    assert [row["asset_id"] for row in forecast(api, headers, days=1)] == ["AST-1"]
+
+
+def test_forecast_filters_by_type(api, login, clock):
+    api.portal.call(server.db.assets.insert_many, [
+        asset("AST-LOCK", clock.now_value), asset("AST-BRIDGE", clock.now_value, type="bridge"),
+    ])
+    assert [row["asset_id"] for row in forecast(api, login(), type="bridge")] == ["AST-BRIDGE"]
+
+
+@pytest.mark.parametrize("days", ["0", "-1", "3651", "soon"])
+def test_forecast_days_is_validated(api, login, days):
+    response = api.get("/api/analytics/maintenance-forecast", params={"days": days}, headers=login())
+    assert response.status_code == 422
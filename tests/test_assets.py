@@ -0,0 +1,27 @@
+import server
+
+ASSET = {"name": "Sluis", "type": "lock", "location": "IJmuiden", "latitude": 52.46, "longitude": 4.6,
+         "status": "operational", "health_score": 90}
+
+
+def summary(api) -> dict:
+    return api.portal.call(server.db.analytics_summary.find_one, {"_id": server.ASSET_SUMMARY_ID})
+
+
+def test_update_adjusts_the_summary_by_the_replaced_document(api, login):
+    headers = login()
+    asset_id = api.post("/api/assets", json=ASSET, headers=headers).json()["asset_id"]
+    api.portal.call(server.rebuild_asset_summary)
+
+    response = api.put(f"/api/assets/{asset_id}", json={**ASSET, "status": "critical", "health_score": 40}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "critical" and response.json()["health_score"] == 40
+    doc = summary(api)
+    assert doc["total"] == 1 and doc["health_sum"] == 40
+    assert doc["status"].get("operational", 0) == 0 and doc["status"]["critical"] == 1
+
+
+def test_update_of_missing_asset_is_404(api, login):
+    response = api.put("/api/assets/AST-NOPE", json=ASSET, headers=login())
+    assert response.status_code == 404
@@ -0,0 +1,175 @@
+import asyncio
+import gzip
+
+import brotli
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import server
+
+BIG = {"rows": [{"asset_id": f"AST-{i}", "status": "operational"} for i in range(200)]}
+ETAG = '"v1"'
+
+
+def big(request):
+    if server.etag_matches(request, ETAG):
+        return Response(status_code=304, headers={"ETag": ETAG})
+    return JSONResponse(BIG, headers={"ETag": ETAG})
+
+
+def small(request):
+    return JSONResponse({"ok": True})
+
+
+def encoded(request):
+    return Response(gzip.compress(b"x" * 4096), media_type="text/plain", headers={"Content-Encoding": "gzip"})
+
+
+def image(request):
+    return Response(b"\x89PNG" + b"\0" * 4096, media_type="image/png")
+
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+
+def events(request):
+    return StreamingResponse(chunks(b"data: 1\n\n", b"data: 2\n\n"), media_type="text/event-stream")
+
+
+def ndjson(request):
+    return StreamingResponse(chunks(b'{"a": 1}\n', b'{"a": 2}\n'), media_type="application/x-ndjson")
+
+
+app = server.CompressionMiddleware(Starlette(routes=[
+    Route(path, endpoint) for path, endpoint in
+    (("/big", big), ("/small", small), ("/encoded", encoded), ("/image", image), ("/events", events), ("/ndjson", ndjson))
+]))
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def call(path: str, accept_encoding: str = "gzip") -> list:
+    """Run one request through the middleware and return the ASGI messages it sends."""
+    sent, requests = [], iter([{"type": "http.request", "body": b"", "more_body": False}])
+
+    async def receive():
+        # streaming responses keep listening for a disconnect until they finish
+        return next(requests, None) or await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "root_path": "", "scheme": "http", "server": ("test", 80), "client": ("test", 1),
+             "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("identity", None),
+    ("", None),
+    ("*", "br"),
+    ("br;q=0, *;q=0.3", "gzip"),
+    ("GZIP;q=0.8", "gzip"),
+    ("br;q=nonsense, gzip", "gzip"),
+])
+def test_negotiate_encoding(header, expected):
+    assert server.negotiate_encoding(header) == expected
+
+
+@pytest.mark.parametrize("encoding, decode", [("gzip", gzip.decompress), ("br", brotli.decompress)])
+def test_large_json_is_compressed(encoding, decode):
+    start, body = call("/big", encoding)
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == encoding.encode()
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert int(headers[b"content-length"]) == len(body["body"])
+    assert decode(body["body"]) == JSONResponse(BIG).body
+
+
+def test_identity_clients_get_the_plain_body(client):
+    response = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == ETAG
+    assert response.json() == BIG
+
+
+@pytest.mark.parametrize("path", ["/small", "/encoded", "/image"])
+def test_small_encoded_and_binary_bodies_pass_through(path):
+    _, plain = call(path, "identity")
+    start, body = call(path, "gzip, br")
+    assert body["body"] == plain["body"]
+    assert dict(start["headers"])[b"vary"] == b"Accept-Encoding"
+
+
+def test_compressed_etag_is_weak_and_still_revalidates(client):
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == f"W/{ETAG}"
+
+    response = client.get("/big", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+    assert "content-encoding" not in response.headers
+    assert response.content == b""
+
+
+def test_event_streams_are_not_buffered():
+    start, *bodies = call("/events", "gzip, br")
+    assert b"content-encoding" not in dict(start["headers"])
+    assert [m["body"] for m in bodies if m["body"]] == [b"data: 1\n\n", b"data: 2\n\n"]
+
+
+def test_streams_are_flushed_chunk_by_chunk():
+    start, *bodies = call("/ndjson", "gzip")
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    decoder = gzip.zlib.decompressobj(16 + gzip.zlib.MAX_WBITS)
+    # every chunk decodes on its own arrival, before the stream is finished
+    assert decoder.decompress(bodies[0]["body"]) == b'{"a": 1}\n'
+    assert decoder.decompress(bodies[1]["body"]) == b'{"a": 2}\n'
+    assert b"".join(decoder.decompress(m["body"]) for m in bodies[2:]) == b""
+
+
+@pytest.fixture
+def static(tmp_path):
+    (tmp_path / "index.html").write_text("<html>" + "<p>delta</p>" * 500 + "</html>")
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG" + b"\0" * 100)
+    assert server.precompress_static(tmp_path)["files_written"] == 2
+    return TestClient(server.PrecompressedStaticFiles(directory=tmp_path, html=True))
+
+
+@pytest.mark.parametrize("accept, encoding", [("gzip, br", "br"), ("gzip", "gzip")])
+def test_precompressed_siblings_are_served(static, accept, encoding):
+    response = static.get("/", headers={"Accept-Encoding": accept})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["content-type"].startswith("text/html")
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.text.startswith("<html><p>delta</p>")
+
+    revalidated = static.get("/", headers={"Accept-Encoding": accept, "If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+
+
+def test_static_files_without_siblings_are_served_plain(static):
+    response = static.get("/index.html", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+    response = static.get("/logo.png", headers={"Accept-Encoding": "gzip, br"})
+    assert "content-encoding" not in response.headers
+    assert response.content.startswith(b"\x89PNG")
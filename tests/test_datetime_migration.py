@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+
+import pytest
+from pymongo.results import UpdateResult
+
+import server
+
+JAN = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def updates(api, monkeypatch):
+    """Run the migration's pipeline updates, which mongomock cannot evaluate, in Python.
+
+    Only the ``$cond``/``$toDate`` shape migrate_datetimes builds is understood;
+    the selection of batches and the resume filter still run in mongomock.
+    """
+    calls = []
+
+    def install(collection: str, fail_after: int = None):
+        target = server.db[collection]
+
+        async def update_many(query, pipeline):
+            calls.append(len(query["_id"]["$in"]))
+            if fail_after is not None and len(calls) > fail_after:
+                raise ConnectionError("primary stepped down")
+            [stage] = pipeline
+            modified = 0
+            async for doc in target.find(query):
+                converted = {}
+                for field, expression in stage["$set"].items():
+                    assert expression == {"$cond": [{"$eq": [{"$type": f"${field}"}, "string"]},
+                                                    {"$toDate": f"${field}"}, f"${field}"]}
+                    if isinstance(doc.get(field), str):
+                        converted[field] = datetime.fromisoformat(doc[field])
+                if converted:
+                    await target.update_one({"_id": doc["_id"]}, {"$set": converted})
+                    modified += 1
+            return UpdateResult({"nModified": modified}, True)
+
+        monkeypatch.setattr(target, "update_many", update_many)
+        return calls
+
+    return install
+
+
+def alerts(api) -> dict:
+    docs = api.portal.call(server.db.alerts.find({}, {"_id": 0}).to_list, None)
+    return {doc["alert_id"]: doc for doc in docs}
+
+
+def test_string_fields_become_dates_and_dates_are_left_alone(api, updates):
+    calls = updates("alerts")
+    api.portal.call(server.db.alerts.insert_many, [
+        {"alert_id": "ALR-1", "created_at": "2025-01-01T00:00:00+00:00", "resolved_at": "2025-01-02T06:30:00Z"},
+        {"alert_id": "ALR-2", "created_at": JAN, "resolved_at": "2025-01-03T00:00:00+00:00"},
+        {"alert_id": "ALR-3", "created_at": JAN},
+        {"alert_id": "ALR-4", "created_at": "2025-01-04T00:00:00+00:00", "resolved_at": None},
+    ])
+
+    migrated = api.portal.call(server.migrate_datetimes, "alerts", server.DATETIME_FIELDS["alerts"])
+
+    assert migrated == 3 and calls == [3]
+    docs = alerts(api)
+    assert docs["ALR-1"]["created_at"] == JAN
+    assert docs["ALR-1"]["resolved_at"] == datetime(2025, 1, 2, 6, 30, tzinfo=timezone.utc)
+    assert docs["ALR-2"]["resolved_at"] == datetime(2025, 1, 3, tzinfo=timezone.utc)
+    assert docs["ALR-3"] == {"alert_id": "ALR-3", "created_at": JAN}
+    assert docs["ALR-4"]["resolved_at"] is None
+    assert not any(isinstance(v, str) for doc in docs.values() for k, v in doc.items() if k != "alert_id")
+
+
+def test_migration_runs_in_batches_and_resumes(api, updates):
+    api.portal.call(server.db.alerts.insert_many, [
+        {"alert_id": f"ALR-{i}", "created_at": f"2025-01-0{i + 1}T00:00:00+00:00"} for i in range(5)
+    ])
+    updates("alerts", fail_after=1)
+    with pytest.raises(ConnectionError):
+        api.portal.call(server.migrate_datetimes, "alerts", ["created_at"], 2)
+    assert sum(isinstance(doc["created_at"], str) for doc in alerts(api).values()) == 3
+
+    calls = updates("alerts")
+    calls.clear()
+    assert api.portal.call(server.migrate_datetimes, "alerts", ["created_at"], 2) == 3
+    assert calls == [2, 1]
+    assert api.portal.call(server.migrate_datetimes, "alerts", ["created_at"], 2) == 0
+
+
+def test_unmigrated_alerts_still_page(api, login):
+    api.portal.call(server.db.alerts.insert_many, [
+        {"alert_id": f"ALR-{i}", "asset_id": "AST-1", "asset_name": "Sluis", "type": "warning", "title": "Test",
+         "description": "Test", "severity": "low", "status": "active", "created_at": f"2025-01-0{i + 1}T00:00:00+00:00"}
+        for i in range(3)
+    ])
+    response = api.get("/api/alerts", params={"limit": 2}, headers=login())
+    assert response.status_code == 200
+    assert response.headers["x-next-cursor"] == "2025-01-02T00:00:00+00:00|ALR-1"
+
+
+def test_as_datetime_accepts_both_forms():
+    assert server.as_datetime("2025-01-01T00:00:00Z") == JAN
+    assert server.as_datetime(JAN) is JAN
+    assert server.as_datetime(None) is None
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+
+import server
+
+
+def block_the_loop(seconds: float):
+    time.sleep(seconds)
+
+
+def test_diagnostics_are_off_by_default(api, login, monkeypatch):
+    assert server.DIAGNOSTICS is False
+    assert server.loop_block_detector.enabled is False
+    assert server.loop_block_detector._task is None
+
+    slow = []
+    monkeypatch.setattr(server.query_diagnostics, "slow", lambda *args: slow.append(args))
+    server.record_db_time("assets", "find", 60.0, (({},), {}))
+    assert slow == []
+
+    headers = login()
+    assert api.post("/api/admin/profile", params={"seconds": 0.01}, headers=headers).status_code == 404
+    body = api.get("/api/admin/diagnostics", headers=headers).json()
+    assert body["loop_blocks"]["enabled"] is False and body["slow_queries"]["enabled"] is False
+
+
+def test_blocking_call_is_reported_with_its_stack():
+    async def scenario():
+        detector = server.LoopBlockDetector(True, threshold=0.05)
+        detector.start()
+        await asyncio.sleep(0.05)
+        block_the_loop(0.3)
+        await asyncio.sleep(0.05)
+        await detector.stop()
+        return detector.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["detected"] == 1
+    block = stats["recent"][0]
+    assert block["blocked_ms"] >= 250
+    assert any("block_the_loop" in line for line in block["stack"])
+
+
+def test_short_pauses_are_not_reported():
+    async def scenario():
+        detector = server.LoopBlockDetector(True, threshold=0.2)
+        detector.start()
+        for _ in range(5):
+            block_the_loop(0.02)
+            await asyncio.sleep(0.02)
+        await detector.stop()
+        return detector.stats()["detected"]
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_slow_queries_are_recorded_with_their_filter(api, monkeypatch):
+    monkeypatch.setattr(server, "DIAGNOSTICS", True)
+    monkeypatch.setattr(server, "SLOW_QUERY_SECONDS", 0)
+    monkeypatch.setattr(server.query_diagnostics, "slow_queries", server.deque(maxlen=10))
+    explained = []
+
+    async def explain(record, command):
+        explained.append(command)
+
+    monkeypatch.setattr(server.query_diagnostics, "_explain", explain)
+
+    async def queries():
+        await server.db.assets.find_one({"asset_id": "AST-1"})
+        await server.db.assets.insert_one({"asset_id": "AST-2", "name": "secret"})
+        await asyncio.sleep(0)
+
+    api.portal.call(queries)
+
+    records = list(server.query_diagnostics.slow_queries)
+    assert [(r["collection"], r["operation"]) for r in records] == [("assets", "find_one"), ("assets", "insert_one")]
+    assert records[0]["filter"] == '{"asset_id": "AST-1"}'
+    # inserted documents stay out of the log
+    assert records[1]["filter"] == "null"
+    assert explained[0]["filter"] == {"asset_id": "AST-1"} and explained[0]["limit"] == 1
+
+
+def test_plan_summary_reads_the_winning_plan():
+    explain = {"queryPlanner": {"winningPlan": {"stage": "LIMIT", "inputStage": {
+        "stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "asset_id_1"}}}}}
+    assert server.plan_summary(explain) == "LIMIT <- FETCH <- IXSCAN(asset_id_1)"
+
+
+def test_profiler_samples_the_target_thread():
+    done = threading.Event()
+
+    def busy():
+        while not done.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy)
+    worker.start()
+    try:
+        profile = server.SamplingProfiler().run(worker.ident, 0.1, 0.005)
+    finally:
+        done.set()
+        worker.join()
+    assert profile["samples"] > 5
+    assert any(entry["function"].startswith("busy (") for entry in profile["top_total"])
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in profile["folded"].splitlines())
+
+
+def test_profile_endpoint_is_admin_only(api, login, monkeypatch):
+    monkeypatch.setattr(server, "DIAGNOSTICS", True)
+    manager = login("manager@example.nl", "manager")
+    assert api.post("/api/admin/profile", params={"seconds": 0.01}, headers=manager).status_code == 403
+    assert api.get("/api/admin/diagnostics", headers=manager).status_code == 403
+
+    admin = login()
+    response = api.post("/api/admin/profile", params={"seconds": 0.05, "interval_ms": 1}, headers=admin)
+    assert response.status_code == 200 and response.json()["samples"] > 0
+    folded = api.post("/api/admin/profile", params={"seconds": 0.02, "format": "folded"}, headers=admin)
+    assert folded.headers["content-type"].startswith("text/plain")
+
+    server.sampling_profiler._lock.acquire()
+    try:
+        assert api.post("/api/admin/profile", params={"seconds": 0.01}, headers=admin).status_code == 409
+    finally:
+        server.sampling_profiler._lock.release()
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta, timezone
+
+import server
+
+ASSET = {"name": "Sluis", "type": "lock", "location": "IJmuiden", "latitude": 52.46, "longitude": 4.6,
+         "status": "operational", "health_score": 90}
+
+
+def revalidate(api, path: str, headers: dict):
+    """GET twice, the second time with the first ETag; returns (etag, second response)."""
+    etag = api.get(path, headers=headers).headers["etag"]
+    return etag, api.get(path, headers={**headers, "If-None-Match": etag})
+
+
+def test_matching_if_none_match_is_304_without_a_body(api, login):
+    headers = login()
+    before = server.collection_versions.not_modified
+
+    etag, response = revalidate(api, "/api/assets", headers)
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert server.collection_versions.not_modified == before + 1
+    # a weak form of the same tag (as sent back after a compressed response) matches too
+    assert api.get("/api/assets", headers={**headers, "If-None-Match": f'"x", W/{etag}'}).status_code == 304
+    assert api.get("/api/assets", headers={**headers, "If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_etags_vary_with_the_query(api, login):
+    headers = login()
+    assert (api.get("/api/assets?limit=1", headers=headers).headers["etag"]
+            != api.get("/api/assets?limit=2", headers=headers).headers["etag"])
+
+
+def test_asset_writes_change_the_tag(api, login):
+    headers = login()
+    etag, _ = revalidate(api, "/api/assets", headers)
+    asset_id = api.post("/api/assets", json=ASSET, headers=headers).json()["asset_id"]
+    response = api.get("/api/assets", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200 and len(response.json()) == 1
+
+    for write in (lambda: api.put(f"/api/assets/{asset_id}", json={**ASSET, "health_score": 10}, headers=headers),
+                  lambda: api.delete(f"/api/assets/{asset_id}", headers=headers)):
+        etag = response.headers["etag"]
+        assert write().status_code == 200
+        response = api.get("/api/assets", headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+
+
+def test_alert_writes_change_the_tag(api, login):
+    headers = login()
+    api.portal.call(server.db.alerts.insert_one, {
+        "alert_id": "ALR-1", "asset_id": "AST-1", "asset_name": "Sluis", "type": "warning", "title": "Test",
+        "description": "Test", "severity": "low", "status": "active", "created_at": datetime.now(timezone.utc),
+    })
+    for action in ("acknowledge", "resolve"):
+        etag, response = revalidate(api, "/api/alerts", headers)
+        assert response.status_code == 304
+        assert api.put(f"/api/alerts/ALR-1/{action}", headers=headers).status_code == 200
+        response = api.get("/api/alerts", headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()[0]["status"] == f"{action}d"
+
+
+def test_overview_depends_on_assets_and_alerts(api, login):
+    headers = login()
+    etag, _ = revalidate(api, "/api/analytics/overview", headers)
+    api.portal.call(server.collection_versions.bump, "alerts")
+    assert api.get("/api/analytics/overview", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+
+def test_session_exchange_and_role_changes_change_the_users_tag(api, login, monkeypatch):
+    headers = login()
+
+    async def fetch(session_id):
+        return {"id": "u1", "email": "oauth@example.nl", "name": "OAuth", "session_token": f"session_{session_id}"}
+
+    monkeypatch.setattr(server.oauth_client, "fetch", fetch)
+    etag, _ = revalidate(api, "/api/users", headers)
+    assert api.post("/api/auth/session", json={"session_id": "sid"}).status_code == 200
+    response = api.get("/api/users", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200 and len(response.json()) == 2
+
+    user_id = next(u["user_id"] for u in response.json() if u["email"] == "oauth@example.nl")
+    etag = response.headers["etag"]
+    assert api.put(f"/api/users/{user_id}/role", params={"role": "manager"}, headers=headers).status_code == 200
+    assert api.get("/api/users", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+
+def test_lost_state_never_reproduces_an_old_tag(api, login, monkeypatch):
+    headers = login()
+    etag, _ = revalidate(api, "/api/assets", headers)
+    monkeypatch.setattr(server.collection_versions, "state", server.MemoryState())
+    assert api.get("/api/assets", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+
+def test_forecast_tag_holds_for_the_day_and_rolls_at_midnight(api, login, clock):
+    headers = login()
+    etag, response = revalidate(api, "/api/analytics/maintenance-forecast", headers)
+    assert response.status_code == 304
+
+    clock.now_value = clock.now_value.replace(hour=23, minute=59)
+    assert api.get("/api/analytics/maintenance-forecast", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    clock.now_value += timedelta(minutes=2)
+    assert api.get("/api/analytics/maintenance-forecast", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+
+def test_forecast_tag_follows_asset_writes(api, login, clock):
+    headers = login()
+    etag, _ = revalidate(api, "/api/analytics/maintenance-forecast", headers)
+    api.post("/api/assets", json=ASSET, headers=headers)
+    response = api.get("/api/analytics/maintenance-forecast", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["total_scheduled"] == 0
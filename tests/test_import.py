@@ -0,0 +1,207 @@
+import asyncio
+import csv
+import io
+
+import orjson
+import pytest
+
+import server
+
+ASSET = {"name": "Sluis", "type": "lock", "location": "IJmuiden", "latitude": 52.46, "longitude": 4.6,
+         "status": "operational", "health_score": 90}
+CSV_HEADER = "asset_id,name,type,location,latitude,longitude"
+
+
+def collect(parser, chunks):
+    async def source():
+        for chunk in chunks:
+            yield chunk
+
+    async def run():
+        return [row async for row in parser(source())]
+
+    return asyncio.run(run())
+
+
+def summary(api) -> dict:
+    return api.portal.call(server.db.analytics_summary.find_one, {"_id": server.ASSET_SUMMARY_ID})
+
+
+def assets(api) -> dict:
+    docs = api.portal.call(server.db.assets.find({}, {"_id": 0}).to_list, None)
+    return {doc["asset_id"]: doc for doc in docs}
+
+
+def test_csv_rows_survive_chunks_split_inside_quotes():
+    body = 'name,type,latitude\n"Sluis, oost",lock,52.1\n"Brug\nnoord",bridge,52.2\n'.encode()
+    chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+    rows = collect(server.parse_csv_rows, chunks)
+    assert rows == [
+        ({"name": "Sluis, oost", "type": "lock", "latitude": "52.1"}, None),
+        ({"name": "Brug\nnoord", "type": "bridge", "latitude": "52.2"}, None),
+    ]
+
+
+def test_csv_rows_report_extra_columns_and_skip_blank_values():
+    rows = collect(server.parse_csv_rows, [b"\xef\xbb\xbfname,type\nA,lock,extra\nB,\n"])
+    assert rows[0] == (None, ["Row has 3 columns, header has 2"])
+    assert rows[1] == ({"name": "B"}, None)
+
+
+def test_geojson_rows_are_streamed_feature_by_feature():
+    body = (b'{"type": "FeatureCollection", "name": "x", "features": ['
+            b'{"type": "Feature", "id": 7, "geometry": {"type": "Point", "coordinates": [4.6, 52.4]},'
+            b' "properties": {"name": "Sluis {oost}"}},'
+            b'{"type": "Feature", "geometry": {"type": "LineString", "coordinates": []}, "properties": {}}'
+            b']}')
+    rows = collect(server.parse_geojson_rows, [body[i:i + 5] for i in range(0, len(body), 5)])
+    assert rows == [
+        ({"name": "Sluis {oost}", "asset_id": "7", "latitude": 52.4, "longitude": 4.6}, None),
+        (None, ["geometry: only Point features can be imported"]),
+    ]
+
+
+def test_truncated_geojson_is_reported():
+    rows = collect(server.parse_geojson_rows, [b'{"type": "FeatureCollection", "features": [{"type": "Feat'])
+    assert rows == [(None, ["Truncated GeoJSON document"])]
+
+
+def test_import_upserts_only_the_columns_a_row_carries(api, login):
+    headers = login()
+    existing = api.post("/api/assets", json={**ASSET, "status": "warning", "health_score": 40}, headers=headers).json()
+    body = "\n".join([
+        CSV_HEADER,
+        f"{existing['asset_id']},Sluis Noord,lock,IJmuiden,52.47,4.61",
+        "AST-NEW1,Brug,bridge,Haarlem,52.38,4.64",
+    ])
+
+    response = api.post("/api/assets/import?format=csv", content=body, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json() == {"format": "csv", "rows": 2, "inserted": 1, "updated": 1, "failed": 0, "errors": []}
+    docs = assets(api)
+    updated = docs[existing["asset_id"]]
+    assert updated["name"] == "Sluis Noord" and updated["latitude"] == 52.47
+    # columns the row left out keep their stored values instead of AssetCreate defaults
+    assert updated["status"] == "warning" and updated["health_score"] == 40
+    assert updated["geo"] == {"type": "Point", "coordinates": [4.61, 52.47]}
+    created = docs["AST-NEW1"]
+    assert created["status"] == "operational" and created["health_score"] == 100 and created["sensors"] == []
+    assert "next_maintenance" in created and "created_at" in created
+
+
+def test_import_reports_invalid_rows_and_writes_the_rest(api, login):
+    body = b"\n".join([
+        orjson.dumps({"asset_id": "AST-OK", **ASSET}),
+        b"{not json",
+        orjson.dumps({"asset_id": "AST-BAD", **ASSET, "latitude": "north"}),
+        b"[1, 2]",
+    ])
+
+    response = api.post("/api/assets/import", content=body, headers={**login(), "Content-Type": "application/x-ndjson"})
+
+    report = response.json()
+    assert response.status_code == 200
+    assert (report["format"], report["rows"], report["inserted"], report["failed"]) == ("ndjson", 4, 1, 3)
+    assert [error["row"] for error in report["errors"]] == [2, 3, 4]
+    assert report["errors"][0]["errors"][0].startswith("Invalid JSON")
+    assert report["errors"][1]["asset_id"] == "AST-BAD"
+    assert report["errors"][1]["errors"][0].startswith("latitude:")
+    assert report["errors"][2]["errors"] == ["Expected a JSON object"]
+    assert list(assets(api)) == ["AST-OK"]
+
+
+def test_import_rebuilds_the_summary_and_bumps_the_assets_version(api, login):
+    headers = login()
+    api.portal.call(server.rebuild_asset_summary)
+    before = api.get("/api/assets", headers=headers).headers["etag"]
+    features = {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "id": f"AST-{i}", "geometry": {"type": "Point", "coordinates": [4.6, 52.4]},
+         "properties": {**ASSET, "status": "critical", "health_score": 50}}
+        for i in range(3)
+    ]}
+
+    response = api.post("/api/assets/import", content=orjson.dumps(features),
+                        headers={**headers, "Content-Type": "application/geo+json"})
+
+    assert response.json()["inserted"] == 3
+    doc = summary(api)
+    assert doc["total"] == 3 and doc["health_sum"] == 150 and doc["status"] == {"critical": 3}
+    assert api.get("/api/assets", headers=headers).headers["etag"] != before
+
+
+def test_import_needs_a_known_format_and_a_writer_role(api, login):
+    assert api.post("/api/assets/import", content=b"x", headers={**login(), "Content-Type": "text/plain"}).status_code == 400
+    assert api.post("/api/assets/import?format=xml", content=b"x", headers=login()).status_code == 400
+    viewer = login("viewer@example.nl", "viewer")
+    assert api.post("/api/assets/import?format=csv", content=CSV_HEADER, headers=viewer).status_code == 403
+
+
+def seed(api, count: int):
+    api.portal.call(server.db.assets.insert_many, [
+        {"asset_id": f"AST-{i:03d}", **ASSET, "sensors": ["S-1", "S-2"], "created_at": server.datetime(2024, 1, 1),
+         "last_inspection": server.datetime(2024, 1, 1), "next_maintenance": server.datetime(2024, 4, 1)}
+        for i in range(count)
+    ])
+
+
+def test_export_streams_csv(api, login, monkeypatch):
+    monkeypatch.setattr(server, "STREAM_CHUNK_DOCS", 2)
+    seed(api, 5)
+
+    response = api.get("/api/assets/export?format=csv", headers=login())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == 'attachment; filename="assets.csv"'
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["asset_id"] for row in rows] == [f"AST-{i:03d}" for i in range(5)]
+    assert rows[0]["sensors"] == "S-1|S-2"
+    assert rows[0]["last_inspection"].startswith("2024-01-01T00:00:00")
+
+
+def test_export_streams_ndjson_and_geojson(api, login, monkeypatch):
+    monkeypatch.setattr(server, "STREAM_CHUNK_DOCS", 2)
+    seed(api, 5)
+    headers = login()
+
+    response = api.get("/api/assets/export", headers=headers)
+    lines = [orjson.loads(line) for line in response.content.splitlines()]
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [line["asset_id"] for line in lines] == [f"AST-{i:03d}" for i in range(5)]
+    assert set(lines[0]) == set(server.EXPORT_FIELDS)
+
+    response = api.get("/api/assets/export?format=geojson", headers=headers)
+    collection = orjson.loads(response.content)
+    assert response.headers["content-type"] == "application/geo+json"
+    assert len(collection["features"]) == 5
+    feature = collection["features"][0]
+    assert feature["id"] == "AST-000" and feature["geometry"]["coordinates"] == [4.6, 52.46]
+    assert "latitude" not in feature["properties"]
+
+
+def test_export_round_trips_through_import(api, login):
+    seed(api, 3)
+    headers = login()
+    exported = api.get("/api/assets/export?format=geojson", headers=headers).content
+
+    response = api.post("/api/assets/import?format=geojson", content=exported, headers=headers)
+
+    assert response.json()["updated"] == 3 and response.json()["failed"] == 0
+
+
+def test_import_drops_every_cached_tile_with_one_generation_bump(api, login, monkeypatch, tmp_path):
+    monkeypatch.setattr(server.tile_cache, "directory", tmp_path)
+    monkeypatch.setattr(server, "tiles_for_asset", lambda asset: pytest.fail("import should not enumerate tiles"))
+    published = []
+    api.portal.call(server.tile_cache.state.subscribe, server.TileCache.CHANNEL, published.append)
+    key = (12, 2106, 1348)
+    generation = api.portal.call(server.tile_cache.generation)
+    api.portal.call(server.tile_cache.put, key, b"tile", generation)
+
+    body = "\n".join([CSV_HEADER, "AST-NEW1,Brug,bridge,Haarlem,52.38,4.64"])
+    assert api.post("/api/assets/import?format=csv", content=body, headers=login()).json()["inserted"] == 1
+
+    assert api.portal.call(server.tile_cache.generation) == generation + 1
+    assert api.portal.call(server.tile_cache.get, key) is None
+    assert published == [{"origin": server.worker_id, "keys": None}]
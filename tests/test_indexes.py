@@ -0,0 +1,73 @@
+import logging
+
+from pymongo.errors import OperationFailure
+
+import server
+
+# conftest swaps this out for a no-op, since mongomock has no $indexStats
+log_index_usage = server.log_index_usage
+
+
+def index_information(api) -> dict:
+    return {c: api.portal.call(server.db[c].index_information) for c in sorted({c for c, _, _ in server.INDEXES})}
+
+
+def test_startup_creates_every_declared_index(api):
+    info = index_information(api)
+
+    for collection, keys, options in server.INDEXES:
+        matches = [index for index in info[collection].values() if index["key"] == keys]
+        assert len(matches) == 1, f"{collection} {keys} missing"
+        index = matches[0]
+        for option, value in options.items():
+            if option == "name":
+                assert index is info[collection][value]
+            else:
+                assert index[option] == value, f"{collection} {keys} {option}"
+
+
+def test_ensure_indexes_is_idempotent(api):
+    before = index_information(api)
+    api.portal.call(server.ensure_indexes)
+    assert index_information(api) == before
+
+
+def test_index_failures_are_logged_not_fatal(api, monkeypatch, caplog):
+    api.portal.call(server.db.drop_collection, "users")
+
+    async def conflict(keys, **options):
+        raise OperationFailure("Index with name: email_1 already exists with different options", 85)
+
+    monkeypatch.setattr(server.db.users, "create_index", conflict)
+    with caplog.at_level(logging.ERROR, logger=server.logger.name):
+        api.portal.call(server.ensure_indexes)
+
+    assert sum("Could not create index" in r.getMessage() and "on users" in r.getMessage() for r in caplog.records) == 2
+    assert "asset_id_1" in api.portal.call(server.db.assets.index_information)
+
+
+def test_index_usage_is_logged_per_collection(api, monkeypatch, caplog):
+    def index_stats(collection, stats):
+        def aggregate(pipeline):
+            assert pipeline == [{"$indexStats": {}}]
+
+            class Cursor:
+                async def to_list(self, length):
+                    if stats is None:
+                        raise OperationFailure("$indexStats is not allowed", 13)
+                    return stats
+            return Cursor()
+        monkeypatch.setattr(server.db[collection], "aggregate", aggregate)
+
+    for collection in {c for c, _, _ in server.INDEXES}:
+        index_stats(collection, [])
+    index_stats("assets", [{"name": "_id_", "accesses": {"ops": 3}}, {"name": "asset_id_1", "accesses": {"ops": 41}}])
+    index_stats("alerts", None)
+
+    with caplog.at_level(logging.INFO, logger=server.logger.name):
+        api.portal.call(log_index_usage)
+
+    messages = [r.getMessage() for r in caplog.records]
+    assert "Index usage assets: _id_=3, asset_id_1=41" in messages
+    assert "Index usage users: none" in messages
+    assert any(m.startswith("Index stats unavailable for alerts") for m in messages)
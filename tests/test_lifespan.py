@@ -0,0 +1,110 @@
+import asyncio
+import inspect
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+import server
+
+STARTUP = [
+    (server, "connect_database"), (server.database_health, "warm_up"), (server, "migrate_session_expiry"),
+    (server, "ensure_sensor_collections"), (server, "backfill_asset_geo"), (server, "ensure_indexes"),
+    (server, "log_index_usage"), (server.sensor_ingest, "start"), (server.sensor_rollups, "start"),
+    (server.sensor_simulator, "start"), (server.oauth_client, "start"), (server.tile_cache, "start"),
+    (server.event_loop_monitor, "start"), (server.loop_block_detector, "start"),
+]
+SHUTDOWN = [
+    (server.event_loop_monitor, "stop"), (server.loop_block_detector, "stop"), (server.sensor_simulator, "stop"),
+    (server.sensor_ingest, "stop"), (server.sensor_rollups, "stop"), (server.password_hasher, "shutdown"),
+    (server.oauth_client, "close"), (server.tile_cache, "stop"), (server.shared_state, "close"),
+    (server, "close_database"),
+]
+
+
+def step_name(owner, name: str) -> str:
+    return name if owner is server else f"{type(owner).__name__}.{name}"
+
+
+@pytest.fixture
+def steps(monkeypatch):
+    """Replace every startup/shutdown step with a recorder of (step, accepting traffic)."""
+    calls = []
+    for owner, name in STARTUP + SHUTDOWN:
+        original = getattr(owner, name)
+        label = step_name(owner, name)
+
+        def record(*args, label=label, **kwargs):
+            calls.append((label, server.database_health.accepting))
+
+        async def record_async(*args, label=label, **kwargs):
+            record(label=label)
+
+        monkeypatch.setattr(owner, name, record_async if inspect.iscoroutinefunction(original) else record)
+    monkeypatch.setattr(server.database_health, "accepting", False)
+    return calls
+
+
+def test_lifespan_runs_startup_then_shutdown_in_order(steps):
+    with TestClient(server.app):
+        assert server.database_health.accepting is True
+        started = list(steps)
+
+    assert started == [(step_name(*step), False) for step in STARTUP]
+    # readiness drops before anything stops, and the database closes last,
+    # after the simulator stopped producing and ingestion flushed its buffer
+    assert steps[len(STARTUP):] == [(step_name(*step), False) for step in SHUTDOWN]
+    assert server.database_health.accepting is False
+
+
+def test_shutdown_runs_when_the_app_fails(steps):
+    with pytest.raises(RuntimeError):
+        with TestClient(server.app):
+            raise RuntimeError("boom")
+    assert [name for name, _ in steps[len(STARTUP):]] == [step_name(*step) for step in SHUTDOWN]
+
+
+class Unreachable:
+    """Stand-in Motor client whose pings never succeed."""
+
+    def __init__(self, hang: bool):
+        async def command(name):
+            if hang:
+                await asyncio.sleep(10)
+            raise ServerSelectionTimeoutError("no servers")
+
+        self.admin = SimpleNamespace(command=command)
+
+    def close(self):
+        pass
+
+
+def test_health_is_ready_once_started(api):
+    response = api.get("/api/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy" and response.json()["database"] == "connected"
+    assert response.headers["cache-control"] == "no-store"
+
+
+@pytest.mark.parametrize("hang", [False, True])
+def test_health_is_503_when_mongo_is_unreachable(api, monkeypatch, hang):
+    monkeypatch.setattr(server, "client", Unreachable(hang))
+    monkeypatch.setattr(server.database_health, "timeout", 0.05)
+    failures = server.database_health.failures
+
+    response = api.get("/api/health")
+
+    assert response.status_code == 503
+    assert response.json()["database"] == "unreachable" and response.json()["database_rtt_ms"] is None
+    assert server.database_health.failures == failures + 1
+    # liveness never touches Mongo
+    assert api.get("/api/health/live").status_code == 200
+
+
+def test_health_is_503_while_draining(api, monkeypatch):
+    monkeypatch.setattr(server.database_health, "accepting", False)
+    response = api.get("/api/health")
+    assert response.status_code == 503
+    body = response.json()
+    assert body["status"] == "unavailable" and body["database"] == "connected"
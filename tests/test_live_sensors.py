@@ -0,0 +1,145 @@
+import asyncio
+import json
+
+import server
+
+
+def hub(**options) -> server.LiveSensorHub:
+    return server.LiveSensorHub(server.MemoryState(), **{"interval": 60, **options})
+
+
+def test_subscribers_receive_published_snapshots():
+    async def scenario():
+        live = hub()
+        for asset_id in ("AST-1", "AST-2", "AST-3"):
+            await live.state.set(f"live-lease:{asset_id}", "another-worker", 60)
+        both = await live.subscribe(["AST-1", "AST-2"])
+        one = await live.subscribe(["AST-2"])
+        for asset_id in ("AST-1", "AST-2", "AST-3"):
+            await live.state.publish(f"live:{asset_id}", {"asset_id": asset_id})
+        received = [[q.get_nowait()["asset_id"] for _ in range(q.qsize())] for q in (both, one)]
+        stats = live.stats()
+        await live.unsubscribe(both, ["AST-1", "AST-2"])
+        await live.unsubscribe(one, ["AST-2"])
+        return received, stats
+
+    received, stats = asyncio.run(scenario())
+    assert received == [["AST-1", "AST-2"], ["AST-2"]]
+    assert stats == {"assets": 2, "producing": 0, "subscriptions": 3, "interval_seconds": 60}
+
+
+def test_the_lease_holder_produces_snapshots():
+    async def scenario():
+        live = hub()
+        queue = await live.subscribe(["AST-1"])
+        snapshot = await asyncio.wait_for(queue.get(), 1)
+        stats = live.stats()
+        await live.unsubscribe(queue, ["AST-1"])
+        return snapshot, stats, await live.latest("AST-1")
+
+    snapshot, stats, latest = asyncio.run(scenario())
+    assert snapshot["asset_id"] == "AST-1" and latest == snapshot
+    assert stats["producing"] == 1
+
+
+def test_late_subscribers_get_the_latest_snapshot_without_producing():
+    async def scenario():
+        live = hub()
+        await live.state.set("live:AST-1", {"asset_id": "AST-1", "value": 7})
+        await live.state.set("live-lease:AST-1", "another-worker", 60)
+        queue = await live.subscribe(["AST-1"])
+        await asyncio.sleep(0.01)
+        snapshots = [queue.get_nowait() for _ in range(queue.qsize())]
+        stats = live.stats()
+        await live.unsubscribe(queue, ["AST-1"])
+        return snapshots, stats, await live.state.get("live-lease:AST-1")
+
+    snapshots, stats, lease = asyncio.run(scenario())
+    assert snapshots == [{"asset_id": "AST-1", "value": 7}]
+    assert stats["producing"] == 0
+    # another worker's lease is left alone on unsubscribe
+    assert lease == "another-worker"
+
+
+def test_slow_subscribers_keep_only_the_newest_snapshots():
+    async def scenario():
+        live = hub(queue_size=3)
+        await live.state.set("live-lease:AST-1", "another-worker", 60)
+        queue = await live.subscribe(["AST-1"])
+        for value in range(10):
+            await live.state.publish("live:AST-1", {"value": value})
+        values = [queue.get_nowait()["value"] for _ in range(queue.qsize())]
+        await live.unsubscribe(queue, ["AST-1"])
+        return values
+
+    assert asyncio.run(scenario()) == [7, 8, 9]
+
+
+def test_last_unsubscribe_stops_the_producer_and_releases_the_lease():
+    async def scenario():
+        live = hub()
+        first = await live.subscribe(["AST-1"])
+        second = await live.subscribe(["AST-1"])
+        await asyncio.wait_for(first.get(), 1)
+        producer = live._producers["AST-1"]
+        await live.unsubscribe(first, ["AST-1"])
+        still_running = not producer.done()
+        await live.unsubscribe(second, ["AST-1"])
+        await asyncio.sleep(0)
+        return (still_running, producer.cancelled(), live.stats(),
+                await live.state.get("live-lease:AST-1"), live.state._channels.get("live:AST-1"))
+
+    still_running, cancelled, stats, lease, channel = asyncio.run(scenario())
+    assert still_running and cancelled
+    assert stats == {"assets": 0, "producing": 0, "subscriptions": 0, "interval_seconds": 60}
+    assert lease is None and not channel
+
+
+def stream(api, headers: dict, query: str) -> tuple:
+    """Drive the SSE endpoint until the first reading, then disconnect; returns (status, body, hub stats)."""
+    async def run():
+        sent, reading = [], asyncio.Event()
+        requests = iter([{"type": "http.request", "body": b"", "more_body": False}])
+
+        async def receive():
+            message = next(requests, None)
+            if message is not None:
+                return message
+            await reading.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if b"event: reading" in message.get("body", b""):
+                reading.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/api/sensors/stream", "raw_path": b"/api/sensors/stream",
+            "query_string": query.encode(), "root_path": "", "server": ("test", 80), "client": ("test", 1),
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        }
+        await asyncio.wait_for(server.app(scope, receive, send), 5)
+        await asyncio.sleep(0)
+        return sent[0]["status"], b"".join(m.get("body", b"") for m in sent[1:]), server.live_sensor_hub.stats()
+
+    return api.portal.call(run)
+
+
+def test_stream_sends_readings_and_cleans_up_on_disconnect(api, login):
+    status, body, stats = stream(api, login(), "asset_ids=AST-1,AST-1")
+
+    assert status == 200
+    events = body.decode().split("\n\n")
+    assert events[0] == "retry: 3000"
+    event, data = events[1].split("\n")
+    assert event == "event: reading"
+    assert json.loads(data.removeprefix("data: "))["asset_id"] == "AST-1"
+    assert stats["subscriptions"] == 0 and stats["assets"] == 0
+
+
+def test_stream_requires_auth_and_asset_ids(api, login):
+    assert api.get("/api/sensors/stream?asset_ids=AST-1").status_code == 401
+    assert api.get("/api/sensors/stream?asset_ids=,", headers=login()).status_code == 400
+    too_many = ",".join(f"AST-{i}" for i in range(server.SENSOR_STREAM_MAX_ASSETS + 1))
+    assert api.get(f"/api/sensors/stream?asset_ids={too_many}", headers=login()).status_code == 400
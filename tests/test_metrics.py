@@ -0,0 +1,132 @@
+import re
+
+import pytest
+
+import server
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"(?:,|$)')
+SUFFIXES = {"histogram": ("_bucket", "_sum", "_count"), "counter": ("",), "gauge": ("",)}
+
+
+def parse(text: str) -> dict:
+    """Parse Prometheus text exposition into ``{family: {"type", "samples": [(name, labels, value)]}}``.
+
+    Strict enough to fail on anything a scraper would reject: samples
+    without a TYPE, malformed labels or values, and unterminated output.
+    """
+    assert text.endswith("\n")
+    families, current = {}, None
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            continue
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert name not in families, f"duplicate family {name}"
+            current = families[name] = {"type": kind, "samples": []}
+            continue
+        match = SAMPLE.match(line)
+        assert match, f"bad sample line {line!r}"
+        name, labels, value = match.groups()
+        assert current is not None and any(
+            name == family + suffix for family in families if families[family] is current
+            for suffix in SUFFIXES[current["type"]]
+        ), f"{name} outside its family"
+        parsed = {}
+        if labels:
+            assert LABEL.sub("", labels) == "", f"bad labels {labels!r}"
+            parsed = dict(LABEL.findall(labels))
+        current["samples"].append((name, parsed, float(value)))
+    return families
+
+
+def samples(families: dict, name: str, **labels) -> dict:
+    """Values of ``name`` samples matching ``labels``, keyed by sample name (``le`` for buckets)."""
+    found = {}
+    for sample, sample_labels, value in families[name]["samples"]:
+        if all(sample_labels.get(k) == v for k, v in labels.items()):
+            found[sample_labels.get("le", sample)] = value
+    return found
+
+
+def scrape(api) -> dict:
+    response = api.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    return parse(response.text)
+
+
+def test_exposition_parses_and_histograms_are_cumulative(api, login):
+    api.get("/api/assets", headers=login())
+    families = scrape(api)
+
+    assert families["http_requests_total"]["type"] == "counter"
+    assert families["http_request_duration_seconds"]["type"] == "histogram"
+    for name, family in families.items():
+        if family["type"] != "histogram":
+            continue
+        for labels in {tuple(sorted((k, v) for k, v in l.items() if k != "le")) for _, l, _ in family["samples"]}:
+            values = samples(families, name, **dict(labels))
+            buckets = [v for k, v in values.items() if not k.startswith(name)]
+            assert buckets == sorted(buckets), f"{name} buckets are not cumulative"
+            assert values["+Inf"] == values[f"{name}_count"]
+
+
+def test_requests_are_counted_by_route_template(api, login):
+    headers = login()
+    route = {"method": "GET", "route": "/api/assets/{asset_id}"}
+
+    def counts(families):
+        requests = samples(families, "http_requests_total", status="404", **route)
+        latency = samples(families, "http_request_duration_seconds", **route)
+        return requests.get("http_requests_total", 0), latency.get("+Inf", 0)
+
+    before = counts(scrape(api))
+    api.get("/api/assets/AST-1", headers=headers)
+    api.get("/api/assets/AST-2", headers=headers)
+    families = scrape(api)
+
+    assert counts(families) == (before[0] + 2, before[1] + 2)
+    assert not any("AST-1" in labels.get("route", "") for _, labels, _ in families["http_requests_total"]["samples"])
+
+
+def test_mongo_operations_are_timed(api, login):
+    def count(families, operation):
+        found = samples(families, "mongodb_operation_duration_seconds", collection="assets", operation=operation)
+        return found.get("mongodb_operation_duration_seconds_count", 0)
+
+    headers = login()
+    before = scrape(api)
+    api.get("/api/assets/AST-1", headers=headers)
+    api.get("/api/assets", params={"limit": 5}, headers=headers)
+    after = scrape(api)
+
+    assert count(after, "find_one") == count(before, "find_one") + 1
+    assert count(after, "find") == count(before, "find") + 1
+
+
+def test_failed_mongo_calls_are_counted(api, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise RuntimeError("down")
+
+    monkeypatch.setattr(server.db.assets._collection, "count_documents", fail)
+    with pytest.raises(RuntimeError):
+        api.portal.call(server.db.assets.count_documents, {})
+    errors = samples(scrape(api), "mongodb_operation_errors_total", collection="assets", operation="count_documents")
+    assert errors["mongodb_operation_errors_total"] >= 1
+
+
+def test_api_responses_carry_server_timing_phases(api, login):
+    response = api.get("/api/assets", headers=login())
+
+    phases = dict(re.fullmatch(r"(\w+);dur=([\d.]+)", part.strip()).groups()
+                  for part in response.headers["server-timing"].split(","))
+    assert list(phases) == ["auth", "db", "serialize", "total"]
+    assert float(phases["total"]) >= float(phases["auth"]) + float(phases["db"])
+    assert float(phases["auth"]) > 0 and float(phases["db"]) > 0
+
+
+def test_metrics_token_is_enforced(api, monkeypatch):
+    monkeypatch.setattr(server, "METRICS_TOKEN", "s3cret")
+    assert api.get("/metrics").status_code == 401
+    assert api.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
@@ -0,0 +1,100 @@
+import asyncio
+
+import httpx
+
+import server
+
+URL = "https://auth.example.nl/session-data"
+SESSION = {"id": "u1", "email": "a@example.nl", "name": "A", "session_token": "tok"}
+
+
+def client_with(handler, retries: int = 2, cache_ttl: float = 30.0):
+    calls = []
+
+    async def record(request: httpx.Request) -> httpx.Response:
+        calls.append(request.headers["X-Session-ID"])
+        return await handler(request, len(calls))
+
+    oauth = server.OAuthSessionClient(URL, retries=retries, cache_ttl=cache_ttl)
+    oauth.start(transport=httpx.MockTransport(record))
+    return oauth, calls
+
+
+def test_double_submit_reaches_the_provider_once():
+    async def handler(request, n):
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=SESSION)
+
+    async def scenario():
+        oauth, calls = client_with(handler)
+        first, second = await asyncio.gather(oauth.fetch("sid"), oauth.fetch("sid"))
+        await oauth.close()
+        return first, second, calls
+
+    first, second, calls = asyncio.run(scenario())
+    assert first == second == SESSION
+    assert calls == ["sid"]
+
+
+def test_gateway_errors_are_retried():
+    async def handler(request, n):
+        return httpx.Response({1: 502, 2: 503}.get(n, 200), json=SESSION)
+
+    async def scenario():
+        oauth, calls = client_with(handler, retries=2)
+        data = await oauth.fetch("sid")
+        await oauth.close()
+        return data, calls
+
+    data, calls = asyncio.run(scenario())
+    assert data == SESSION
+    assert len(calls) == 3
+
+
+def test_retries_give_up_after_the_limit():
+    async def handler(request, n):
+        return httpx.Response(504)
+
+    async def scenario():
+        oauth, calls = client_with(handler, retries=1)
+        data = await oauth.fetch("sid")
+        await oauth.close()
+        return data, calls
+
+    data, calls = asyncio.run(scenario())
+    assert data is None
+    assert len(calls) == 2
+
+
+def test_non_200_returns_none_without_retry_or_caching():
+    async def handler(request, n):
+        return httpx.Response(401)
+
+    async def scenario():
+        oauth, calls = client_with(handler)
+        results = [await oauth.fetch("sid"), await oauth.fetch("sid")]
+        await oauth.close()
+        return results, calls
+
+    results, calls = asyncio.run(scenario())
+    assert results == [None, None]
+    assert calls == ["sid", "sid"]
+
+
+def test_results_are_cached_until_they_expire():
+    async def handler(request, n):
+        return httpx.Response(200, json={**SESSION, "call": n})
+
+    async def scenario():
+        oauth, calls = client_with(handler, cache_ttl=0.05)
+        first = await oauth.fetch("sid")
+        cached = await oauth.fetch("sid")
+        await asyncio.sleep(0.1)
+        refreshed = await oauth.fetch("sid")
+        await oauth.close()
+        return first, cached, refreshed, calls
+
+    first, cached, refreshed, calls = asyncio.run(scenario())
+    assert first["call"] == cached["call"] == 1
+    assert refreshed["call"] == 2
+    assert len(calls) == 2
@@ -0,0 +1,34 @@
+import asyncio
+
+import server
+
+
+def test_counters_settle_after_concurrent_and_cancelled_jobs():
+    async def scenario():
+        hasher = server.PasswordHasher(rounds=4, workers=2)
+        hashes = await asyncio.gather(*(hasher.hash("secret1") for _ in range(100)))
+        assert all(await asyncio.gather(*(hasher.verify("secret1", h) for h in hashes[:20])))
+
+        queued = [asyncio.ensure_future(hasher.verify("secret1", hashes[0])) for _ in range(40)]
+        await asyncio.sleep(0)
+        for task in queued[5:]:
+            task.cancel()
+        await asyncio.gather(*queued, return_exceptions=True)
+        await asyncio.sleep(0.2)
+        hasher.shutdown()
+        return hasher.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["queue_depth"] == 0
+    assert stats["running"] == 0
+    assert 125 <= stats["completed"] <= 160
+
+
+def test_hasher_restarts_after_shutdown():
+    hasher = server.PasswordHasher(rounds=4, workers=1)
+    hashed = asyncio.run(hasher.hash("secret1"))
+    hasher.shutdown()
+    assert asyncio.run(hasher.verify("secret1", hashed))
+    assert not asyncio.run(hasher.verify("wrong", hashed))
+    assert hasher.needs_rehash(hashed) is False
+    assert server.PasswordHasher(rounds=12).needs_rehash(hashed)
@@ -0,0 +1,52 @@
+import asyncio
+import ipaddress
+from typing import Optional
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import server
+
+
+def request(peer: str, forwarded: Optional[str] = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "client": (peer, 1234), "headers": headers})
+
+
+def test_forwarded_header_is_ignored_from_untrusted_peers(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXIES", [])
+    assert server.client_ip(request("203.0.113.7", "198.51.100.1")) == "203.0.113.7"
+
+
+def test_forwarded_header_is_walked_past_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXIES", [ipaddress.ip_network("10.0.0.0/8")])
+    # The client can prepend anything; only the hop the trusted proxy appended counts
+    assert server.client_ip(request("10.0.0.2", "1.1.1.1, 198.51.100.1, 10.0.0.9")) == "198.51.100.1"
+    assert server.client_ip(request("10.0.0.2")) == "10.0.0.2"
+
+
+def test_zero_limit_disables_the_check():
+    limiter = server.RateLimiter(server.MemoryState(), "test", "0/60")
+
+    async def scenario():
+        for _ in range(100):
+            await limiter.check("k")
+
+    asyncio.run(scenario())
+    assert limiter.rejected == 0
+
+
+def test_rate_limiter_rejects_past_the_limit():
+    limiter = server.RateLimiter(server.MemoryState(), "test", "2/60")
+
+    async def scenario():
+        await limiter.check("k")
+        await limiter.check("k")
+        with pytest.raises(HTTPException) as error:
+            await limiter.check("k")
+        return error.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 429 and int(error.headers["Retry-After"]) >= 1
+    assert limiter.rejected == 1
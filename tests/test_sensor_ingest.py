@@ -0,0 +1,63 @@
+import orjson
+
+import server
+
+
+def reading(i: int) -> dict:
+    return {"sensor_id": "S-1", "asset_id": "AST-1", "type": "pressure", "value": 1000.0 + i, "unit": "hPa"}
+
+
+def ndjson(*rows) -> bytes:
+    return b"\n".join(row if isinstance(row, bytes) else orjson.dumps(row) for row in rows) + b"\n"
+
+
+def test_ndjson_reports_bad_lines_by_number(api, login):
+    body = ndjson(reading(0), b"", b"{not json", {"sensor_id": "S-2"}, reading(1))
+    response = api.post("/api/sensors/ingest", content=body,
+                        headers={**login(), "Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["accepted"] == 2 and result["rejected"] == 2
+    assert [error["line"] for error in result["errors"]] == [3, 4]
+    assert result["errors"][0]["error"].startswith("Invalid JSON")
+
+
+def test_json_array_reports_bad_items_by_index(api, login):
+    body = orjson.dumps([reading(0), {"value": "high"}])
+    response = api.post("/api/sensors/ingest", content=body,
+                        headers={**login(), "Content-Type": "application/json"})
+
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 1
+    assert response.json()["errors"][0]["index"] == 1
+
+
+def test_streamed_body_over_the_byte_limit_is_413(api, login, monkeypatch):
+    monkeypatch.setattr(server, "SENSOR_INGEST_MAX_BYTES", 1024)
+    headers = {**login(), "Content-Type": "application/x-ndjson"}
+
+    def chunks():
+        for i in range(100):
+            yield ndjson(reading(i))
+
+    response = api.post("/api/sensors/ingest", content=chunks(), headers=headers)
+
+    assert response.status_code == 413
+    assert server.sensor_ingest.stats()["buffered"] == 0
+
+
+def test_declared_length_over_the_limit_is_413(api, login, monkeypatch):
+    monkeypatch.setattr(server, "SENSOR_INGEST_MAX_BYTES", 1024)
+    body = orjson.dumps([reading(i) for i in range(100)])
+    response = api.post("/api/sensors/ingest", content=body,
+                        headers={**login(), "Content-Type": "application/json"})
+    assert response.status_code == 413
+
+
+def test_batch_over_the_reading_limit_is_413(api, login, monkeypatch):
+    monkeypatch.setattr(server, "SENSOR_INGEST_MAX_READINGS", 3)
+    body = ndjson(*(reading(i) for i in range(4)))
+    response = api.post("/api/sensors/ingest", content=body,
+                        headers={**login(), "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 413
@@ -0,0 +1,27 @@
+import server
+
+T = 1_700_000_000.0
+
+
+def values(simulator) -> dict:
+    return {doc["meta"]["sensor_id"]: doc["value"] for doc in simulator.readings(T)}
+
+
+def test_tracking_twice_keeps_one_sensor():
+    simulator = server.SensorSimulator()
+    simulator.track("AST-1", ["water_level"])
+    simulator.track("AST-1", ["water_level", "pressure"])
+    assert sorted(values(simulator)) == ["AST-1-pressure", "AST-1-water_level"]
+
+
+def test_values_do_not_depend_on_what_else_is_tracked():
+    crowded = server.SensorSimulator()
+    for i in range(200):
+        crowded.track(f"AST-{i}")
+    values(crowded)
+    crowded.track("AST-late")
+    together = values(crowded)
+    for asset_id in ("AST-0", "AST-137", "AST-late"):
+        alone = server.SensorSimulator()
+        alone.track(asset_id)
+        assert all(together[sensor_id] == value for sensor_id, value in values(alone).items())
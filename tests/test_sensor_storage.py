@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+
+import server
+
+NOW = datetime(2025, 1, 1, 12, 30, tzinfo=timezone.utc)
+TIERS = {tier["name"]: tier for tier in server.SENSOR_TIERS}
+
+
+def spans(api, tier, start, end):
+    return [(source["name"], lo, hi) for source, lo, hi in api.portal.call(server.sensor_tier_spans, tier, start, end)]
+
+
+def test_hour_tier_falls_back_to_finer_tiers_past_its_watermark(api):
+    api.portal.call(server.db.sensor_rollup_state.insert_many, [
+        {"_id": "1h", "watermark": NOW.replace(minute=0)},
+        {"_id": "1m", "watermark": NOW},
+    ])
+    start, end = NOW - timedelta(days=1), NOW + timedelta(minutes=5)
+
+    assert spans(api, TIERS["1h"], start, end) == [
+        ("1h", start, NOW.replace(minute=0)),
+        ("1m", NOW.replace(minute=0), NOW),
+        ("raw", NOW, end),
+    ]
+
+
+def test_tier_without_watermark_reads_raw(api):
+    start, end = NOW - timedelta(hours=2), NOW
+    assert spans(api, TIERS["1h"], start, end) == [("raw", start, end)]
+
+
+def test_range_before_watermark_stays_on_the_tier(api):
+    api.portal.call(server.db.sensor_rollup_state.insert_one, {"_id": "1h", "watermark": NOW})
+    start, end = NOW - timedelta(days=2), NOW - timedelta(days=1)
+    assert spans(api, TIERS["1h"], start, end) == [("1h", start, end)]
+
+
+def test_buckets_straddling_the_watermark_are_merged(api):
+    meta = {"asset_id": "AST-1", "sensor_id": "S-1", "type": "pressure", "unit": "hPa"}
+    api.portal.call(server.db.sensor_rollup_state.insert_one, {"_id": "1h", "watermark": NOW.replace(minute=0)})
+    api.portal.call(server.db.sensor_readings_1h.insert_one, {
+        "timestamp": NOW.replace(hour=11, minute=0), "meta": meta, "min": 990.0, "max": 1010.0, "sum": 6000.0, "count": 6
+    })
+    api.portal.call(server.db.sensor_readings.insert_many, [
+        {"timestamp": NOW + timedelta(minutes=i), "meta": meta, "value": value} for i, value in enumerate([980.0, 1020.0])
+    ])
+
+    buckets = api.portal.call(
+        server.rollup_sensor_buckets, {"meta.asset_id": "AST-1"}, TIERS["1h"], NOW - timedelta(hours=2), NOW + timedelta(hours=1),
+        "$meta.type"
+    )
+
+    assert buckets == [{"_id": "pressure", "min": 980.0, "max": 1020.0, "sum": 8000.0, "count": 8}]
+
+
+def test_migrate_sensor_readings_moves_legacy_documents(api, monkeypatch):
+    raw = server.db.sensor_readings
+    legacy = {"sensor_id": "S-1", "asset_id": "AST-1", "type": "pressure", "unit": "hPa"}
+    api.portal.call(raw.insert_many, [{**legacy, "value": float(i), "timestamp": NOW + timedelta(seconds=i)} for i in range(5)])
+    api.portal.call(server.db.sensor_rollup_state.insert_one, {"_id": "1m", "watermark": NOW})
+
+    converted = set()
+
+    async def is_timeseries(name):
+        return name in converted
+
+    async def ensure_collections():
+        converted.add("sensor_readings")
+
+    monkeypatch.setattr(server, "sensor_collection_is_timeseries", is_timeseries)
+    monkeypatch.setattr(server, "ensure_sensor_collections", ensure_collections)
+
+    assert api.portal.call(server.migrate_sensor_readings, 2) == 5
+
+    docs = api.portal.call(lambda: raw.find({}, {"_id": 0}).sort("timestamp", 1).to_list(None))
+    assert [d["value"] for d in docs] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert all(d["meta"] == legacy and set(d) == {"timestamp", "value", "meta"} for d in docs)
+    assert "sensor_readings_legacy" not in api.portal.call(server.db.list_collection_names)
+    assert api.portal.call(server.db.sensor_rollup_state.count_documents, {}) == 0
+    assert api.portal.call(server.migrate_sensor_readings) == 0
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+import server
+
+HOUR = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+META = {"asset_id": "AST-1", "sensor_id": "S-1", "type": "pressure", "unit": "hPa"}
+
+
+def test_lttb_keeps_short_series_whole():
+    x = np.arange(10, dtype=float)
+    assert list(server.lttb(x, x, 10)) == list(range(10))
+    assert list(server.lttb(x, x, 2)) == list(range(10))
+
+
+def test_lttb_keeps_ends_and_peaks():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[123], y[777] = 50.0, -50.0
+    indices = server.lttb(x, y, 50)
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 999
+    assert 123 in indices and 777 in indices
+    assert np.all(np.diff(indices) > 0)
+
+
+@pytest.fixture
+def aggregations(api, monkeypatch):
+    """Record the series pipelines per collection and answer them with canned buckets.
+
+    mongomock has no $dateTrunc, so the grouping itself is not run here.
+    """
+    calls, canned = [], {}
+    for tier in server.SENSOR_TIERS:
+        name = tier["collection"]
+
+        def aggregate(pipeline, name=name):
+            calls.append((name, pipeline[0]["$match"]["timestamp"]))
+
+            async def results():
+                for bucket in canned.get(name, []):
+                    yield dict(bucket)
+            return results()
+
+        monkeypatch.setattr(server.db[name], "aggregate", aggregate)
+    return calls, canned
+
+
+def series(api, headers, **params):
+    return api.get("/api/sensors/AST-1/series", params={"type": "pressure", **params}, headers=headers)
+
+
+@pytest.mark.parametrize("bucket, tier", [("30s", "raw"), ("90s", "raw"), ("1m", "1m"), ("15m", "1m"), ("1h", "1h"), ("1d", "1h")])
+def test_bucket_selects_the_coarsest_dividing_tier(api, login, aggregations, bucket, tier):
+    response = series(api, login(), bucket=bucket, **{"from": (HOUR - timedelta(days=2)).isoformat()})
+    assert response.status_code == 200
+    assert response.json()["tier"] == tier
+
+
+def test_hour_buckets_fill_the_current_hour_from_finer_tiers(api, login, aggregations):
+    calls, canned = aggregations
+    minute_mark = HOUR + timedelta(minutes=1)
+    api.portal.call(server.db.sensor_rollup_state.insert_many, [
+        {"_id": "1h", "watermark": HOUR}, {"_id": "1m", "watermark": minute_mark},
+    ])
+    canned["sensor_readings_1h"] = [{"_id": HOUR - timedelta(hours=1), "min": 990.0, "max": 1010.0, "sum": 60000.0, "count": 60}]
+    canned["sensor_readings_1m"] = [{"_id": HOUR, "min": 995.0, "max": 1000.0, "sum": 1995.0, "count": 2}]
+    canned["sensor_readings"] = [{"_id": HOUR, "min": 1001.0, "max": 1020.0, "sum": 2021.0, "count": 2}]
+    start, end = HOUR - timedelta(hours=6), HOUR + timedelta(minutes=30)
+
+    response = series(api, login(), bucket="1h", **{"from": start.isoformat(), "to": end.isoformat()})
+
+    assert response.status_code == 200
+    assert calls == [
+        ("sensor_readings_1h", {"$gte": start, "$lt": HOUR}),
+        ("sensor_readings_1m", {"$gte": HOUR, "$lt": minute_mark}),
+        ("sensor_readings", {"$gte": minute_mark, "$lt": end}),
+    ]
+    points = response.json()["points"]
+    assert [p["count"] for p in points] == [60, 4]
+    assert points[1] == {"timestamp": HOUR.isoformat(), "min": 995.0, "max": 1020.0, "avg": 1004.0, "count": 4}
+
+
+def test_too_many_buckets_is_400(api, login, aggregations):
+    response = series(api, login(), bucket="1m", **{"from": (HOUR - timedelta(days=30)).isoformat(), "to": HOUR.isoformat()})
+    assert response.status_code == 400
+    assert "buckets" in response.json()["detail"]
+    assert aggregations[0] == []
+
+
+@pytest.mark.parametrize("params", [
+    {"bucket": "5x"},
+    {"bucket": "0m"},
+    {"from": HOUR.isoformat(), "to": (HOUR - timedelta(hours=1)).isoformat()},
+])
+def test_invalid_ranges_and_buckets_are_400(api, login, aggregations, params):
+    assert series(api, login(), **params).status_code == 400
+
+
+def test_lttb_mode_downsamples_raw_readings(api, login):
+    start = HOUR - timedelta(hours=2)
+    docs = [{"timestamp": start + timedelta(seconds=5 * i), "value": float(i % 50), "meta": META} for i in range(1000)]
+    api.portal.call(server.db.sensor_readings.insert_many, docs)
+
+    response = series(api, login(), mode="lttb", points=50, **{"from": start.isoformat(), "to": HOUR.isoformat()})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["raw_points"] == 1000 and len(body["points"]) == 50
+    assert body["points"][0]["timestamp"] == start.isoformat()
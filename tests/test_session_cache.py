@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+
+USER = server.UserResponse(user_id="user_1", email="a@example.nl", name="A", role="admin",
+                           created_at=datetime(2025, 1, 1, tzinfo=timezone.utc))
+
+
+def token(headers: dict) -> str:
+    return headers["Authorization"].split()[1]
+
+
+def cached(api, session_token: str):
+    return api.portal.call(server.session_cache.state.get, f"session:{session_token}")
+
+
+def test_ttl_is_capped_at_session_expiry():
+    async def scenario():
+        cache = server.SessionCache(server.MemoryState(), ttl=60)
+        await cache.put("tok", USER, datetime.now(timezone.utc) + timedelta(seconds=0.05))
+        first = await cache.get("tok")
+        await asyncio.sleep(0.1)
+        return first, await cache.get("tok")
+
+    first, later = asyncio.run(scenario())
+    assert first == USER
+    assert later is None
+
+
+def test_expired_session_is_not_cached():
+    async def scenario():
+        cache = server.SessionCache(server.MemoryState(), ttl=60)
+        await cache.put("tok", USER, datetime.now(timezone.utc) - timedelta(seconds=1))
+        return await cache.get("tok")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_hit_and_miss_counters():
+    async def scenario():
+        cache = server.SessionCache(server.MemoryState(), ttl=60)
+        await cache.get("tok")
+        await cache.put("tok", USER, datetime.now(timezone.utc) + timedelta(days=1))
+        await cache.get("tok")
+        await cache.get("tok")
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (2, 1, 0.6667)
+
+
+def test_logout_drops_the_cached_session(api, login):
+    headers = login()
+    assert api.get("/api/auth/me", headers=headers).status_code == 200
+    assert cached(api, token(headers)) is not None
+
+    api.post("/api/auth/logout", headers=headers)
+
+    assert cached(api, token(headers)) is None
+    assert api.get("/api/auth/me", headers=headers).status_code == 401
+
+
+def test_role_change_is_visible_on_the_next_request(api, login):
+    admin = login()
+    worker = login("veld@example.nl", "veldwerker")
+    me = api.get("/api/auth/me", headers=worker).json()
+    assert me["role"] == "veldwerker"
+
+    response = api.put(f"/api/users/{me['user_id']}/role", params={"role": "manager"}, headers=admin)
+
+    assert response.status_code == 200
+    assert api.get("/api/auth/me", headers=worker).json()["role"] == "manager"
+
+
+def test_role_change_of_unknown_user_is_404_and_touches_nothing(api, login, monkeypatch):
+    admin = login()
+    api.get("/api/auth/me", headers=admin)
+    etag = api.get("/api/users", headers=admin).headers["etag"]
+    invalidated = []
+    monkeypatch.setattr(server.session_cache, "invalidate_user", lambda user_id: invalidated.append(user_id))
+
+    response = api.put("/api/users/user_missing/role", params={"role": "manager"}, headers=admin)
+
+    assert response.status_code == 404
+    assert invalidated == []
+    assert cached(api, token(admin)) is not None
+    assert api.get("/api/users", headers={**admin, "If-None-Match": etag}).status_code == 304
+
+
+def test_oauth_login_drops_the_users_cached_sessions(api, login, monkeypatch):
+    headers = login("oauth@example.nl", "veldwerker")
+    assert api.get("/api/auth/me", headers=headers).status_code == 200
+
+    async def fetch(session_id):
+        return {"email": "oauth@example.nl", "name": "OAuth", "session_token": "fresh-token"}
+
+    monkeypatch.setattr(server.oauth_client, "fetch", fetch)
+    response = api.post("/api/auth/session", json={"session_id": "sid"})
+
+    assert response.status_code == 200
+    assert cached(api, token(headers)) is None
+    assert api.get("/api/auth/me", headers=headers).status_code == 401
+    assert api.get("/api/auth/me", headers={"Authorization": "Bearer fresh-token"}).json()["name"] == "OAuth"
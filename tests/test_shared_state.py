@@ -0,0 +1,126 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+
+def memory_states():
+    state = server.MemoryState()
+    return state, state
+
+
+def redis_states():
+    fakeredis = pytest.importorskip("fakeredis")
+    shared = fakeredis.FakeServer()
+    return (server.RedisState(fakeredis.FakeAsyncRedis(server=shared)),
+            server.RedisState(fakeredis.FakeAsyncRedis(server=shared)))
+
+
+@pytest.fixture(params=["memory", "redis"])
+def make_states(request):
+    """Two handles on one backend, standing in for two workers."""
+    return memory_states if request.param == "memory" else redis_states
+
+
+async def close(*states):
+    for state in {id(s): s for s in states}.values():
+        await state.close()
+
+
+async def eventually(predicate, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+def test_get_set_and_delete(make_states):
+    async def scenario():
+        a, b = make_states()
+        assert await a.get("k") is None
+        assert await a.set("k", {"n": 1}) is True
+        assert await b.get("k") == {"n": 1}
+        assert await b.mget(["k", "missing"]) == [{"n": 1}, None]
+        assert await b.set("k", {"n": 2}, only_if_absent=True) is False
+        await b.delete("k")
+        assert await a.get("k") is None
+        await close(a, b)
+    asyncio.run(scenario())
+
+
+def test_set_with_ttl_expires(make_states):
+    async def scenario():
+        a, b = make_states()
+        await a.set("k", "v", ttl=0.05)
+        assert await b.get("k") == "v"
+        await asyncio.sleep(0.1)
+        assert await b.get("k") is None
+        await close(a, b)
+    asyncio.run(scenario())
+
+
+def test_incr_counts_across_handles(make_states):
+    async def scenario():
+        a, b = make_states()
+        assert await a.incr("c", ttl=60) == 1
+        assert await b.incr("c", ttl=60) == 2
+        assert await a.incr("c") == 3
+        await close(a, b)
+    asyncio.run(scenario())
+
+
+def test_sadd_and_smembers(make_states):
+    async def scenario():
+        a, b = make_states()
+        await a.sadd("s", "x", ttl=60)
+        await b.sadd("s", "y", ttl=60)
+        assert await a.smembers("s") == {"x", "y"}
+        assert await a.smembers("missing") == set()
+        await close(a, b)
+    asyncio.run(scenario())
+
+
+def test_publish_reaches_subscribers_until_unsubscribed(make_states):
+    async def scenario():
+        a, b = make_states()
+        received = []
+        await b.subscribe("chan", received.append)
+        await a.publish("chan", {"n": 1})
+        await eventually(lambda: received == [{"n": 1}])
+        await b.unsubscribe("chan", received.append)
+        await a.publish("chan", {"n": 2})
+        await asyncio.sleep(0.1)
+        assert received == [{"n": 1}]
+        await close(a, b)
+    asyncio.run(scenario())
+
+
+def test_session_cache_invalidation_reaches_other_workers(make_states):
+    async def scenario():
+        a, b = make_states()
+        worker_a, worker_b = server.SessionCache(a, ttl=60), server.SessionCache(b, ttl=60)
+        user = server.UserResponse(user_id="user_1", email="a@example.nl", name="A", role="admin",
+                                   created_at=datetime.now(timezone.utc))
+        expires_at = datetime.now(timezone.utc) + timedelta(days=1)
+        await worker_a.put("token-1", user, expires_at)
+        await worker_a.put("token-2", user, expires_at)
+        assert (await worker_b.get("token-1")).user_id == "user_1"
+
+        await worker_b.invalidate("token-1")
+        assert await worker_a.get("token-1") is None
+        assert await worker_a.get("token-2") is not None
+
+        await worker_b.invalidate_user("user_1")
+        assert await worker_a.get("token-2") is None
+        await close(a, b)
+    asyncio.run(scenario())
+
+
+def test_create_shared_state_picks_backend():
+    assert isinstance(server.create_shared_state("memory://"), server.MemoryState)
+    pytest.importorskip("fakeredis")
+    state = server.create_shared_state("fakeredis://")
+    assert isinstance(state, server.RedisState)
+    asyncio.run(state.close())
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+import server
+
+KEY = (12, 2106, 1348)
+
+
+def test_put_and_get_round_trip(tmp_path):
+    async def scenario():
+        cache = server.TileCache(tmp_path, server.MemoryState())
+        await cache.put(KEY, b"tile", await cache.generation())
+        fresh = server.TileCache(tmp_path, cache.state)
+        return await cache.get(KEY), await fresh.get(KEY), fresh.disk_hits
+
+    assert asyncio.run(scenario()) == (b"tile", b"tile", 1)
+
+
+def test_render_overlapping_an_invalidation_is_not_cached(tmp_path):
+    async def scenario():
+        cache = server.TileCache(tmp_path, server.MemoryState())
+        generation = await cache.generation()
+        # The asset moves while the tile is being rendered from the old data
+        await cache.invalidate([KEY])
+        await cache.put(KEY, b"stale", generation)
+        return await cache.get(KEY), cache.stale_puts
+
+    assert asyncio.run(scenario()) == (None, 1)
+    assert not (tmp_path / "12" / "2106" / "1348.mvt").exists()
+
+
+def test_invalidation_during_the_write_drops_the_tile(tmp_path):
+    async def scenario():
+        cache = server.TileCache(tmp_path, server.MemoryState())
+        # Unchanged when put checks before writing, bumped by the time the write finishes
+        readings = iter([0, 1])
+
+        async def generation():
+            return next(readings)
+
+        cache.generation = generation
+        await cache.put(KEY, b"stale", 0)
+        return await cache.get(KEY), cache.stale_puts
+
+    assert asyncio.run(scenario()) == (None, 1)
+
+
+def test_clear_bumps_the_generation(tmp_path):
+    async def scenario():
+        cache = server.TileCache(tmp_path, server.MemoryState())
+        before = await cache.generation()
+        await cache.clear()
+        return before, await cache.generation()
+
+    assert asyncio.run(scenario()) == (0, 1)
+
+
+def test_encode_point_tile_round_trips():
+    mvt = pytest.importorskip("mapbox_vector_tile")
+    features = [(10, 20, {"name": "A", "health_score": 90, "status": "ok"}),
+                (4000, 100, {"name": "B", "health_score": 90, "status": None})]
+    decoded = mvt.decode(server.encode_point_tile("assets", features), default_options={"y_coord_down": True})
+    layer = decoded["assets"]
+    assert layer["extent"] == server.TILE_EXTENT
+    assert [f["geometry"]["coordinates"] for f in layer["features"]] == [[10, 20], [4000, 100]]
+    assert layer["features"][0]["properties"] == {"name": "A", "health_score": 90, "status": "ok"}
+    assert layer["features"][1]["properties"] == {"name": "B", "health_score": 90}
+
+
+def test_encode_point_tile_shares_repeated_values():
+    features = [(i, i, {"status": "operational"}) for i in range(100)]
+    tile = server.encode_point_tile("assets", features)
+    assert tile.count(b"operational") == 1
+    assert tile.count(b"status") == 1
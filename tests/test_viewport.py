@@ -0,0 +1,47 @@
+import server
+
+
+def asset(asset_id: str, lon: float, lat: float) -> dict:
+    return {
+        "asset_id": asset_id, "name": asset_id, "type": "bridge", "status": "operational",
+        "health_score": 90, "longitude": lon, "latitude": lat,
+        "geo": {"type": "Point", "coordinates": [lon, lat]},
+    }
+
+
+def test_world_bbox_uses_a_lat_lon_range():
+    query = server.bbox_query((-180.0, -90.0, 180.0, 90.0))
+    assert "geo" not in query
+    assert query["longitude"] == {"$gte": -180.0, "$lte": 180.0}
+    assert query["latitude"] == {"$gte": -90.0, "$lte": 90.0}
+
+
+def test_small_bbox_uses_the_sphere_index():
+    query = server.bbox_query((4.0, 52.0, 5.0, 53.0))
+    assert query["geo"]["$geoWithin"]["$geometry"]["type"] == "Polygon"
+
+
+def test_viewport_world_view_at_zoom_zero(api, login):
+    headers = login()
+    docs = [asset("AST-NL", 4.9, 52.4), asset("AST-NZ", 174.8, -41.3),
+            asset("AST-AK", -179.5, 51.8), asset("AST-NO", 15.6, 78.2)]
+    api.portal.call(server.db.assets.insert_many, docs)
+
+    response = api.get("/api/assets/viewport", params={"bbox": "-180,-90,180,90", "zoom": 0}, headers=headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["clustered"] is True
+    total = len(body["assets"]) + sum(c["count"] for c in body["clusters"])
+    assert total == len(docs)
+
+
+def test_within_world_bbox_returns_every_asset(api, login):
+    headers = login()
+    docs = [asset("AST-W", -179.9, 0.0), asset("AST-E", 179.9, 0.0)]
+    api.portal.call(server.db.assets.insert_many, docs)
+
+    response = api.get("/api/assets/within", params={"bbox": "-180,-90,180,90"}, headers=headers)
+
+    assert response.status_code == 200
+    assert sorted(a["asset_id"] for a in response.json()) == ["AST-E", "AST-W"]